@@ -1,19 +1,98 @@
 import argparse
 import json
-from flask_cors import CORS  # Add this import
-from flask import Flask, request, jsonify
+import math
+import sys
 
-from core_functions import build_api_messages, create_api_client, execute_chat_completion, fetch_api_keys, main as main_cli
-from error_handlers import handle_api_errors
-from validation import clean_json, process_api_response_and_validate
+# Only light modules here: each mode imports what it needs (flask, the
+# pipeline and its provider SDK...), so --help and the CLI modes start fast
+from config import (
+    AUTO_MODEL,
+    BATCH_MAX_CARDS,
+    BULK_WORKERS,
+    CARD_SUGGEST_LIMIT,
+    MSG_COLOR,
+    SERVER_TIMING,
+    WARM_INTERVAL_SECONDS,
+    WARM_TOP_CARDS,
+    print_colored,
+)
+from metrics import metrics, request_timings, server_timing_header
+from server_logging import RequestLog, annotate, setup_server_logging
 
 
+def _sse(event, payload):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def _retry_after_header(error):
+    """Retry-After header for rate-limited lookups (429), empty otherwise"""
+    retry_after = getattr(error, "retry_after", None)
+    return {"Retry-After": str(math.ceil(retry_after))} if retry_after else {}
+
 # Mode switching implementation
 def setup_api_server():
     """Configure and return the Flask application for API mode"""
+    from flask import Flask, Response, g, request, jsonify
+    from flask_cors import CORS
+
+    from card_catalog import get_card_catalog, parse_search_params
+    from card_http import card_response, parse_fields
+    from card_index import get_card_index
+    from error_handlers import handle_api_errors
+    from model_router import get_model_router
+    from pipeline import CardLookupError, lookup_card, lookup_cards, resolve_model, stream_card
+
     app = Flask(__name__)
     
     CORS(app)
+
+    @app.before_request
+    def start_request_log():
+        """Tag every log record of the request with its id (X-Request-ID, or a new one)"""
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.request_log = RequestLog(route, request.headers.get("X-Request-ID"))
+
+    @app.after_request
+    def count_response(response):
+        """Count every response by route and status code (200, 400, 422, 502, 500...)"""
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.inc("http_requests_total", route=route, method=request.method, status=response.status_code)
+        response.headers["X-Request-ID"] = g.request_log.request_id
+        g.request_log.finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def finish_request_log(error):
+        """Log requests that ended on an unhandled exception (no-op otherwise)"""
+        if "request_log" in g:
+            g.request_log.finish(500)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_handler():
+        """Prometheus text exposition of counters and stage histograms"""
+        return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @app.route('/models/routing', methods=['GET'])
+    def routing_handler():
+        """Current "auto" routing table: chosen model and EWMA stats per provider"""
+        return jsonify(get_model_router().table()), 200
+
+    @app.route('/cards', methods=['GET'])
+    def cards_handler():
+        """Filter and sort known cards (?max_annual_fee=150&max_purchase_rate=20&sort=annual_fee)"""
+        try:
+            search = parse_search_params(request.args.to_dict())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(get_card_catalog().search(**search)), 200
+
+    @app.route('/cards/suggest', methods=['GET'])
+    def suggest_handler():
+        """Typeahead: known cards matching a partial name (?q=amex go&limit=10)"""
+        limit = request.args.get('limit', CARD_SUGGEST_LIMIT, type=int)
+        suggestions = get_card_index().suggest(request.args.get('q', ''), max(1, min(limit, 50)))
+        return jsonify({"suggestions": suggestions}), 200
+
     @app.route('/process', methods=['POST'])
     def api_handler():
         """Endpoint for automated card data processing"""
@@ -32,38 +111,144 @@ def setup_api_server():
             # Extract parameters
             card_choice = data['card_choice']
             selected_api = data['selected_api']
-            selected_model = data['selected_model']
+            # "auto" is resolved here so the response can name the chosen model
+            selected_model = resolve_model(selected_api, data['selected_model'])
+            annotate(provider=selected_api, model=selected_model)
 
-            OPENAI_KEY, PERPLEXITY_KEY = fetch_api_keys(selected_api)
-            
-            #Client creation
-            client = create_api_client(selected_api, OPENAI_KEY, PERPLEXITY_KEY)
-            
-            # Build messages structure
-            messages = build_api_messages(selected_api, card_choice)
-            
-            # Execute API call
-            completion, api_success = execute_chat_completion(
-                client, selected_api, selected_model, messages
-            )
-            if not api_success:
-                return jsonify({"error": "API communication failed"}), 502
-                
-            # Process response
-            response_text = clean_json(completion.choices[0].message.content)
-
-            # In the api_handler function:
-            success = process_api_response_and_validate(completion,selected_api, response_text)
-
-            if success:
-                # Directly use the validated JSON from response_text
-                return jsonify(response_text), 200
-            else:
-                return jsonify({"error": "Data validation failed"}), 422
-                
+            # Cache lookup, then provider call on miss
+            with request_timings() as stages:
+                annotate(stages=stages)
+                validated = lookup_card(card_choice, selected_api, selected_model)
+            response = jsonify(validated)
+            response.headers["X-Selected-Model"] = selected_model
+            if SERVER_TIMING:
+                response.headers["Server-Timing"] = server_timing_header(stages)
+            return response, 200
+
+        except CardLookupError as e:
+            return jsonify({"error": str(e)}), e.status_code, _retry_after_header(e)
+        except Exception as e:
+            handle_api_errors(e, selected_api)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/process', methods=['GET'])
+    def card_handler():
+        """Cacheable card lookup: same parameters as the POST body, as a query string
+
+        Answers compact JSON with a strong ETag; If-None-Match on an unchanged
+        card returns 304 with no body. The body is gzip/br encoded when
+        Accept-Encoding allows it, and ?fields=cardName,annualFee,interestRate
+        keeps only the listed top-level keys.
+        """
+        required_fields = ['card_choice', 'selected_api', 'selected_model']
+        if missing := [field for field in required_fields if field not in request.args]:
+            return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        selected_api = request.args['selected_api']
+        try:
+            selected_model = resolve_model(selected_api, request.args['selected_model'])
+            annotate(provider=selected_api, model=selected_model)
+            with request_timings() as stages:
+                annotate(stages=stages)
+                validated = lookup_card(request.args['card_choice'], selected_api, selected_model)
+        except CardLookupError as e:
+            return jsonify({"error": str(e)}), e.status_code, _retry_after_header(e)
         except Exception as e:
             handle_api_errors(e, selected_api)
             return jsonify({"error": str(e)}), 500
+
+        status, body, headers = card_response(
+            validated, fields, request.headers.get("Accept-Encoding"), request.headers.get("If-None-Match")
+        )
+        headers.append(("X-Selected-Model", selected_model))
+        if SERVER_TIMING:
+            headers.append(("Server-Timing", server_timing_header(stages)))
+        return Response(body, status=status, headers=headers)
+
+    @app.route('/process/stream', methods=['GET', 'POST'])
+    def stream_handler():
+        """Endpoint streaming card fields as Server-Sent Events
+
+        Accepts the /process JSON body (POST) or the same parameters as a
+        query string (GET, for EventSource). Emits one "field" event per
+        completed top-level key, then a "result" event with the validated
+        card, or an "error" event.
+        """
+        if request.method == 'POST':
+            if not request.is_json:
+                return jsonify({"error": "Request must be JSON"}), 400
+            data = request.get_json()
+        else:
+            data = request.args
+
+        required_fields = ['card_choice', 'selected_api', 'selected_model']
+        if missing := [field for field in required_fields if field not in data]:
+            return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
+
+        card_choice = data['card_choice']
+        selected_api = data['selected_api']
+        try:
+            # Checked before the 200 and the event stream start: bad input gets a 4xx
+            selected_model = resolve_model(selected_api, data['selected_model'])
+        except CardLookupError as e:
+            return jsonify({"error": str(e)}), e.status_code
+        annotate(provider=selected_api, model=selected_model)
+
+        def events():
+            try:
+                for event, payload in stream_card(card_choice, selected_api, selected_model):
+                    yield _sse(event, payload)
+            except CardLookupError as e:
+                metrics.inc("stream_errors_total", status=e.status_code)
+                yield _sse("error", {"error": str(e), "status": e.status_code})
+            except Exception as e:
+                handle_api_errors(e, selected_api)
+                metrics.inc("stream_errors_total", status=500)
+                yield _sse("error", {"error": str(e), "status": 500})
+
+        return Response(events(), mimetype="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+        })
+
+    @app.route('/process/batch', methods=['POST'])
+    def batch_handler():
+        """Endpoint for looking up several cards in one request
+
+        Returns every per-card result at once, or streams them as NDJSON
+        (one line per card, in completion order) when "stream" is true or
+        the client accepts application/x-ndjson.
+        """
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+
+        data = request.get_json()
+
+        required_fields = ['card_choices', 'selected_api', 'selected_model']
+        if missing := [field for field in required_fields if field not in data]:
+            return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
+
+        card_choices = data['card_choices']
+        if not isinstance(card_choices, list) or not card_choices \
+                or not all(isinstance(card, str) for card in card_choices):
+            return jsonify({"error": "card_choices must be a non-empty list of card names"}), 400
+        if len(card_choices) > BATCH_MAX_CARDS:
+            return jsonify({"error": f"At most {BATCH_MAX_CARDS} cards per batch"}), 400
+
+        results = lookup_cards(card_choices, data['selected_api'], data['selected_model'])
+
+        stream = data.get('stream') or request.accept_mimetypes.best == "application/x-ndjson"
+        if stream:
+            # First cards reach the client before the slowest lookup finishes
+            lines = (json.dumps(result, ensure_ascii=False) + "\n" for result in results)
+            return Response(lines, mimetype="application/x-ndjson")
+
+        ordered = sorted(results, key=lambda result: result["index"])
+        return jsonify({"results": ordered}), 200
     
     return app
 
@@ -71,10 +256,10 @@ def parse_arguments():
     """Handle command-line arguments for mode selection"""
     parser = argparse.ArgumentParser(
         description="Credit Card Data Processor",
-        epilog="Modes: manual (CLI) | auto (API server)"
+        epilog="Modes: manual (CLI) | auto (API server) | async (ASGI API server) | warm (cache warmer) | bulk (CSV -> JSONL)"
     )
     parser.add_argument('--mode', 
-        choices=['manual', 'auto'], 
+        choices=['manual', 'auto', 'async', 'warm', 'bulk'], 
         default='manual',
         help="Operation mode (default: manual)"
     )
@@ -87,23 +272,128 @@ def parse_arguments():
         default=5000,
         help="API server port (default: 5000)"
     )
+    parser.add_argument('--cards',
+        help="Warm mode: file with one card name per line (default: most requested cards)"
+    )
+    parser.add_argument('--top',
+        type=int,
+        default=WARM_TOP_CARDS,
+        help=f"Warm mode: number of most requested cards to keep warm (default: {WARM_TOP_CARDS})"
+    )
+    parser.add_argument('--api',
+        choices=['openai', 'perplexity', 'fake'],
+        default='openai',
+        help="Warm/bulk mode: provider (default: openai)"
+    )
+    parser.add_argument('--model',
+        default=AUTO_MODEL,
+        help=f"Warm/bulk mode: model (default: {AUTO_MODEL})"
+    )
+    parser.add_argument('--interval',
+        type=float,
+        default=WARM_INTERVAL_SECONDS,
+        help=f"Warm mode: seconds between cycles (default: {WARM_INTERVAL_SECONDS})"
+    )
+    parser.add_argument('--once',
+        action='store_true',
+        help="Warm mode: run a single cycle and exit"
+    )
+    parser.add_argument('--input',
+        help="Bulk mode: CSV of cards (card_choice column, or one card per line)"
+    )
+    parser.add_argument('--output',
+        default='results.jsonl',
+        help="Bulk mode: JSONL of validated cards, appended and used to resume (default: results.jsonl)"
+    )
+    parser.add_argument('--workers',
+        type=int,
+        default=BULK_WORKERS,
+        help=f"Bulk mode: concurrent lookups (default: {BULK_WORKERS})"
+    )
     return parser.parse_args()
 
+def run_async_server(host, port):
+    """Start the ASGI server (async mode), serving the same /process contract"""
+    try:
+        import uvicorn
+    except ImportError:
+        print_colored("❌ Le mode async requiert uvicorn (pip install uvicorn)", **MSG_COLOR["error"])
+        sys.exit(1)
+    from card_index import preload_card_index
+    from client_registry import preload_provider_sdk
+
+    setup_server_logging()
+    preload_provider_sdk()
+    preload_card_index()
+    print(f"Async API server running on {host}:{port}")
+    # uvicorn's loggers propagate to the JSON log; its access lines are replaced by "request" records
+    uvicorn.run("asgi_app:app", host=host, port=port, log_level="warning", log_config=None, access_log=False)
+
+def run_warmer(args):
+    """Keep popular (or listed) cards fresh in the shared cache (warm mode)"""
+    from dotenv import load_dotenv
+    from core_functions import fetch_api_keys
+    from warmer import CardWarmer, print_report, read_card_list
+
+    # Unattended: keys come from the environment (.env), never from a prompt
+    load_dotenv(override=True)
+    openai_key, perplexity_key = fetch_api_keys(args.api, interactive=False)
+    if args.api != "fake" and not (openai_key if args.api == "openai" else perplexity_key):
+        print_colored(f"❌ Clé {args.api} manquante dans l'environnement", **MSG_COLOR["error"])
+        sys.exit(1)
+
+    warmer = CardWarmer(
+        cards=read_card_list(args.cards) if args.cards else None,
+        selected_api=args.api,
+        selected_model=args.model,
+        top=args.top,
+    )
+    # Cycle reports stay visible on the terminal, without colors
+    setup_server_logging(console_level="INFO")
+    if args.once:
+        print_report(warmer.run_once())
+        return
+    print_colored(f"🔥 Warmer démarré (cycle toutes les {args.interval:g} s)", **MSG_COLOR["info"])
+    try:
+        warmer.run_forever(args.interval)
+    except KeyboardInterrupt:
+        print_colored("Warmer arrêté", **MSG_COLOR["info"])
+
 
 # python app.py --mode auto
+# python app.py --mode async
 # python app.py --mode manual
+# python app.py --mode warm --cards cards.txt --once
+# python app.py --mode bulk --input cards.csv --output results.jsonl --workers 8
 if __name__ == "__main__":
     args = parse_arguments()
     
     if args.mode == 'manual':
         # Run CLI version
+        from core_functions import main as main_cli
         main_cli()
+    elif args.mode == 'async':
+        run_async_server(args.host, args.port)
+    elif args.mode == 'warm':
+        run_warmer(args)
+    elif args.mode == 'bulk':
+        if not args.input:
+            print_colored("❌ Le mode bulk requiert --input", **MSG_COLOR["error"])
+            sys.exit(1)
+        from bulk import run_bulk
+        run_bulk(args.input, args.output, args.api, args.model, args.workers)
     else:
         # Start API server
+        from card_index import preload_card_index
+        from client_registry import preload_provider_sdk
+
+        setup_server_logging()
         app = setup_api_server()
+        preload_provider_sdk()
+        preload_card_index()
+        print(f"API server running on {args.host}:{args.port}")
         app.run(
             host=args.host,
             port=args.port,
             debug=False
         )
-        print(f"API server running on {args.host}:{args.port}")
@@ -0,0 +1,348 @@
+import asyncio
+import json
+import math
+from urllib.parse import parse_qs
+
+from card_catalog import get_card_catalog, parse_search_params
+from card_http import card_response, parse_fields
+from card_index import get_card_index
+from client_registry import get_client_registry
+from config import BATCH_MAX_CARDS, CARD_SUGGEST_LIMIT, SERVER_TIMING
+from error_handlers import handle_api_errors
+from metrics import metrics, request_timings, server_timing_header
+from model_router import get_model_router
+from pipeline import CardLookupError, lookup_card_async, lookup_cards_async, resolve_model, stream_card
+from server_logging import RequestLog, annotate
+
+REQUIRED_FIELDS = ['card_choice', 'selected_api', 'selected_model']
+BATCH_REQUIRED_FIELDS = ['card_choices', 'selected_api', 'selected_model']
+PROCESS_ROUTES = ("/process", "/process/batch", "/process/stream")
+ROUTES = (*PROCESS_ROUTES, "/metrics", "/models/routing", "/cards", "/cards/suggest")
+
+# Équivalent de CORS(app) côté Flask : toutes les origines sont autorisées
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+]
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send_json(send, status: int, payload, extra_headers=()) -> None:
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(data)).encode()),
+        *CORS_HEADERS,
+        *extra_headers,
+    ]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": data})
+
+
+async def _send_chunks(send, status: int, content_type: bytes, chunks, extra_headers=()) -> None:
+    """Réponse envoyée morceau par morceau, à mesure que l'itérateur asynchrone les produit"""
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", content_type),
+        *CORS_HEADERS,
+        *extra_headers,
+    ]})
+    async for chunk in chunks:
+        await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _sse(event, payload):
+    """Un message Server-Sent Events, comme app._sse"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def _read_json(receive, send, headers: dict):
+    """Corps JSON de la requête, ou None après avoir répondu 400"""
+    content_type = headers.get(b"content-type", b"").decode("latin-1")
+    if not content_type.startswith("application/json"):
+        await _send_json(send, 400, {"error": "Request must be JSON"})
+        return None
+
+    try:
+        data = json.loads(await _read_body(receive))
+    except ValueError:
+        await _send_json(send, 400, {"error": "Request must be JSON"})
+        return None
+
+    if not isinstance(data, dict):
+        await _send_json(send, 400, {"error": "Request must be a JSON object"})
+        return None
+    return data
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Les clients AsyncOpenAI doivent être fermés depuis leur boucle
+            await get_client_registry().aclose_all()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _process(receive, send, headers: dict) -> None:
+    """Même contrat que la route /process du serveur Flask"""
+    data = await _read_json(receive, send, headers)
+    if data is None:
+        return
+    if missing := [field for field in REQUIRED_FIELDS if field not in data]:
+        await _send_json(send, 400, {"error": f"Missing fields: {', '.join(missing)}"})
+        return
+
+    selected_api = data['selected_api']
+    try:
+        selected_model = resolve_model(selected_api, data['selected_model'])
+        annotate(provider=selected_api, model=selected_model)
+        with request_timings() as stages:
+            annotate(stages=stages)
+            validated = await lookup_card_async(data['card_choice'], selected_api, selected_model)
+        extra = [(b"x-selected-model", selected_model.encode())]
+        if SERVER_TIMING:
+            extra.append((b"server-timing", server_timing_header(stages).encode()))
+        await _send_json(send, 200, validated, extra)
+    except CardLookupError as e:
+        retry_after = getattr(e, "retry_after", None)
+        extra = [(b"retry-after", str(math.ceil(retry_after)).encode())] if retry_after else []
+        await _send_json(send, e.status_code, {"error": str(e)}, extra)
+    except Exception as e:
+        handle_api_errors(e, selected_api)
+        await _send_json(send, 500, {"error": str(e)})
+
+
+async def _process_get(send, query: dict, headers: dict) -> None:
+    """Même contrat que la route GET /process du serveur Flask (ETag, 304, gzip/br, fields)"""
+    params = {name: values[-1] for name, values in query.items()}
+    if missing := [field for field in REQUIRED_FIELDS if field not in params]:
+        await _send_json(send, 400, {"error": f"Missing fields: {', '.join(missing)}"})
+        return
+    try:
+        fields = parse_fields(params.get("fields"))
+    except ValueError as e:
+        await _send_json(send, 400, {"error": str(e)})
+        return
+
+    selected_api = params['selected_api']
+    try:
+        selected_model = resolve_model(selected_api, params['selected_model'])
+        annotate(provider=selected_api, model=selected_model)
+        with request_timings() as stages:
+            annotate(stages=stages)
+            validated = await lookup_card_async(params['card_choice'], selected_api, selected_model)
+    except CardLookupError as e:
+        retry_after = getattr(e, "retry_after", None)
+        extra = [(b"retry-after", str(math.ceil(retry_after)).encode())] if retry_after else []
+        await _send_json(send, e.status_code, {"error": str(e)}, extra)
+        return
+    except Exception as e:
+        handle_api_errors(e, selected_api)
+        await _send_json(send, 500, {"error": str(e)})
+        return
+
+    accept_encoding = headers.get(b"accept-encoding", b"").decode("latin-1")
+    if_none_match = headers.get(b"if-none-match", b"").decode("latin-1")
+    status, body, response_headers = card_response(validated, fields, accept_encoding, if_none_match)
+    response_headers.append(("X-Selected-Model", selected_model))
+    if SERVER_TIMING:
+        response_headers.append(("Server-Timing", server_timing_header(stages)))
+    await send({"type": "http.response.start", "status": status, "headers": [
+        *((name.lower().encode(), value.encode("latin-1")) for name, value in response_headers),
+        (b"content-length", str(len(body)).encode()),
+        *CORS_HEADERS,
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _suggest(send, query: dict) -> None:
+    """Même contrat que la route /cards/suggest du serveur Flask"""
+    try:
+        limit = int(query.get("limit", [CARD_SUGGEST_LIMIT])[0])
+    except ValueError:
+        limit = CARD_SUGGEST_LIMIT
+    # Index construit au démarrage (preload_card_index) ; recherche hors de la boucle d'événements
+    suggestions = await asyncio.to_thread(
+        lambda: get_card_index().suggest(query.get("q", [""])[0], max(1, min(limit, 50)))
+    )
+    await _send_json(send, 200, {"suggestions": suggestions})
+
+
+async def _cards(send, query: dict) -> None:
+    """Même contrat que la route /cards du serveur Flask"""
+    try:
+        search = parse_search_params({name: values[-1] for name, values in query.items()})
+    except ValueError as e:
+        await _send_json(send, 400, {"error": str(e)})
+        return
+    # Construction du catalogue au premier appel et tri hors de la boucle d'événements
+    await _send_json(send, 200, await asyncio.to_thread(lambda: get_card_catalog().search(**search)))
+
+
+async def _batch(receive, send, headers: dict) -> None:
+    """Même contrat que la route /process/batch du serveur Flask (JSON, ou NDJSON en flux)"""
+    data = await _read_json(receive, send, headers)
+    if data is None:
+        return
+    if missing := [field for field in BATCH_REQUIRED_FIELDS if field not in data]:
+        await _send_json(send, 400, {"error": f"Missing fields: {', '.join(missing)}"})
+        return
+
+    card_choices = data['card_choices']
+    if not isinstance(card_choices, list) or not card_choices \
+            or not all(isinstance(card, str) for card in card_choices):
+        await _send_json(send, 400, {"error": "card_choices must be a non-empty list of card names"})
+        return
+    if len(card_choices) > BATCH_MAX_CARDS:
+        await _send_json(send, 400, {"error": f"At most {BATCH_MAX_CARDS} cards per batch"})
+        return
+
+    results = lookup_cards_async(card_choices, data['selected_api'], data['selected_model'])
+    accept = headers.get(b"accept", b"").decode("latin-1")
+    if data.get('stream') or "application/x-ndjson" in accept:
+        # Les premières cartes partent avant la fin de la recherche la plus lente
+        lines = (json.dumps(result, ensure_ascii=False) + "\n" async for result in results)
+        await _send_chunks(send, 200, b"application/x-ndjson", lines)
+        return
+    ordered = sorted([result async for result in results], key=lambda result: result["index"])
+    await _send_json(send, 200, {"results": ordered})
+
+
+async def _in_thread(iterator):
+    """Parcourt un itérateur bloquant dans des threads, sans bloquer la boucle d'événements"""
+    done = object()
+    try:
+        while (item := await asyncio.to_thread(next, iterator, done)) is not done:
+            yield item
+    finally:
+        try:
+            iterator.close()
+        except ValueError:
+            # Client parti pendant un next() encore en cours : le générateur se termine seul
+            pass
+
+
+async def _stream(receive, send, query: dict, headers: dict, method: str) -> None:
+    """Même contrat que la route /process/stream du serveur Flask (Server-Sent Events)"""
+    if method == "POST":
+        data = await _read_json(receive, send, headers)
+        if data is None:
+            return
+    else:
+        data = {name: values[-1] for name, values in query.items()}
+    if missing := [field for field in REQUIRED_FIELDS if field not in data]:
+        await _send_json(send, 400, {"error": f"Missing fields: {', '.join(missing)}"})
+        return
+
+    selected_api = data['selected_api']
+    try:
+        # Paramètres vérifiés avant l'en-tête 200 du flux
+        selected_model = resolve_model(selected_api, data['selected_model'])
+    except CardLookupError as e:
+        await _send_json(send, e.status_code, {"error": str(e)})
+        return
+
+    async def events():
+        try:
+            async for event, payload in _in_thread(stream_card(data['card_choice'], selected_api, selected_model)):
+                yield _sse(event, payload)
+        except CardLookupError as e:
+            metrics.inc("stream_errors_total", status=e.status_code)
+            yield _sse("error", {"error": str(e), "status": e.status_code})
+        except Exception as e:
+            handle_api_errors(e, selected_api)
+            metrics.inc("stream_errors_total", status=500)
+            yield _sse("error", {"error": str(e), "status": 500})
+
+    await _send_chunks(send, 200, b"text/event-stream", events(), [
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),
+        (b"x-selected-model", selected_model.encode()),
+    ])
+
+
+async def app(scope, receive, send):
+    """Application ASGI servant /process sans bloquer un thread par requête
+
+    Mêmes routes que le serveur Flask. /process/stream parcourt le flux du
+    fournisseur dans des threads (client synchrone) ; les autres recherches
+    passent par le client AsyncOpenAI.
+    """
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    route = scope["path"] if scope["path"] in ROUTES else "unmatched"
+    request_id = dict(scope.get("headers", [])).get(b"x-request-id")
+    request_log = RequestLog(route, request_id.decode("latin-1") if request_id else None)
+    status = 500
+
+    async def send_counted(message):
+        # Compte chaque réponse par route et code HTTP, comme after_request côté Flask
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            metrics.inc("http_requests_total", route=route, method=scope["method"], status=status)
+            message = {**message, "headers": [
+                *message.get("headers", []), (b"x-request-id", request_log.request_id.encode("latin-1")),
+            ]}
+        elif scope["method"] == "HEAD":
+            # Mêmes en-têtes (dont content-length) que GET, sans le corps
+            message = {**message, "body": b""}
+        await send(message)
+
+    try:
+        await _dispatch(scope, receive, send_counted)
+    finally:
+        request_log.finish(status)
+
+
+async def _dispatch(scope, receive, send) -> None:
+    headers = dict(scope.get("headers", []))
+    if scope["path"] == "/metrics" and scope["method"] == "GET":
+        data = metrics.render_prometheus().encode("utf-8")
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/plain; version=0.0.4"),
+            (b"content-length", str(len(data)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": data})
+    elif scope["path"] == "/models/routing" and scope["method"] == "GET":
+        await _send_json(send, 200, get_model_router().table())
+    elif scope["path"] == "/cards" and scope["method"] == "GET":
+        await _cards(send, parse_qs(scope.get("query_string", b"").decode("latin-1")))
+    elif scope["path"] == "/cards/suggest" and scope["method"] == "GET":
+        await _suggest(send, parse_qs(scope.get("query_string", b"").decode("latin-1")))
+    elif scope["path"] not in PROCESS_ROUTES:
+        await _send_json(send, 404, {"error": "Not found"})
+    elif scope["method"] == "OPTIONS":
+        # Pré-vérification CORS du navigateur
+        requested = headers.get(b"access-control-request-headers", b"content-type")
+        await _send_json(send, 200, {}, [
+            (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+            (b"access-control-allow-headers", requested),
+        ])
+    elif scope["path"] == "/process/stream" and scope["method"] in ("GET", "POST"):
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        await _stream(receive, send, query, headers, scope["method"])
+    elif scope["path"] == "/process/batch" and scope["method"] == "POST":
+        await _batch(receive, send, headers)
+    elif scope["path"] == "/process" and scope["method"] in ("GET", "HEAD"):
+        await _process_get(send, parse_qs(scope.get("query_string", b"").decode("latin-1")), headers)
+    elif scope["path"] == "/process" and scope["method"] == "POST":
+        await _process(receive, send, headers)
+    else:
+        await _send_json(send, 405, {"error": "Method not allowed"})
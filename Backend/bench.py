@@ -0,0 +1,1126 @@
+import argparse
+import contextlib
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_provider import start_fake_provider
+
+
+def _summarize(label: str, samples: list) -> float:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p50 = statistics.median(samples_ms)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(f"{label:<12} n={len(samples_ms):<5} p50={p50:7.2f} ms  p95={p95:7.2f} ms  mean={statistics.mean(samples_ms):7.2f} ms")
+    return p50
+
+
+def bench_clients(requests: int) -> None:
+    """Compare un client OpenAI créé par requête au registre de clients partagés"""
+    from openai import OpenAI
+    from client_registry import ClientRegistry
+
+    server = start_fake_provider()
+    messages = [{"role": "user", "content": "bench"}]
+
+    # Comportement historique : un client (et un pool de connexions) par requête
+    fresh = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client = OpenAI(api_key="bench", base_url=server.base_url)
+        client.chat.completions.create(model="fake", messages=messages)
+        fresh.append(time.perf_counter() - start)
+        client.close()
+
+    registry = ClientRegistry()
+    pooled = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client = registry.get("fake", "bench", server.base_url)
+        client.chat.completions.create(model="fake", messages=messages)
+        pooled.append(time.perf_counter() - start)
+    registry.close_all()
+    server.shutdown()
+
+    fresh_p50 = _summarize("per-request", fresh)
+    pooled_p50 = _summarize("pooled", pooled)
+    print(f"saved per request (p50): {fresh_p50 - pooled_p50:.2f} ms")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _spawn(args: list, env: dict, port: int, workdir: str) -> "subprocess.Popen":
+    """Lance un processus du backend et attend qu'il écoute sur son port"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(backend_dir, args[0]), *args[1:]],
+        cwd=workdir,  # cache.db et results.db restent hors du dépôt
+        env={**os.environ, "PYTHONPATH": backend_dir, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return process
+        time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{args[0]} did not start on port {port}")
+
+
+def _available_modes(modes: list) -> list:
+    """Modes serveur lançables ici : le mode async requiert uvicorn, dépendance optionnelle"""
+    import importlib.util
+
+    if "async" in modes and importlib.util.find_spec("uvicorn") is None:
+        print("async mode skipped: uvicorn is not installed (pip install uvicorn)")
+        return [mode for mode in modes if mode != "async"]
+    return list(modes)
+
+
+@contextlib.contextmanager
+def _backend_servers(modes: list, provider_args: list = ()):
+    """Démarre un faux fournisseur et un serveur backend par mode, dans des processus séparés
+
+    Les modes indisponibles (async sans uvicorn) sont sautés et absents des URL.
+
+    Yields:
+        tuple: (mode -> URL du serveur, variables d'environnement des serveurs, dossier de travail)
+    """
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    provider_port = _free_port()
+    processes = [_spawn(["fake_provider.py", "--port", str(provider_port), *provider_args], {}, provider_port, workdir)]
+    env = {
+        "OPENAI_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{provider_port}/v1",
+        "FAKE_BASE_URL": f"http://127.0.0.1:{provider_port}/v1",
+        "CACHE_DB_PATH": "",
+    }
+    urls = {}
+    try:
+        for mode in _available_modes(modes):
+            port = _free_port()
+            processes.append(_spawn(["app.py", "--mode", mode, "--host", "127.0.0.1", "--port", str(port)], env, port, workdir))
+            urls[mode] = f"http://127.0.0.1:{port}"
+        yield urls, env, workdir
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def _drive(url: str, payloads: list, concurrency: int, timings: list = None) -> tuple[list, float, int]:
+    """Envoie les payloads en POST avec au plus `concurrency` requêtes en vol
+
+    Bibliothèque standard uniquement : un thread et une connexion keep-alive
+    http.client par requête en vol. timings, si fourni, reçoit l'en-tête
+    Server-Timing de chaque réponse réussie.
+    """
+    import http.client
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    local = threading.local()
+    connections = []
+
+    def post(body: bytes) -> http.client.HTTPResponse:
+        # Une connexion gardée ouverte peut avoir été fermée par le serveur (keep-alive expiré) :
+        # un seul nouvel essai, sur une connexion neuve
+        for reused in (True, False):
+            connection = getattr(local, "connection", None) if reused else None
+            if connection is None:
+                connection = local.connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=300)
+                connections.append(connection)
+                reused = False
+            try:
+                connection.request("POST", parts.path, body, {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                response.read()
+                return response
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                local.connection = None
+                if not reused:
+                    raise
+
+    def one(payload: dict) -> tuple:
+        start = time.perf_counter()
+        try:
+            response = post(json.dumps(payload).encode())
+        except (OSError, http.client.HTTPException):
+            return time.perf_counter() - start, False, None
+        return time.perf_counter() - start, response.status == 200, response.getheader("server-timing", "")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, payloads))
+    elapsed = time.perf_counter() - start
+    for connection in connections:
+        connection.close()
+    if timings is not None:
+        timings.extend(header for _, ok, header in results if ok)
+    return [seconds for seconds, _, _ in results], elapsed, sum(not ok for _, ok, _ in results)
+
+
+def bench_load(requests: int, concurrency: int = 100, latency: float = 0.5) -> None:
+    """Compare le débit de /process entre le serveur Flask (auto) et le mode async"""
+    with _backend_servers(["auto", "async"], ["--latency", str(latency)]) as (urls, _, _):
+        for mode, base_url in urls.items():
+            # Noms de carte distincts : ni le cache ni la fusion des requêtes ne s'appliquent
+            payloads = [
+                {"card_choice": f"{mode} card {i}", "selected_api": "openai", "selected_model": "fake"}
+                for i in range(requests)
+            ]
+            latencies, elapsed, failures = _drive(f"{base_url}/process", payloads, concurrency)
+            _summarize(mode, latencies)
+            print(f"{'':<12} throughput={requests / elapsed:7.1f} req/s  failures={failures}")
+
+
+def _parse_server_timing(header: str) -> dict:
+    """Durées (ms) par étape d'un en-tête Server-Timing, étapes répétées additionnées"""
+    timings = {}
+    for part in header.split(","):
+        stage, _, duration = part.strip().partition(";dur=")
+        if stage and duration:
+            timings[stage] = timings.get(stage, 0.0) + float(duration)
+    return timings
+
+
+def _suite_result(latencies_ms: list, elapsed: float, failures: int, stage_timings: list) -> dict:
+    """Débit, quantiles de bout en bout et quantiles par étape d'une série"""
+    def quantiles(samples: list) -> dict:
+        return {f"p{q}": round(_percentile(samples, q / 100), 2) for q in (50, 95, 99)}
+
+    stages = {}
+    for timings in stage_timings:
+        for stage, ms in timings.items():
+            stages.setdefault(stage, []).append(ms)
+    return {
+        "throughput": round(len(latencies_ms) / elapsed, 2),
+        "failures": failures,
+        "total": quantiles(latencies_ms),
+        "stages": {stage: quantiles(samples) for stage, samples in sorted(stages.items())},
+    }
+
+
+def _run_bulk_cli(env: dict, workdir: str, card_choices: list, workers: int) -> dict:
+    """Lance python app.py --mode bulk sur un CSV ; les durées viennent des enregistrements JSONL"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    input_path = os.path.join(workdir, f"bulk-{workers}.csv")
+    output_path = os.path.join(workdir, f"bulk-{workers}.jsonl")
+    with open(input_path, "w", encoding="utf-8") as f:
+        f.write("card_choice\n" + "\n".join(card_choices) + "\n")
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(backend_dir, "app.py"), "--mode", "bulk", "--input", input_path,
+         "--output", output_path, "--api", "fake", "--model", "fake", "--workers", str(workers)],
+        cwd=workdir,
+        env={**os.environ, "PYTHONPATH": backend_dir, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    elapsed = time.perf_counter() - start
+    with open(output_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    return _suite_result(
+        [record["elapsed_ms"] for record in records], elapsed,
+        len(card_choices) - len(records), [record["timings"] for record in records],
+    )
+
+
+def bench_suite(
+    requests: int,
+    latency: float = 0.1,
+    levels: str = "4,16,64",
+    baseline: str = "bench_baseline.json",
+    save_baseline: bool = False,
+    threshold: float = 0.15,
+) -> None:
+    """/process (Flask et ASGI) et le mode bulk du CLI contre le faux fournisseur, à concurrence fixe
+
+    Chaque série donne le débit et les p50/p95/p99 de bout en bout et par
+    étape (en-têtes Server-Timing pour les serveurs, enregistrements JSONL
+    pour le CLI). Les résultats sont comparés à la référence enregistrée
+    (--save-baseline) ; un écart au-delà de threshold est une régression.
+    """
+    import random
+
+    rng = random.Random(20)
+    provider_args = ["--latency", str(latency), "--latency-dist", "lognormal", "--seed", "20"]
+    previous = {}
+    if os.path.exists(baseline):
+        with open(baseline, encoding="utf-8") as f:
+            previous = json.load(f)
+    results = {}
+
+    with _backend_servers(["auto", "async"], provider_args) as (urls, env, workdir):
+        for level in (int(level) for level in levels.split(",")):
+            for target in ("flask", "async", "cli"):
+                if target == "async" and "async" not in urls:
+                    continue
+                # Noms distincts et éloignés : ni cache, ni fusion, ni rapprochement de noms
+                card_choices = [f"{target} c{level} {rng.getrandbits(32):08x}" for _ in range(requests)]
+                if target == "cli":
+                    result = _run_bulk_cli(env, workdir, card_choices, level)
+                else:
+                    payloads = [{"card_choice": card, "selected_api": "fake", "selected_model": "fake"}
+                                for card in card_choices]
+                    headers = []
+                    url = urls["auto" if target == "flask" else "async"] + "/process"
+                    latencies, elapsed, failures = _drive(url, payloads, level, headers)
+                    result = _suite_result([seconds * 1000 for seconds in latencies], elapsed, failures,
+                                           [_parse_server_timing(header) for header in headers])
+                results[f"{target}@{level}"] = result
+
+    regressions = 0
+    for key, result in results.items():
+        base = previous.get(key)
+        total = result["total"]
+        line = (f"{key:<10} {result['throughput']:8.1f} req/s  p50={total['p50']:8.2f}  p95={total['p95']:8.2f}  "
+                f"p99={total['p99']:8.2f} ms  failures={result['failures']}")
+        if base:
+            throughput_delta = result["throughput"] / base["throughput"] - 1
+            p95_delta = total["p95"] / base["total"]["p95"] - 1
+            regressed = throughput_delta < -threshold or p95_delta > threshold
+            regressions += regressed
+            line += f"  vs baseline: {throughput_delta:+.0%} req/s, {p95_delta:+.0%} p95{'  REGRESSION' if regressed else ''}"
+        print(line)
+        for stage, stage_quantiles in result["stages"].items():
+            base_p95 = ((base or {}).get("stages", {}).get(stage) or {}).get("p95")
+            delta = f"  ({stage_quantiles['p95'] / base_p95 - 1:+.0%} p95)" if base_p95 else ""
+            print(f"  {stage:<18} p50={stage_quantiles['p50']:8.2f}  p95={stage_quantiles['p95']:8.2f}  "
+                  f"p99={stage_quantiles['p99']:8.2f} ms{delta}")
+    print("cli throughput includes interpreter start-up")
+
+    if save_baseline:
+        with open(baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved to {baseline}")
+    elif regressions:
+        print(f"{regressions} regression(s) beyond {threshold:.0%} against {baseline}")
+        sys.exit(1)
+
+
+# Commandes mesurées par bench_imports : aide du CLI et import de chaque point d'entrée
+IMPORT_TARGETS = {
+    "help": ["app.py", "--help"],
+    "manual": ["-c", "import core_functions"],
+    "bulk": ["-c", "import bulk"],
+    "flask": ["-c", "import app; app.setup_api_server()"],
+    "asgi": ["-c", "import asgi_app"],
+}
+
+
+def _import_times(args: list, workdir: str) -> tuple[float, float, dict]:
+    """Exécute python -X importtime args
+
+    Returns:
+        tuple: (durée du processus, somme des imports de premier niveau, paquet externe -> durée cumulée), en secondes
+    """
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    backend_modules = {name[:-3] for name in os.listdir(backend_dir) if name.endswith(".py")}
+    if args[0].endswith(".py"):
+        args = [os.path.join(backend_dir, args[0]), *args[1:]]
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=workdir, env={**os.environ, "PYTHONPATH": backend_dir},
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    elapsed = time.perf_counter() - start
+    total = 0.0
+    packages = {}
+    for line in completed.stderr.splitlines():
+        # "import time:  self | cumulative | nom" ; le nom est indenté selon la profondeur
+        _, _, fields = line.partition("import time:")
+        parts = fields.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name, seconds = parts[2].strip(), int(parts[1]) / 1e6
+        if not parts[2].startswith("  "):
+            total += seconds
+        if "." not in name and not name.startswith("_") and name not in backend_modules \
+                and name not in sys.stdlib_module_names and not name.endswith("customize"):
+            packages[name] = seconds
+    return elapsed, total, packages
+
+
+def _boot_time(mode: str, env: dict, workdir: str) -> tuple[float, float]:
+    """Lance app.py --mode mode ; (délai avant écoute, délai avant la première réponse /process), en secondes"""
+    import urllib.request
+
+    port = _free_port()
+    start = time.perf_counter()
+    process = _spawn(["app.py", "--mode", mode, "--host", "127.0.0.1", "--port", str(port)], env, port, workdir)
+    listening = time.perf_counter() - start
+    try:
+        body = json.dumps({"card_choice": f"boot {mode} {port}", "selected_api": "fake", "selected_model": "fake"})
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/process", body.encode(), {"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+        return listening, time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def bench_imports(
+    requests: int,
+    baseline: str = "bench_imports_baseline.json",
+    save_baseline: bool = False,
+    threshold: float = 0.25,
+) -> None:
+    """Temps de démarrage : imports de chaque point d'entrée et délai d'écoute des serveurs
+
+    Chaque cible est lancée requests fois dans un nouveau processus avec
+    -X importtime (médianes). Les serveurs (auto, async) sont démarrés
+    contre le faux fournisseur : délai avant d'écouter, puis avant la
+    première réponse /process. Comparaison à la référence comme pour suite,
+    avec un seuil plus large : les temps d'import varient d'un lancement à l'autre.
+    """
+    runs = max(1, requests)
+    previous = {}
+    if os.path.exists(baseline):
+        with open(baseline, encoding="utf-8") as f:
+            previous = json.load(f)
+    results = {}
+    heaviest = {}
+    workdir = tempfile.mkdtemp(prefix="bench-")
+
+    for target, args in IMPORT_TARGETS.items():
+        samples = [_import_times(args, workdir) for _ in range(runs)]
+        results[target] = {
+            "process_ms": statistics.median(sample[0] for sample in samples) * 1000,
+            "imports_ms": statistics.median(sample[1] for sample in samples) * 1000,
+        }
+        heaviest[target] = sorted(samples[-1][2].items(), key=lambda item: item[1], reverse=True)[:5]
+
+    server = start_fake_provider()
+    env = {"FAKE_BASE_URL": server.base_url, "CACHE_DB_PATH": ""}
+    for mode in _available_modes(["auto", "async"]):
+        samples = [_boot_time(mode, env, workdir) for _ in range(runs)]
+        results[f"boot-{mode}"] = {
+            "process_ms": statistics.median(sample[0] for sample in samples) * 1000,
+            "first_response_ms": statistics.median(sample[1] for sample in samples) * 1000,
+        }
+    server.shutdown()
+
+    regressions = 0
+    for key, result in results.items():
+        base = previous.get(key, {})
+        line = f"{key:<11}" + "".join(f"  {name}={value:8.1f}" for name, value in result.items())
+        deltas = {name: value / base[name] - 1 for name, value in result.items() if base.get(name)}
+        if deltas:
+            regressed = any(delta > threshold for delta in deltas.values())
+            regressions += regressed
+            line += "  vs baseline: " + ", ".join(f"{delta:+.0%} {name}" for name, delta in deltas.items())
+            line += "  REGRESSION" if regressed else ""
+        print(line)
+        for package, seconds in heaviest.get(key, ()):
+            print(f"  {package:<24} {seconds * 1000:8.1f} ms")
+
+    if save_baseline:
+        with open(baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved to {baseline}")
+    elif regressions:
+        print(f"{regressions} regression(s) beyond {threshold:.0%} against {baseline}")
+        sys.exit(1)
+
+
+def _legacy_clean_json(response_text: str):
+    """Ancienne implémentation de clean_json (find/rfind/replace/loads), pour comparaison"""
+    import json
+
+    try:
+        json_start = response_text.find('{')
+        json_end = response_text.rfind('}') + 1
+        if json_start == -1 or json_end == 0:
+            raise ValueError("Aucun JSON détecté dans la réponse")
+        data = response_text[json_start:json_end]
+        data_str = data.replace('```json', '').replace('```', '').strip()
+        return json.loads(data_str)
+    except Exception:
+        return None
+
+
+def _extraction_corpus() -> dict:
+    """Réponses de fournisseur typiques construites à partir de previus.json (SAMPLE_CARD)
+
+    Returns:
+        dict: nom -> (texte de la réponse, objet attendu)
+    """
+    import json
+    from fake_provider import SAMPLE_CARD
+
+    compact = json.dumps(SAMPLE_CARD, ensure_ascii=False)
+    pretty = json.dumps(SAMPLE_CARD, indent=2, ensure_ascii=False)
+    research = "Based on my research of official sources [1][2], here is the data.\n" * 400
+    backticks = json.loads(compact.replace("Statement credits", "Statement ```credits```"))
+    return {
+        "plain": (compact, SAMPLE_CARD),
+        "fenced": (f"```json\n{pretty}\n```", SAMPLE_CARD),
+        "prose": (f"Here is the JSON you asked for:\n{pretty}\nLet me know if you need more.", SAMPLE_CARD),
+        "prose-braces": (f"Fields use the {{key: value}} form.\n```json\n{pretty}\n```\nSee {{1}} and {{2}}.", SAMPLE_CARD),
+        "example-first": (f'For example {{"cardName": null}} is empty. Result:\n{pretty}', SAMPLE_CARD),
+        "backticks-in-value": (json.dumps(backticks, ensure_ascii=False), backticks),
+        "deep-research": (f"<think>{research}</think>\n```json\n{pretty}\n```\n{research}", SAMPLE_CARD),
+    }
+
+
+def bench_extract(requests: int) -> None:
+    """Compare extract_json à l'ancien clean_json sur le corpus de réponses"""
+    from json_extract import JSONExtractionError, extract_json
+    from validation import CARD_KEYS
+
+    for name, (text, expected) in _extraction_corpus().items():
+        timings = {}
+        for label, fn in (("legacy", _legacy_clean_json), ("extract", lambda t: extract_json(t, CARD_KEYS))):
+            try:
+                correct = fn(text) == expected
+            except JSONExtractionError:
+                correct = False
+            start = time.perf_counter()
+            for _ in range(requests):
+                try:
+                    fn(text)
+                except JSONExtractionError:
+                    pass
+            timings[label] = ((time.perf_counter() - start) / requests * 1e6, correct)
+        print(f"{name:<20} {len(text):>7} chars  " + "  ".join(
+            f"{label}={us:8.1f} us {'ok' if ok else 'WRONG'}" for label, (us, ok) in timings.items()
+        ))
+
+
+def bench_fuzz_extract(requests: int) -> None:
+    """Mutations aléatoires du corpus : extract_json ne doit lever que JSONExtractionError"""
+    import random
+    from json_extract import JSONExtractionError, extract_json
+    from validation import CARD_KEYS
+
+    rng = random.Random(1234)
+    noise = ["{", "}", "[", "]", '"', "\\", "```", "```json", "{x}", "\n", "null"]
+    corpus = list(_extraction_corpus().values())
+    outcomes = {"ok": 0, "truncated": 0, "wrong": 0}
+    for _ in range(requests):
+        text, expected = rng.choice(corpus)
+        start = text.find("{")
+        end = text.rfind("}") + 1
+        # Les mutations touchent la prose ou tronquent l'objet ; elles ne modifient pas l'intérieur
+        mutation = rng.choice(["prefix", "suffix", "truncate"])
+        if mutation == "prefix":
+            text = "".join(rng.choice(noise) for _ in range(rng.randint(1, 20))) + " " + text
+        elif mutation == "suffix":
+            text = text + " " + "".join(rng.choice(noise) for _ in range(rng.randint(1, 20)))
+        else:
+            text = text[:rng.randint(start, end - 1)]
+        try:
+            result = extract_json(text, CARD_KEYS)
+        except JSONExtractionError:
+            result = None
+        if result == expected:
+            outcomes["ok"] += 1
+        elif mutation == "truncate":
+            # Objet tronqué : erreur typée, ou repli sur un autre objet complet de la prose
+            outcomes["truncated"] += 1
+        else:
+            outcomes["wrong"] += 1
+    print(f"{requests} mutated responses: {outcomes}")
+
+
+def _legacy_models():
+    """Anciens modèles pydantic (BaseModel sans coercition), recopiés pour comparaison"""
+    from typing import List, Optional
+    from pydantic import BaseModel, Field
+
+    class EarnRate(BaseModel):
+        regular_spending: Optional[str] = Field(alias="regularSpending", default=None)
+
+    class WelcomeOffer(BaseModel):
+        bonus_points: Optional[int] = Field(alias="bonusPoints", default=None)
+        description: Optional[str] = Field(alias="description", default=None)
+
+    class InterestRate(BaseModel):
+        purchase_rate: Optional[str] = Field(alias="purchaseRate", default=None)
+        cash_advance_rate: Optional[str] = Field(alias="cashAdvanceRate", default=None)
+        balance_transfer_rate: Optional[str] = Field(alias="balanceTransferRate", default=None)
+
+    class Rewards(BaseModel):
+        program: Optional[str] = Field(alias="program", default=None)
+        earn_rates: Optional[EarnRate] = Field(alias="earnRates", default=None)
+        redemption_options: Optional[List[str]] = Field(alias="redemptionOptions", default=None)
+
+    class CreditCard(BaseModel):
+        card_name: Optional[str] = Field(alias="cardName")
+        issuer: Optional[str] = Field(alias="issuer")
+        annual_fee: Optional[str] = Field(alias="annualFee")
+        interest_rate: Optional[InterestRate] = Field(alias="interestRate")
+        rewards: Optional[Rewards] = Field(alias="rewardsProgram")
+        perks: Optional[List[str]] = Field(alias="mainBenefits")
+        credit_score: Optional[str] = Field(alias="creditScoreRecommendation")
+        introductory_offer: Optional[WelcomeOffer] = Field(alias="welcomeOffer", default=None)
+        foreign_fee: Optional[str] = Field(alias="foreignTransactionFee")
+        source: Optional[str] = Field(alias="officialWebsite")
+
+    return CreditCard
+
+
+_LegacyCreditCard = None
+
+
+def _legacy_validate_dict(response_text: dict) -> dict:
+    """Ancienne implémentation de validate_dict (correction manuelle + CreditCard(**d) + model_dump)"""
+    global _LegacyCreditCard
+    if _LegacyCreditCard is None:
+        _LegacyCreditCard = _legacy_models()
+    if "annualFee" in response_text and isinstance(response_text["annualFee"], int):
+        response_text["annualFee"] = str(response_text["annualFee"])
+    return _LegacyCreditCard(**response_text).model_dump(by_alias=True)
+
+
+def bench_validate(requests: int) -> None:
+    """Compare l'ancien validate_dict au moteur TypeAdapter (dict, octets JSON, liste)"""
+    import copy
+    import json
+    from fake_provider import SAMPLE_CARD
+    from validation import validate_card, validate_cards
+
+    card = copy.deepcopy(SAMPLE_CARD)
+    card["annualFee"] = 95  # frais numérique, corrigé par les deux chemins
+    raw = json.dumps(card).encode()
+    cards = [card] * 100
+    raw_list = json.dumps(cards).encode()
+
+    def null_strings(value):
+        # Seul écart voulu avec l'ancien chemin : le texte "null" devient null
+        if isinstance(value, dict):
+            return {key: null_strings(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [null_strings(item) for item in value]
+        return None if value == "null" else value
+
+    assert validate_card(card) == null_strings(_legacy_validate_dict(copy.deepcopy(card)))
+
+    scenarios = {
+        # La copie est nécessaire à l'ancien chemin qui modifie son entrée ; elle est comptée à part
+        "deepcopy": lambda: copy.deepcopy(card),
+        "legacy": lambda: _legacy_validate_dict(copy.deepcopy(card)),
+        "adapter-dict": lambda: validate_card(card),
+        "adapter-json": lambda: validate_card(raw),
+        "loads+legacy": lambda: _legacy_validate_dict(json.loads(raw)),
+        "list-dict/100": lambda: validate_cards(cards),
+        "list-json/100": lambda: validate_cards(raw_list),
+    }
+    for name, fn in scenarios.items():
+        per_call = 100 if name.endswith("/100") else 1
+        rounds = max(1, requests // per_call)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<16} {elapsed / (rounds * per_call) * 1e6:8.2f} us/card")
+
+
+def _legacy_api_messages(selected_api: str, card_choice: str) -> list:
+    """Ancienne disposition : le nom de la carte dans la première phrase de la spécification"""
+    from core_functions import CARD_SPEC_PROMPT, build_api_messages
+
+    spec = CARD_SPEC_PROMPT.replace(
+        "the Canadian card named at the end of the request, with", f"the {card_choice} Canadian card with"
+    )
+    messages = build_api_messages(selected_api, card_choice)[:-1]
+    if selected_api == "openai":
+        return [{"role": "system", "content": spec}]
+    return [*messages, {"role": "user", "content": spec}]
+
+
+def bench_prompt(requests: int) -> None:
+    """Part des jetons de prompt servis depuis le cache de préfixe, ancienne et nouvelle disposition"""
+    import contextlib
+    import io
+    from client_registry import ClientRegistry
+    from core_functions import build_api_messages, execute_chat_completion
+    from metrics import metrics
+
+    server = start_fake_provider()
+    registry = ClientRegistry()
+    for api in ("openai", "perplexity"):
+        client = registry.get(api, "bench", server.base_url)
+        for layout, build in (("legacy", _legacy_api_messages), ("prefix", build_api_messages)):
+            model = f"{layout}-{api}"
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i in range(requests):
+                    execute_chat_completion(client, api, model, build(api, f"Card number {i}"))
+            prompt = metrics.value("prompt_tokens_total", api=api, model=model)
+            cached = metrics.value("prompt_cached_tokens_total", api=api, model=model)
+            print(f"{api:<11} {layout:<7} prompt={prompt:8.0f} cached={cached:8.0f} ({cached / prompt:6.1%})")
+    registry.close_all()
+    server.shutdown()
+
+
+def bench_ratelimit(requests: int) -> None:
+    """Rafale de requêtes contre un faux fournisseur limité (429) : sans et avec l'ordonnanceur"""
+    import contextlib
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+    from openai import OpenAIError
+    from client_registry import ClientRegistry, _fingerprint
+    from core_functions import build_api_messages, execute_chat_completion
+    from rate_limiter import RateLimitTimeout, RateLimiter, _limiters
+
+    # Limite du faux fournisseur : ~20 % de la rafale dépasse le budget
+    rpm = max(1, requests * 4 // 5)
+    messages = build_api_messages("openai", "bench card")
+
+    def direct(client):
+        # Ancien comportement : l'erreur 429 remonte à l'utilisateur (502)
+        try:
+            client.with_options(max_retries=0).chat.completions.create(model="fake", messages=messages)
+            return True
+        except OpenAIError:
+            return False
+
+    def scheduled(client):
+        try:
+            return execute_chat_completion(client, "openai", "fake", messages)[1]
+        except RateLimitTimeout:
+            return False
+
+    registry = ClientRegistry()
+    for label, call in (("direct", direct), ("scheduled", scheduled), ("adaptive", scheduled)):
+        server = start_fake_provider(rpm=rpm)
+        api_key = f"bench-{label}"
+        if label != "adaptive":
+            # Budget configuré comme celui du fournisseur (OPENAI_RPM en production) ;
+            # "adaptive" part du budget par défaut et l'ajuste avec les en-têtes et les 429
+            _limiters[("openai", _fingerprint(api_key))] = RateLimiter(rpm, 0, name="openai")
+        client = registry.get("openai", api_key, server.base_url)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(lambda _: call(client), range(requests)))
+        elapsed = time.perf_counter() - start
+        print(f"{label:<10} ok={sum(results):<5} failed={results.count(False):<5} "
+              f"429 served={server.rejected:<5} elapsed={elapsed:6.2f} s")
+        server.shutdown()
+    registry.close_all()
+
+
+def _percentile(samples: list, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def bench_resilience(requests: int) -> None:
+    """Traîne de latence, erreurs 503 et panne franche : appel simple contre couverture, essais et disjoncteur"""
+    import contextlib
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+    from client_registry import ClientRegistry, _fingerprint
+    from core_functions import build_api_messages, execute_chat_completion
+    from metrics import metrics
+    from pipeline import _hedged
+    from rate_limiter import RateLimiter, _limiters
+    from resilience import CircuitBreaker, _breakers, hedge_budget, latencies
+
+    messages = build_api_messages("openai", "bench card")
+    registry = ClientRegistry()
+
+    def unlimited_client(server, api_key: str):
+        # Pas de budget requêtes/jetons : seul le comportement face aux pannes est mesuré
+        _limiters[("openai", _fingerprint(api_key))] = RateLimiter(0, 0, name="openai")
+        return registry.get("openai", api_key, server.base_url)
+
+    def timed(call):
+        start = time.perf_counter()
+        try:
+            ok = call()
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    def run(call, workers: int = 8) -> tuple:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda _: timed(call), range(requests)))
+        return [ok for ok, _ in results], [seconds for _, seconds in results], time.perf_counter() - start
+
+    with contextlib.redirect_stdout(io.StringIO()) as quiet:
+        # 1. Traîne : 3 % des réponses prennent 1 s au lieu de 50 ms
+        server = start_fake_provider(latency=0.05, slow_rate=0.03, slow_latency=1.0)
+        client = unlimited_client(server, "bench-tail")
+        single = lambda: execute_chat_completion(client, "openai", "fake", messages)[1]
+        hedge = lambda: execute_chat_completion(client, "openai", "fake-hedge", messages)[1]
+        tail = {"single": run(single)}
+        # Délai de couverture = p95 observé pendant la série sans couverture
+        delay = latencies.quantile("openai", "fake")
+        tail["hedged"] = run(lambda: hedge_budget.on_lookup() or _hedged(single, hedge, delay, "openai", "fake")[1])
+        server.shutdown()
+
+        # 2. Erreurs transitoires : 20 % de 503
+        server = start_fake_provider(error_rate=0.2)
+        client = unlimited_client(server, "bench-errors")
+        errors = {
+            "no retry": run(lambda: bool(client.chat.completions.create(model="fake", messages=messages))),
+            "retried": run(lambda: execute_chat_completion(client, "openai", "fake", messages)[1]),
+        }
+        server.shutdown()
+
+        # 3. Panne franche : toutes les requêtes reçoivent un 503
+        outage = {}
+        for label, threshold in (("no breaker", 0), ("breaker", 5)):
+            _breakers["openai"] = CircuitBreaker("openai", failure_threshold=threshold)
+            server = start_fake_provider(error_rate=1.0)
+            client = unlimited_client(server, f"bench-{label}")
+            results = run(lambda: execute_chat_completion(client, "openai", "fake", messages)[1])
+            outage[label] = (*results, server.received)
+            server.shutdown()
+        _breakers.clear()
+    registry.close_all()
+    del quiet
+
+    print(f"tail (hedge after p95 = {delay * 1000:.0f} ms)")
+    for label, (_, seconds, _) in tail.items():
+        print(f"  {label:<10} p50={_percentile(seconds, 0.5) * 1000:7.1f} ms  "
+              f"p95={_percentile(seconds, 0.95) * 1000:7.1f} ms  p99={_percentile(seconds, 0.99) * 1000:7.1f} ms")
+    fired = metrics.value("hedges_fired_total", api="openai", model="fake")
+    print(f"  hedges fired={fired:.0f} ({fired / requests:.1%})")
+    print("transient 503 (20 %)")
+    for label, (results, _, elapsed) in errors.items():
+        print(f"  {label:<10} ok={sum(results):<5} failed={results.count(False):<5} elapsed={elapsed:6.2f} s")
+    print("outage (100 % 503)")
+    for label, (results, _, elapsed, received) in outage.items():
+        print(f"  {label:<10} failed={results.count(False):<5} sent to provider={received:<5} elapsed={elapsed:6.2f} s")
+
+
+def bench_card_index(requests: int) -> None:
+    """Index de noms de cartes : 30 000 cartes synthétiques, saisies avec faute de frappe et préfixes"""
+    import random
+    from card_index import CardIndex, normalize_tokens
+
+    rng = random.Random(1)
+    issuers = ["American Express", "TD", "BMO", "RBC", "CIBC", "Scotiabank", "Desjardins", "National Bank",
+               "Tangerine", "MBNA", "Capital One", "HSBC", "Simplii", "PC Financial", "Rogers", "Brim"]
+    words = ["Gold", "Platinum", "Cobalt", "Aeroplan", "Avion", "Cash Back", "Rewards", "Travel", "Infinite",
+             "Privilege", "World Elite", "Select", "Student", "Business", "Momentum", "Passport", "Scene+",
+             "Value", "Low Rate", "Air Miles", "Marriott", "Bonvoy", "Essential", "First Class", "Odyssey",
+             "Eclipse", "Ultimate", "Preferred", "Classic", "Signature"]
+    networks = ["Visa", "Mastercard", "Visa Infinite", "World Elite Mastercard", "Card"]
+    names = set()
+    while len(names) < 30000:
+        names.add(f"{rng.choice(issuers)} {' '.join(rng.sample(words, rng.randint(1, 3)))} {rng.choice(networks)}")
+    names = sorted(names)
+
+    index = CardIndex()
+    start = time.perf_counter()
+    for name in names:
+        index.add(name)
+    print(f"build        {time.perf_counter() - start:8.2f} s     {index.stats()}")
+
+    def typo(name):
+        position = rng.randrange(len(name))
+        return name[:position] + name[position + 1:]
+
+    queries = [(name, typo(name)) for name in rng.sample(names, min(requests, len(names)))]
+    start = time.perf_counter()
+    found = [(name, index.match(query)) for name, query in queries]
+    elapsed = time.perf_counter() - start
+    matched = sum(1 for _, result in found if result)
+    wrong = sum(1 for name, result in found if result and result[0]["cardName"] != name)
+    print(f"match/typo   {elapsed / len(queries) * 1e6:8.1f} us    matched={matched}/{len(queries)} wrong={wrong}")
+
+    # Un mot en moins ou en plus : autre carte (ou carte inconnue), jamais celle-ci
+    def other_card(name):
+        name_words = name.split()
+        if len(name_words) > 2 and rng.random() < 0.5:
+            del name_words[rng.randrange(1, len(name_words))]
+        else:
+            name_words.insert(rng.randrange(1, len(name_words)), rng.choice(["Privilege", "World Elite", "Student"]))
+        return " ".join(name_words)
+
+    merged = sum(
+        1 for name in rng.sample(names, min(requests, len(names)))
+        if (result := index.match(query := other_card(name))) and result[0]["cardName"] == name
+        and result[0]["id"] != " ".join(normalize_tokens(query))
+    )
+    print(f"match/other  merged into the original card={merged}")
+
+    prefixes = ["amex go", "td aer", "bmo cash", "scotia", "world eli"]
+    start = time.perf_counter()
+    for i in range(requests):
+        index.suggest(prefixes[i % len(prefixes)])
+    print(f"suggest      {(time.perf_counter() - start) / requests * 1e6:8.1f} us")
+
+
+def bench_warm(requests: int) -> None:
+    """Trafic utilisateur (loi de Zipf sur 20 cartes, TTL court) sans puis avec le warmer en arrière-plan"""
+    import io
+    import random
+    import threading
+    import cache
+    import config
+    import pipeline
+    from client_registry import _fingerprint
+    from rate_limiter import RateLimiter, _limiters
+    from warmer import CardWarmer
+
+    ttl = 2.0
+    server = start_fake_provider(latency=0.2)
+    config.PROVIDER_BASE_URLS["openai"] = server.base_url
+    os.environ["OPENAI_KEY"] = "bench-warm"
+    _limiters[("openai", _fingerprint("bench-warm"))] = RateLimiter(0, 0, name="openai")
+    # Le faux fournisseur renvoie toujours la même carte : pas de rapprochement des noms
+    pipeline.CARD_CANONICALIZE = False
+    cards = [f"Bench card {i}" for i in range(20)]
+    weights = [1 / (rank + 1) for rank in range(len(cards))]
+
+    def traffic(seed: int) -> list:
+        rng = random.Random(seed)
+        seconds = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            pipeline.lookup_card(rng.choices(cards, weights)[0], "openai", "fake")
+            seconds.append(time.perf_counter() - start)
+            time.sleep(0.01)
+        return seconds
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        cache._result_cache = cache.ResultCache(db_path=os.path.join(workdir, "cold.db"), ttl_seconds=ttl)
+        results["no warmer"] = traffic(1)
+
+        # Le warmer lit les cartes populaires dans card_requests : une minute de trafic préalable
+        cache._result_cache = cache.ResultCache(db_path=os.path.join(workdir, "warm.db"), ttl_seconds=ttl)
+        for card in cards:
+            cache._result_cache.get(card, "openai", "fake")
+        warmer = CardWarmer(selected_api="openai", top=len(cards), concurrency=4, max_qps=50,
+                            max_lookups_per_hour=100000, ttl_seconds=ttl)
+        stop = threading.Event()
+
+        def warm():
+            while not stop.wait(ttl * 0.2):
+                warmer.run_once()
+
+        thread = threading.Thread(target=warm, daemon=True)
+        thread.start()
+        results["warmer"] = traffic(1)
+        stop.set()
+        thread.join()
+        report = warmer.report()
+    server.shutdown()
+
+    for label, seconds in results.items():
+        hits = sum(1 for value in seconds if value < 0.1)
+        print(f"{label:<10} p50={_percentile(seconds, 0.5) * 1000:7.1f} ms  "
+              f"p95={_percentile(seconds, 0.95) * 1000:7.1f} ms  local={hits / len(seconds):6.1%}")
+    print(f"coverage={report['coverage']:.0%} ({report['covered']}/{report['targets']})  "
+          f"max age={report['max_age_seconds'] or 0:.2f} s  ttl={ttl:.0f} s")
+
+
+def bench_cards_query(requests: int) -> None:
+    """GET /cards sur 50 000 cartes : catalogue en colonnes contre analyse des chaînes à chaque requête"""
+    import random
+    from card_catalog import COLUMNS, CardCatalog, parse_search_params
+
+    rng = random.Random(2)
+    fees = ["0$", "$0", "None", "Aucun", "$39", "120$", "$139 first year waived", "150 $", "$599", "799$"]
+    cards = [
+        {
+            "cardName": f"Bench Card {i}",
+            "issuer": rng.choice(["TD", "RBC", "BMO", "CIBC", "Scotiabank"]),
+            "annualFee": rng.choice(fees),
+            "interestRate": {
+                "purchaseRate": f"{rng.uniform(9, 30):.2f}%",
+                "cashAdvanceRate": f"{rng.uniform(12, 30):.2f} %",
+                "balanceTransferRate": rng.choice([None, f"{rng.uniform(0, 25):.2f}%"]),
+            },
+            "foreignTransactionFee": rng.choice(["2.5%", "None", "0%", "2,5 %"]),
+            "welcomeOffer": {"bonusPoints": rng.choice([None, 10000, 25000, 60000])},
+        }
+        for i in range(50000)
+    ]
+    queries = [
+        "max_annual_fee=150&max_purchase_rate=20&sort=annual_fee",
+        "max_annual_fee=0&sort=purchase_rate",
+        "min_bonus_points=50000&issuer=TD&sort=-bonus_points",
+        "sort=purchase_rate",
+        "max_foreign_fee=0&max_purchase_rate=12",
+    ]
+    searches = [parse_search_params(dict(pair.split("=") for pair in query.split("&"))) for query in queries]
+
+    catalog = CardCatalog()
+    start = time.perf_counter()
+    catalog.add_many(cards)
+    print(f"build        {time.perf_counter() - start:8.2f} s     {catalog.stats()['cards']} cards")
+
+    start = time.perf_counter()
+    for i in range(requests):
+        catalog.add({**cards[i % len(cards)], "annualFee": f"{i % 500}$"})
+    print(f"update       {(time.perf_counter() - start) / requests * 1e6:8.1f} us")
+
+    def naive(search):
+        # Ancien fonctionnement : chaque requête relit et analyse toutes les cartes
+        matched = []
+        for card in cards:
+            values = {column: extract(card) for column, extract in COLUMNS.items()}
+            if all(
+                (low is None or values[column] >= low) and (high is None or values[column] <= high)
+                for column, (low, high) in search["ranges"].items()
+            ) and search.get("issuer") in (None, card["issuer"]):
+                matched.append(values)
+        if "sort" in search:
+            matched.sort(key=lambda values: values[search["sort"]], reverse=search["descending"])
+        return matched[:search.get("limit", 20)]
+
+    for query, search in zip(queries, searches):
+        start = time.perf_counter()
+        for _ in range(requests):
+            result = catalog.search(**search)
+        indexed = (time.perf_counter() - start) / requests
+        start = time.perf_counter()
+        naive(search)
+        scan = time.perf_counter() - start
+        print(f"{query:<56} total={result['total']:<6} indexed={indexed * 1000:7.3f} ms  scan={scan * 1000:7.1f} ms")
+
+
+def _http(connection, method: str, path: str, headers: dict, body: bytes = None) -> tuple:
+    """Une requête http.client (corps non décompressé)
+
+    Returns:
+        tuple: (statut, en-têtes en minuscules, corps, octets sur le réseau : ligne de statut, en-têtes et corps)
+    """
+    connection.request(method, path, body, headers)
+    response = connection.getresponse()
+    content = response.read()
+    raw_headers = response.getheaders()
+    wire = len(f"HTTP/1.1 {response.status} {response.reason}\r\n")
+    wire += sum(len(name) + len(value) + 4 for name, value in raw_headers) + 2 + len(content)
+    return response.status, {name.lower(): value for name, value in raw_headers}, content, wire
+
+
+def _server_cpu(connection) -> float:
+    """Temps CPU (s) consommé par le serveur, lu dans process_cpu_seconds_total de /metrics"""
+    _, _, content, _ = _http(connection, "GET", "/metrics", {"Accept-Encoding": "identity"})
+    for line in content.decode("utf-8").splitlines():
+        if line.startswith("process_cpu_seconds_total "):
+            return float(line.split()[1])
+    raise RuntimeError("process_cpu_seconds_total missing from /metrics")
+
+
+def bench_card_http(requests: int) -> None:
+    """Octets transmis et CPU serveur par requête : POST /process contre GET (gzip/br, fields=, 304)"""
+    import http.client
+    from urllib.parse import urlencode, urlsplit
+    from card_http import _brotli
+
+    params = {"card_choice": "bench card", "selected_api": "openai", "selected_model": "fake"}
+    # (libellé, méthode, paramètres supplémentaires, en-têtes) ; "etag" est remplacé par l'ETag reçu
+    scenarios = [
+        ("post", "POST", {}, {"Accept-Encoding": "identity"}),
+        ("get", "GET", {}, {"Accept-Encoding": "identity"}),
+        ("get gzip", "GET", {}, {"Accept-Encoding": "gzip"}),
+        *([("get br", "GET", {}, {"Accept-Encoding": "br, gzip"})] if _brotli() else []),
+        ("get fields", "GET", {"fields": "cardName,annualFee,interestRate"}, {"Accept-Encoding": "gzip"}),
+        ("revalidate", "GET", {}, {"Accept-Encoding": "gzip", "If-None-Match": "etag"}),
+    ]
+    if not _brotli():
+        print("brotli not installed: br scenario skipped (pip install brotli)")
+
+    post_body = json.dumps(params).encode()
+    with _backend_servers(["auto", "async"]) as (urls, _, _):
+        for mode, base_url in urls.items():
+            parts = urlsplit(base_url)
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+            # Premier appel : la carte passe en cache, les scénarios mesurent le seul service HTTP
+            _, first_headers, _, _ = _http(connection, "GET", f"/process?{urlencode(params)}", {"Accept-Encoding": "gzip"})
+            etag = first_headers["etag"]
+            baseline = None
+            for label, method, extra, headers in scenarios:
+                headers = {name: etag if value == "etag" else value for name, value in headers.items()}
+                latencies, sizes, statuses = [], 0, set()
+                cpu_before = _server_cpu(connection)
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    if method == "POST":
+                        status, _, _, wire = _http(
+                            connection, "POST", "/process", {**headers, "Content-Type": "application/json"}, post_body
+                        )
+                    else:
+                        status, _, _, wire = _http(connection, "GET", f"/process?{urlencode({**params, **extra})}", headers)
+                    latencies.append(time.perf_counter() - start)
+                    sizes += wire
+                    statuses.add(status)
+                cpu = (_server_cpu(connection) - cpu_before) / requests
+                size = sizes / requests
+                baseline = baseline or size
+                print(
+                    f"{mode:<6} {label:<11} status={','.join(map(str, sorted(statuses))):<4} "
+                    f"bytes={size:7.0f} ({size / baseline - 1:+7.1%})  server cpu={cpu * 1000:6.3f} ms  "
+                    f"p50={statistics.median(latencies) * 1000:6.2f} ms"
+                )
+            connection.close()
+
+
+BENCHMARKS = {
+    "clients": bench_clients,
+    "load": bench_load,
+    "extract": bench_extract,
+    "fuzz-extract": bench_fuzz_extract,
+    "validate": bench_validate,
+    "prompt": bench_prompt,
+    "ratelimit": bench_ratelimit,
+    "resilience": bench_resilience,
+    "card-index": bench_card_index,
+    "warm": bench_warm,
+    "cards-query": bench_cards_query,
+    "suite": bench_suite,
+    "imports": bench_imports,
+    "card-http": bench_card_http,
+}
+
+
+# python bench.py clients --requests 200
+# python bench.py load --requests 500 --concurrency 200 --latency 0.5
+# python bench.py extract --requests 2000
+# python bench.py fuzz-extract --requests 10000
+# python bench.py validate --requests 20000
+# python bench.py prompt --requests 50
+# python bench.py ratelimit --requests 100
+# python bench.py resilience --requests 200
+# python bench.py card-index --requests 1000
+# python bench.py warm --requests 500
+# python bench.py cards-query --requests 1000
+# python bench.py suite --requests 200 --levels 4,16,64 --save-baseline
+# python bench.py imports --requests 10 --save-baseline
+# python bench.py card-http --requests 500
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend benchmarks against a local fake provider")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario (default: 200)")
+    parser.add_argument("--concurrency", type=int, help="Concurrent requests in flight (load benchmarks)")
+    parser.add_argument("--latency", type=float, help="Fake provider latency in seconds (load benchmarks)")
+    parser.add_argument("--levels", help="Comma-separated concurrency levels (suite, default: 4,16,64)")
+    parser.add_argument("--baseline", help="Baseline JSON file (suite, imports)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline (suite, imports)")
+    parser.add_argument("--threshold", type=float, help="Relative change reported as a regression (suite: 0.15, imports: 0.25)")
+    args = parser.parse_args()
+
+    options = {
+        name: value
+        for name in ("concurrency", "latency", "levels", "baseline", "save_baseline", "threshold")
+        if (value := getattr(args, name)) not in (None, False)
+    }
+    BENCHMARKS[args.benchmark](args.requests, **options)
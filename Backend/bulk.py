@@ -0,0 +1,263 @@
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, Optional, Set, Tuple
+
+from config import AUTO_MODEL, BULK_PROGRESS_INTERVAL, BULK_WORKERS, MSG_COLOR, print_colored
+from core_functions import fetch_api_keys
+from error_handlers import handle_api_errors
+from metrics import request_timings
+from pipeline import CardLookupError, lookup_card, resolve_model
+from server_logging import setup_cli_logging
+
+# Colonnes acceptées pour le nom de la carte ; sinon la première colonne, sans en-tête
+_CARD_COLUMNS = ("card_choice", "card", "card_name", "cardName")
+
+
+def read_cards(path: str) -> Iterator[Tuple[int, str]]:
+    """Parcourt le CSV ligne par ligne sans le charger en mémoire
+
+    La carte est lue dans la colonne card_choice (ou card, card_name,
+    cardName) si l'en-tête en contient une, sinon dans la première colonne.
+
+    Yields:
+        tuple: (numéro de ligne de données, à partir de 1 ; nom de la carte)
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        column = next((header.index(name) for name in _CARD_COLUMNS if name in header), None)
+        rows = reader if column is not None else _prepend(header, reader)
+        for row_number, row in enumerate(rows, start=1):
+            card_choice = row[column or 0].strip() if len(row) > (column or 0) else ""
+            if card_choice:
+                yield row_number, card_choice
+
+
+def _prepend(first: list, rows: Iterator[list]) -> Iterator[list]:
+    yield first
+    yield from rows
+
+
+def _read_records(path: str) -> Iterator[Tuple[Tuple[int, str], dict]]:
+    """Enregistrements d'un fichier JSONL de résultats, avec leur clé (numéro de ligne, carte)
+
+    Une dernière ligne tronquée par un arrêt brutal est supprimée du fichier.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        content = f.read()
+        end = content.rfind(b"\n") + 1
+        if end < len(content):
+            f.truncate(end)
+    for line in content[:end].splitlines():
+        try:
+            record = json.loads(line)
+            yield (record["row"], record["card_choice"]), record
+        except (ValueError, KeyError, TypeError):
+            continue
+
+
+def completed_rows(path: str) -> Set[Tuple[int, str]]:
+    """Lignes déjà validées dans un fichier de sortie existant (point de reprise)
+
+    Chaque ligne est identifiée par son numéro et le nom de sa carte : un CSV
+    modifié entre deux exécutions (lignes ajoutées, retirées ou réordonnées)
+    ne fait pas sauter une carte qui n'a pas été recherchée.
+
+    Returns:
+        set: (numéro de ligne, carte) déjà traités
+    """
+    return {key for key, _ in _read_records(path)}
+
+
+def prune_errors(path: str, done_rows: Set[Tuple[int, str]]) -> None:
+    """Réécrit le fichier des échecs : un enregistrement par (numéro de ligne, carte), le plus récent
+
+    Les lignes validées depuis leur échec (done_rows) sont retirées.
+    """
+    if not os.path.exists(path):
+        return
+    latest = {key: record for key, record in _read_records(path) if key not in done_rows}
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        for record in latest.values():
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(f"{path}.tmp", path)
+
+
+def _lookup(row: int, card_choice: str, selected_api: str, selected_model: str) -> dict:
+    """Recherche une carte et convertit son erreur éventuelle en enregistrement
+
+    Le modèle "auto" est résolu ici, pour chaque carte ; l'enregistrement
+    porte le modèle choisi, la durée totale et celle de chaque étape
+    (millisecondes), comme l'en-tête Server-Timing de /process.
+    """
+    record = {"row": row, "card_choice": card_choice, "selected_api": selected_api, "selected_model": selected_model}
+    start = time.perf_counter()
+    with request_timings() as stages:
+        try:
+            # UnknownModelError / UnsupportedApiError : un échec de la ligne, pas de la commande
+            selected_model = record["selected_model"] = resolve_model(selected_api, selected_model)
+            record.update(status=200, data=lookup_card(card_choice, selected_api, selected_model))
+        except CardLookupError as e:
+            record.update(status=e.status_code, error=str(e))
+        except Exception as e:
+            handle_api_errors(e, selected_api)
+            record.update(status=500, error=str(e))
+    timings = {}
+    for stage, seconds in stages:
+        timings[stage] = timings.get(stage, 0.0) + seconds * 1000
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    record["timings"] = {stage: round(ms, 2) for stage, ms in timings.items()}
+    return record
+
+
+class _Progress:
+    """Ligne de progression : débit et temps restant estimé"""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.done = 0
+        self.failed = 0
+        self._started = time.monotonic()
+        self._shown_at = 0.0
+
+    def update(self, ok: bool) -> None:
+        self.done += 1
+        self.failed += 0 if ok else 1
+        if time.monotonic() - self._shown_at >= BULK_PROGRESS_INTERVAL:
+            self.show()
+
+    def show(self, end: str = "") -> None:
+        self._shown_at = time.monotonic()
+        elapsed = self._shown_at - self._started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.skipped - self.done
+        eta = f"{remaining / rate:,.0f} s" if rate > 0 else "-"
+        sys.stderr.write(
+            f"\r📦 {self.skipped + self.done}/{self.total} · échecs {self.failed} · "
+            f"{rate:.1f} cartes/s · reste {eta}   {end}"
+        )
+        sys.stderr.flush()
+
+
+def run_bulk(
+    input_path: str,
+    output_path: str,
+    selected_api: str = "openai",
+    selected_model: str = AUTO_MODEL,
+    workers: int = BULK_WORKERS,
+    errors_path: Optional[str] = None,
+) -> dict:
+    """Recherche toutes les cartes d'un CSV et écrit les résultats au fil de l'eau
+
+    Les cartes validées sont ajoutées à output_path (JSONL, une carte par
+    ligne avec son numéro de ligne d'entrée), les échecs à errors_path.
+    Relancée avec les mêmes fichiers, la commande saute les lignes déjà
+    présentes dans output_path : seules les cartes manquantes ou en échec
+    sont de nouveau demandées au fournisseur. Le fichier des échecs est
+    complété lui aussi, puis réduit au dernier échec de chaque ligne
+    encore non validée. Ctrl+C arrête la lecture
+    du CSV et laisse les recherches en cours se terminer et s'écrire.
+
+    Args:
+        input_path (str): CSV des cartes à rechercher
+        output_path (str): JSONL des cartes validées (complété, jamais écrasé)
+        selected_api (str): "openai" ou "perplexity"
+        selected_model (str): Nom du modèle, ou "auto"
+        workers (int): Recherches simultanées
+        errors_path (str): JSONL des échecs non résolus (défaut : <output>.errors.jsonl)
+
+    Returns:
+        dict: total, skipped, done, failed, interrupted
+
+    Raises:
+        SystemExit: Si la clé de l'API choisie est absente de l'environnement
+    """
+    from dotenv import load_dotenv
+
+    # Jamais de saisie au clavier : la clé doit venir de l'environnement (.env)
+    load_dotenv(override=True)
+    setup_cli_logging()
+    openai_key, perplexity_key = fetch_api_keys(selected_api, interactive=False)
+    if selected_api != "fake" and not (openai_key if selected_api == "openai" else perplexity_key):
+        print_colored(f"❌ Clé {selected_api} manquante dans l'environnement", **MSG_COLOR["error"])
+        sys.exit(1)
+
+    errors_path = errors_path or f"{os.path.splitext(output_path)[0]}.errors.jsonl"
+    done_rows = completed_rows(output_path)
+    prune_errors(errors_path, done_rows)
+    # Premier passage sur le CSV : total et lignes déjà faites, pour le temps restant
+    total = skipped = 0
+    for row, card_choice in read_cards(input_path):
+        total += 1
+        skipped += (row, card_choice) in done_rows
+    progress = _Progress(total, skipped)
+    if skipped:
+        print_colored(f"↩️ Reprise : {skipped} carte(s) déjà traitée(s)", **MSG_COLOR["info"])
+
+    interrupted = False
+    pending = set()
+    # Les messages de chaque recherche sont masqués au profit de la ligne de progression
+    with open(output_path, "a", encoding="utf-8") as output, \
+            open(errors_path, "a", encoding="utf-8") as errors, \
+            open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet), \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk") as executor:
+
+        def drain(block_until: int) -> None:
+            # Écrit les résultats terminés tant que plus de block_until recherches sont en cours
+            nonlocal pending
+            while len(pending) > block_until:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    ok = record["status"] == 200
+                    if ok:
+                        done_rows.add((record["row"], record["card_choice"]))
+                    target = output if ok else errors
+                    target.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    target.flush()
+                    progress.update(ok)
+
+        try:
+            for row, card_choice in read_cards(input_path):
+                if (row, card_choice) in done_rows:
+                    continue
+                pending.add(executor.submit(_lookup, row, card_choice, selected_api, selected_model))
+                # Lecture du CSV au rythme des recherches : au plus 2 x workers en attente
+                drain(2 * workers)
+            drain(0)
+        except KeyboardInterrupt:
+            interrupted = True
+            for future in pending:
+                future.cancel()
+            pending = {future for future in pending if not future.cancelled()}
+            drain(0)
+    # Échecs réessayés dans cette exécution : seul le plus récent reste, et aucun s'il a été validé
+    prune_errors(errors_path, done_rows)
+
+    progress.show(end="\n")
+    summary = {
+        "total": total,
+        "skipped": progress.skipped,
+        "done": progress.done,
+        "failed": progress.failed,
+        "interrupted": interrupted,
+    }
+    if interrupted:
+        print_colored("⏸️ Interrompu : relancez la même commande pour reprendre", **MSG_COLOR["warning"])
+    color = MSG_COLOR["success"] if not progress.failed else MSG_COLOR["warning"]
+    print_colored(
+        f"✅ {progress.done - progress.failed} carte(s) validée(s), {progress.failed} échec(s) "
+        f"({errors_path}), {progress.skipped} reprise(s)",
+        **color,
+    )
+    return summary
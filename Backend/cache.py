@@ -0,0 +1,295 @@
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import List, Optional
+
+from config import (
+    CACHE_DB_PATH,
+    CACHE_MAX_DISK_ENTRIES,
+    CACHE_MAX_MEMORY_ENTRIES,
+    CACHE_TTL_SECONDS,
+)
+from metrics import metrics
+
+
+def normalize_card_name(card_choice: str) -> str:
+    """Nom de carte insensible à la casse et aux espaces superflus"""
+    return " ".join(str(card_choice).split()).casefold()
+
+
+def normalize_cache_key(card_choice: str, selected_api: str, selected_model: str) -> str:
+    """Construit la clé de cache normalisée d'une recherche de carte
+
+    Args:
+        card_choice (str): Nom de la carte tel que saisi
+        selected_api (str): "openai" ou "perplexity"
+        selected_model (str): Nom du modèle
+
+    Returns:
+        str: Clé insensible à la casse et aux espaces superflus
+    """
+    card = normalize_card_name(card_choice)
+    api = str(selected_api).strip().lower()
+    model = str(selected_model).strip().lower()
+    return f"{api}|{model}|{card}"
+
+
+class ResultCache:
+    """Cache à deux niveaux des réponses validées
+
+    Le premier niveau est un LRU en mémoire, le second une table SQLite
+    qui survit aux redémarrages. Les deux niveaux partagent le même TTL.
+    Chaque lecture compte une demande de la carte ; les compteurs sont
+    écrits par lots dans card_requests (cartes populaires du warmer), avec
+    la date de dernière lecture des entrées (éviction du niveau disque).
+    Les payloads sont gardés en JSON : chaque lecture retourne une copie.
+    """
+
+    # Demandes accumulées en mémoire avant écriture dans card_requests
+    REQUEST_FLUSH_EVERY = 100
+
+    def __init__(
+        self,
+        db_path: Optional[str] = CACHE_DB_PATH,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        max_memory_entries: int = CACHE_MAX_MEMORY_ENTRIES,
+        max_disk_entries: int = CACHE_MAX_DISK_ENTRIES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()  # clé -> (horodatage, payload JSON)
+        self._requests = Counter()  # (carte, api, modèle) -> demandes pas encore écrites
+        self._accessed = {}  # clé -> dernière lecture pas encore écrite
+        self._pending_requests = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS card_cache ("
+                " key TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_card_cache_accessed ON card_cache (accessed_at)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS card_requests ("
+                " key TEXT PRIMARY KEY,"
+                " card_choice TEXT NOT NULL,"
+                " selected_api TEXT NOT NULL,"
+                " selected_model TEXT NOT NULL,"
+                " requests INTEGER NOT NULL,"
+                " last_requested REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _is_fresh(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds <= 0 or now - stored_at < self.ttl_seconds
+
+    def _remember(self, key: str, stored_at: float, payload_json: str) -> None:
+        # Appelé avec le verrou tenu
+        self._memory[key] = (stored_at, payload_json)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+            metrics.inc("cache_evictions_total", tier="memory")
+
+    def get(self, card_choice: str, selected_api: str, selected_model: str) -> Optional[dict]:
+        """Retourne une copie du payload validé en cache, ou None si absent ou expiré"""
+        key = normalize_cache_key(card_choice, selected_api, selected_model)
+        now = time.time()
+
+        with self._lock:
+            self._requests[(card_choice, selected_api, selected_model)] += 1
+            self._pending_requests += 1
+            if self._pending_requests >= self.REQUEST_FLUSH_EVERY:
+                self._flush_requests(now)
+
+            expired_tier = None
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, payload_json = entry
+                if self._is_fresh(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self._accessed[key] = now
+                    self._stats["memory_hits"] += 1
+                    metrics.inc("cache_lookups_total", result="memory_hit")
+                    return json.loads(payload_json)
+                del self._memory[key]
+                expired_tier = "memory"
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT payload, stored_at FROM card_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    payload_json, stored_at = row
+                    if self._is_fresh(stored_at, now):
+                        self._accessed[key] = now
+                        self._remember(key, stored_at, payload_json)
+                        self._stats["disk_hits"] += 1
+                        metrics.inc("cache_lookups_total", result="disk_hit")
+                        return json.loads(payload_json)
+                    self._db.execute("DELETE FROM card_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    expired_tier = expired_tier or "disk"
+
+            if expired_tier is not None:
+                # Une expiration par lecture, au nom du premier niveau qui avait l'entrée
+                self._stats["expired"] += 1
+                metrics.inc("cache_expired_total", tier=expired_tier)
+            self._stats["misses"] += 1
+            metrics.inc("cache_lookups_total", result="miss")
+            return None
+
+    def set(self, card_choice: str, selected_api: str, selected_model: str, payload: dict) -> None:
+        """Enregistre un payload validé dans les deux niveaux du cache"""
+        key = normalize_cache_key(card_choice, selected_api, selected_model)
+        now = time.time()
+
+        payload_json = json.dumps(payload, ensure_ascii=False)
+
+        with self._lock:
+            self._remember(key, now, payload_json)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO card_cache (key, payload, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, payload_json, now, now),
+            )
+            # Éviction par taille : on retire les entrées les moins récemment lues
+            self._flush_accesses()
+            (count,) = self._db.execute("SELECT COUNT(*) FROM card_cache").fetchone()
+            overflow = count - self.max_disk_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM card_cache WHERE key IN ("
+                    " SELECT key FROM card_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._stats["evictions"] += overflow
+                metrics.inc("cache_evictions_total", overflow, tier="disk")
+            self._db.commit()
+
+    def _flush_accesses(self) -> None:
+        # Appelé avec le verrou tenu ; le commit est laissé à l'appelant
+        if self._db is not None and self._accessed:
+            self._db.executemany(
+                "UPDATE card_cache SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()],
+            )
+        self._accessed.clear()
+
+    def _flush_requests(self, now: float) -> None:
+        # Appelé avec le verrou tenu
+        self._flush_accesses()
+        if self._db is not None:
+            if self._requests:
+                self._db.executemany(
+                    "INSERT INTO card_requests (key, card_choice, selected_api, selected_model, requests, last_requested)"
+                    " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET"
+                    " requests = requests + excluded.requests, last_requested = excluded.last_requested,"
+                    " card_choice = excluded.card_choice",
+                    [
+                        (normalize_cache_key(*target), *target, count, now)
+                        for target, count in self._requests.items()
+                    ],
+                )
+            self._db.commit()
+        self._requests.clear()
+        self._pending_requests = 0
+
+    def age(self, card_choice: str, selected_api: str, selected_model: str) -> Optional[float]:
+        """Âge en secondes de l'entrée en cache (même expirée), None si absente
+
+        Ne compte pas comme une demande et ne modifie pas l'ordre du LRU.
+        """
+        key = normalize_cache_key(card_choice, selected_api, selected_model)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                return now - entry[0]
+            if self._db is not None:
+                row = self._db.execute("SELECT stored_at FROM card_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    return now - row[0]
+        return None
+
+    def popular(self, limit: int, since: float = 0.0) -> List[tuple]:
+        """Cartes les plus demandées depuis since (horodatage)
+
+        Returns:
+            list: (carte, api, modèle, demandes), de la plus demandée à la moins demandée
+        """
+        with self._lock:
+            self._flush_requests(time.time())
+            if self._db is None:
+                return []
+            return self._db.execute(
+                "SELECT card_choice, selected_api, selected_model, requests FROM card_requests"
+                " WHERE last_requested >= ? ORDER BY requests DESC LIMIT ?",
+                (since, limit),
+            ).fetchall()
+
+    def invalidate(self, card_choice: str, selected_api: str, selected_model: str) -> None:
+        """Supprime une entrée des deux niveaux"""
+        key = normalize_cache_key(card_choice, selected_api, selected_model)
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM card_cache WHERE key = ?", (key,))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Retourne les compteurs de succès/échecs et la taille de chaque niveau"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                (stats["disk_entries"],) = self._db.execute(
+                    "SELECT COUNT(*) FROM card_cache"
+                ).fetchone()
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_ratio"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_requests(time.time())
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Retourne le cache partagé du processus, fermé automatiquement à la sortie"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache()
+                atexit.register(_result_cache.close)
+    return _result_cache
@@ -0,0 +1,312 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from card_index import normalize_tokens
+from config import CARDS_QUERY_LIMIT, CARDS_QUERY_MAX_LIMIT
+from results_store import get_results_store
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_THOUSANDS = re.compile(r"\d{1,3}(?:,\d{3})+")
+# Mentions qui signifient "pas de frais"
+_NO_FEE = re.compile(r"\b(none|no|aucuns?|free|gratuite?s?|sans|nil)\b", re.IGNORECASE)
+
+
+def _parse_number(token: str) -> float:
+    # "1,000.50" et "1,000" -> séparateurs de milliers ; "21,99" -> virgule décimale
+    if "." in token or _THOUSANDS.fullmatch(token):
+        token = token.replace(",", "")
+    try:
+        return float(token.replace(",", "."))
+    except ValueError:
+        return math.nan
+
+
+def parse_fee(text) -> float:
+    """Montant numérique d'un champ de frais saisi librement
+
+    Exemples : "250$" -> 250.0, "$0 first year, then $120" -> 120.0 (le
+    plus élevé), "2.5%" -> 2.5, "None" -> 0.0. NaN si le champ est vide
+    ou illisible.
+    """
+    if text is None:
+        return math.nan
+    if isinstance(text, (int, float)):
+        return float(text)
+    numbers = [number for number in map(_parse_number, _NUMBER.findall(text)) if not math.isnan(number)]
+    if numbers:
+        return max(numbers)
+    return 0.0 if _NO_FEE.search(text) else math.nan
+
+
+def parse_rate(text) -> float:
+    """Taux en pourcentage d'un champ libre : "21.99%" -> 21.99 (premier taux cité)"""
+    if text is None:
+        return math.nan
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _NUMBER.search(text)
+    return _parse_number(match.group()) if match else math.nan
+
+
+def _nested(card: dict, *path):
+    for key in path:
+        card = card.get(key) if isinstance(card, dict) else None
+    return card
+
+
+# Colonne -> extraction depuis une carte validée (clés de l'alias JSON)
+COLUMNS = {
+    "annual_fee": lambda card: parse_fee(card.get("annualFee")),
+    "purchase_rate": lambda card: parse_rate(_nested(card, "interestRate", "purchaseRate")),
+    "cash_advance_rate": lambda card: parse_rate(_nested(card, "interestRate", "cashAdvanceRate")),
+    "balance_transfer_rate": lambda card: parse_rate(_nested(card, "interestRate", "balanceTransferRate")),
+    "foreign_fee": lambda card: parse_fee(card.get("foreignTransactionFee")),
+    "bonus_points": lambda card: parse_fee(_nested(card, "welcomeOffer", "bonusPoints")),
+}
+
+
+class CardCatalog:
+    """Index en colonnes des cartes validées, pour filtrer et trier sans relire le JSON
+
+    Chaque carte (identifiant = cardName normalisé, comme CardIndex) occupe
+    une ligne ; ses frais et taux sont analysés une seule fois et rangés
+    dans un tableau de flottants par colonne (NaN = inconnu). Chaque colonne
+    garde aussi ses valeurs connues triées : un filtre de plage est une
+    recherche dichotomique, et un tri top-k parcourt l'ordre déjà trié.
+    Une carte validée de nouveau remplace sa ligne.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}                   # identifiant -> ligne
+        self._names: List[str] = []                      # cardName de chaque ligne
+        self._issuers: List[Optional[str]] = []
+        self._columns = {column: array("d") for column in COLUMNS}
+        # Par colonne : valeurs connues triées et lignes correspondantes, dans le même ordre
+        self._sorted = {column: ([], []) for column in COLUMNS}
+        self._by_issuer: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, card: dict) -> Optional[str]:
+        """Ajoute ou remplace une carte validée
+
+        Returns:
+            str: Identifiant de la carte (None sans cardName)
+        """
+        with self._lock:
+            return self._upsert(card, keep_sorted=True)
+
+    def add_many(self, cards: Iterable[dict]) -> None:
+        """Ajoute un lot de cartes (construction initiale) en triant les colonnes une seule fois"""
+        with self._lock:
+            for card in cards:
+                self._upsert(card, keep_sorted=False)
+            for column, data in self._columns.items():
+                known = sorted((value, row) for row, value in enumerate(data) if not math.isnan(value))
+                self._sorted[column] = ([value for value, _ in known], [row for _, row in known])
+
+    def _upsert(self, card: dict, keep_sorted: bool) -> Optional[str]:
+        # Appelé avec le verrou tenu ; keep_sorted=False laisse à add_many le tri des colonnes
+        tokens = normalize_tokens(card.get("cardName") or "")
+        if not tokens:
+            return None
+        card_id = " ".join(tokens)
+        row = self._ids.get(card_id)
+        if row is None:
+            row = self._ids[card_id] = len(self._names)
+            self._names.append(card["cardName"])
+            self._issuers.append(None)
+            for data in self._columns.values():
+                data.append(math.nan)
+        else:
+            self._names[row] = card["cardName"]
+        self._set_issuer(row, card.get("issuer"))
+        for column, extract in COLUMNS.items():
+            if keep_sorted:
+                self._set_value(column, row, extract(card))
+            else:
+                self._columns[column][row] = extract(card)
+        return card_id
+
+    def _set_issuer(self, row: int, issuer: Optional[str]) -> None:
+        # Appelé avec le verrou tenu
+        previous = self._issuers[row]
+        if previous == issuer:
+            return
+        if previous is not None:
+            self._by_issuer[" ".join(normalize_tokens(previous))].discard(row)
+        self._issuers[row] = issuer
+        if issuer:
+            self._by_issuer.setdefault(" ".join(normalize_tokens(issuer)), set()).add(row)
+
+    def _set_value(self, column: str, row: int, value: float) -> None:
+        # Appelé avec le verrou tenu
+        values, rows = self._sorted[column]
+        previous = self._columns[column][row]
+        if previous == value or (math.isnan(previous) and math.isnan(value)):
+            return
+        if not math.isnan(previous):
+            position = bisect.bisect_left(values, previous)
+            while rows[position] != row:
+                position += 1
+            del values[position], rows[position]
+        self._columns[column][row] = value
+        if not math.isnan(value):
+            position = bisect.bisect_right(values, value)
+            values.insert(position, value)
+            rows.insert(position, row)
+
+    def search(
+        self,
+        ranges: Optional[Mapping[str, tuple]] = None,
+        issuer: Optional[str] = None,
+        sort: Optional[str] = None,
+        descending: bool = False,
+        limit: int = CARDS_QUERY_LIMIT,
+    ) -> dict:
+        """Cartes dont chaque colonne filtrée est dans sa plage, triées sur une colonne
+
+        Args:
+            ranges (dict): colonne -> (minimum, maximum), bornes incluses, None = non borné
+            issuer (str): Émetteur exact (sans casse ni accents)
+            sort (str): Colonne de tri ; les valeurs inconnues en dernier
+            descending (bool): Tri décroissant
+            limit (int): Nombre de cartes renvoyées
+
+        Returns:
+            dict: total (cartes correspondantes) et cards (les limit premières)
+        """
+        ranges = ranges or {}
+        with self._lock:
+            # Plages de lignes de chaque filtre, par dichotomie sur les colonnes triées
+            slices = []
+            for column, (low, high) in ranges.items():
+                values, rows = self._sorted[column]
+                start = 0 if low is None else bisect.bisect_left(values, low)
+                end = len(values) if high is None else bisect.bisect_right(values, high)
+                slices.append((max(0, end - start), column, rows, start, end))
+            if issuer is not None:
+                issuer_rows = self._by_issuer.get(" ".join(normalize_tokens(issuer)), set())
+                slices.append((len(issuer_rows), "issuer", issuer_rows, None, None))
+
+            if slices:
+                # Filtre le plus sélectif d'abord, les autres vérifiés ligne à ligne
+                _, first, rows, start, end = min(slices, key=lambda item: item[0])
+                candidates = list(rows) if start is None else rows[start:end]
+                for column, (low, high) in ranges.items():
+                    if column == first:
+                        continue
+                    data = self._columns[column]
+                    low = -math.inf if low is None else low
+                    high = math.inf if high is None else high
+                    candidates = [row for row in candidates if low <= data[row] <= high]
+                if issuer is not None and first != "issuer":
+                    candidates = [row for row in candidates if row in issuer_rows]
+                total = len(candidates)
+            else:
+                candidates = None
+                total = len(self._names)
+
+            selected = self._top(candidates, sort, descending, limit)
+            cards = [self._card(row) for row in selected]
+        return {"total": total, "cards": cards}
+
+    def _top(self, candidates: Optional[list], sort: Optional[str], descending: bool, limit: int) -> List[int]:
+        # Appelé avec le verrou tenu ; candidates None = toutes les lignes
+        if sort is None:
+            # Ordre d'ajout
+            return heapq.nsmallest(limit, candidates) if candidates is not None else list(range(min(limit, len(self._names))))
+        rows = self._sorted[sort][1]
+        if candidates is None or len(candidates) * 8 > len(self._names):
+            # Filtre peu sélectif : parcours de l'ordre trié jusqu'à limit correspondances
+            wanted = None if candidates is None else set(candidates)
+            selected = []
+            for row in reversed(rows) if descending else rows:
+                if wanted is None or row in wanted:
+                    selected.append(row)
+                    if len(selected) == limit:
+                        return selected
+            # Puis les cartes dont la valeur est inconnue
+            data = self._columns[sort]
+            pool = range(len(self._names)) if candidates is None else sorted(wanted)
+            selected.extend(row for row in pool if math.isnan(data[row]))
+            return selected[:limit]
+        data = self._columns[sort]
+        unknown = -math.inf if descending else math.inf
+        key = lambda row: unknown if math.isnan(data[row]) else data[row]
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(limit, candidates, key=key)
+
+    def _card(self, row: int) -> dict:
+        card = {"cardName": self._names[row], "issuer": self._issuers[row]}
+        for column in COLUMNS:
+            value = self._columns[column][row]
+            card[column] = None if math.isnan(value) else value
+        return card
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cards": len(self._names),
+                "known": {column: len(self._sorted[column][0]) for column in COLUMNS},
+            }
+
+
+def parse_search_params(params: Mapping[str, str]) -> dict:
+    """Arguments de CardCatalog.search depuis les paramètres d'URL de GET /cards
+
+    min_<colonne> / max_<colonne>, issuer, sort (préfixe "-" pour décroissant), limit.
+
+    Raises:
+        ValueError: Paramètre inconnu ou valeur non numérique
+    """
+    ranges: Dict[str, list] = {}
+    search = {"ranges": ranges}
+    for name, value in params.items():
+        bound, _, column = name.partition("_")
+        if bound in ("min", "max") and column in COLUMNS:
+            try:
+                number = float(value)
+            except ValueError:
+                raise ValueError(f"{name} doit être un nombre") from None
+            ranges.setdefault(column, [None, None])[0 if bound == "min" else 1] = number
+        elif name == "issuer":
+            search["issuer"] = value
+        elif name == "sort":
+            column = value.lstrip("-")
+            if column not in COLUMNS:
+                raise ValueError(f"sort doit être l'une des colonnes : {', '.join(COLUMNS)}")
+            search["sort"] = column
+            search["descending"] = value.startswith("-")
+        elif name == "limit":
+            try:
+                search["limit"] = max(1, min(int(value), CARDS_QUERY_MAX_LIMIT))
+            except ValueError:
+                raise ValueError("limit doit être un entier") from None
+        else:
+            raise ValueError(f"Paramètre inconnu : {name}")
+    search["ranges"] = {column: tuple(bounds) for column, bounds in ranges.items()}
+    return search
+
+
+_card_catalog: Optional[CardCatalog] = None
+_card_catalog_lock = threading.Lock()
+
+
+def get_card_catalog() -> CardCatalog:
+    """Retourne le catalogue partagé, construit au premier appel depuis l'historique des résultats"""
+    global _card_catalog
+    if _card_catalog is None:
+        with _card_catalog_lock:
+            if _card_catalog is None:
+                catalog = CardCatalog()
+                catalog.add_many(get_results_store().validated_cards())
+                _card_catalog = catalog
+    return _card_catalog
@@ -0,0 +1,187 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+from config import (
+    CARD_BROTLI_QUALITY,
+    CARD_COMPRESS_MIN_BYTES,
+    CARD_ENCODED_CACHE_SIZE,
+    CARD_GZIP_LEVEL,
+    CARD_HTTP_MAX_AGE,
+)
+from metrics import metrics
+from validation import CARD_KEYS
+
+_ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+def _brotli():
+    # Dépendance optionnelle (pip install brotli) : sans elle, seul gzip est proposé
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Clés de premier niveau demandées par ?fields=cardName,annualFee,interestRate
+
+    Returns:
+        tuple: Clés demandées, sans doublon (None : carte entière)
+
+    Raises:
+        ValueError: Clé inconnue du modèle CreditCard
+    """
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    if unknown := [field for field in fields if field not in CARD_KEYS]:
+        raise ValueError(f"Champs inconnus : {', '.join(unknown)} (disponibles : {', '.join(CARD_KEYS)})")
+    return fields or None
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Codage de contenu choisi d'après Accept-Encoding
+
+    Returns:
+        str: "br" (si le module brotli est installé), "gzip", ou None pour le corps brut
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip():
+            accepted[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for coding in ("br", "gzip") if _brotli() else ("gzip",):
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def _opaque_tag(tag: str) -> str:
+    # Comparaison faible (If-None-Match) : sans W/, sans guillemets, sans suffixe de codage
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Vrai si If-None-Match désigne la même représentation, quel que soit son codage"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    expected = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == expected for tag in if_none_match.split(","))
+
+
+class CardRepresentation(NamedTuple):
+    body: bytes
+    etag: str
+    encoding: Optional[str]
+
+
+class CardEncoder:
+    """Corps JSON compact d'une carte, son ETag fort et ses versions compressées
+
+    L'ETag est l'empreinte SHA-256 du JSON compact de la carte validée
+    (après projection) : il ne change que si le contenu change. Les corps
+    compressés sont gardés par (empreinte, codage) dans un LRU, une carte
+    populaire n'est donc compressée qu'une fois.
+    """
+
+    def __init__(self, max_entries: int = CARD_ENCODED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._compressed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, card: dict, fields: Optional[Tuple[str, ...]] = None, encoding: Optional[str] = None) -> CardRepresentation:
+        """Représentation de la carte (projetée sur fields) dans le codage demandé
+
+        Les corps de moins de CARD_COMPRESS_MIN_BYTES restent bruts.
+        """
+        if fields is not None:
+            # Ordre du modèle, quel que soit l'ordre de fields : même corps, même ETag
+            card = {key: value for key, value in card.items() if key in fields}
+        body = json.dumps(card, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        if encoding is None or len(body) < CARD_COMPRESS_MIN_BYTES:
+            return CardRepresentation(body, f'"{digest}"', None)
+
+        key = (digest, encoding)
+        with self._lock:
+            compressed = self._compressed.get(key)
+            if compressed is not None:
+                self._compressed.move_to_end(key)
+        if compressed is None:
+            if encoding == "br":
+                compressed = _brotli().compress(body, quality=CARD_BROTLI_QUALITY)
+            else:
+                compressed = gzip.compress(body, CARD_GZIP_LEVEL, mtime=0)
+            with self._lock:
+                self._compressed[key] = compressed
+                while len(self._compressed) > self.max_entries:
+                    self._compressed.popitem(last=False)
+        return CardRepresentation(compressed, f'"{digest}-{encoding}"', encoding)
+
+
+_card_encoder: Optional[CardEncoder] = None
+_card_encoder_lock = threading.Lock()
+
+
+def get_card_encoder() -> CardEncoder:
+    """Retourne l'encodeur partagé du processus"""
+    global _card_encoder
+    if _card_encoder is None:
+        with _card_encoder_lock:
+            if _card_encoder is None:
+                _card_encoder = CardEncoder()
+    return _card_encoder
+
+
+def card_response(
+    card: dict,
+    fields: Optional[Tuple[str, ...]],
+    accept_encoding: Optional[str],
+    if_none_match: Optional[str],
+) -> Tuple[int, bytes, List[Tuple[str, str]]]:
+    """Réponse de GET /process pour une carte validée, commune à Flask et à l'ASGI
+
+    Returns:
+        tuple: (200 ou 304, corps, en-têtes)
+    """
+    representation = get_card_encoder().encode(card, fields, negotiate_encoding(accept_encoding))
+    headers = [
+        ("ETag", representation.etag),
+        ("Vary", "Accept-Encoding"),
+        ("Cache-Control", f"max-age={CARD_HTTP_MAX_AGE}"),
+    ]
+    encoding = representation.encoding or "identity"
+    if etag_matches(if_none_match, representation.etag):
+        metrics.inc("card_responses_total", status=304, encoding=encoding)
+        return 304, b"", headers
+
+    headers.append(("Content-Type", "application/json"))
+    if representation.encoding:
+        headers.append(("Content-Encoding", representation.encoding))
+    metrics.inc("card_responses_total", status=200, encoding=encoding)
+    metrics.inc("card_response_bytes_total", len(representation.body), encoding=encoding)
+    return 200, representation.body, headers
@@ -0,0 +1,301 @@
+import bisect
+import heapq
+import itertools
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from config import CARD_MATCH_MIN_MARGIN, CARD_MATCH_MIN_SCORE, CARD_SUGGEST_LIMIT
+from metrics import metrics
+from results_store import get_results_store
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+# Abréviations courantes saisies par les utilisateurs
+_SYNONYMS = {
+    "amex": "american express",
+    "mc": "mastercard",
+    "bmo": "bank of montreal",
+    "rbc": "royal bank",
+    "cibc": "canadian imperial bank of commerce",
+}
+# Mots qui ne distinguent pas une carte d'une autre
+_STOPWORDS = {"card", "credit", "the", "carte", "de", "du", "la", "le", "des"}
+# Noms comparés en détail au plus par recherche, et ressemblance minimale d'un mot mal orthographié
+_MAX_CANDIDATES = 64
+_MAX_RANKED = 1024
+_MIN_WORD_SIMILARITY = 0.5
+
+
+def normalize_tokens(text: str) -> Tuple[str, ...]:
+    """Mots significatifs d'un nom de carte : sans accents, symboles ni casse, abréviations développées
+
+    Exemple : "AMEX® Gold Rewards Card" -> ("american", "express", "gold", "rewards")
+    """
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    text = _NON_ALNUM.sub(" ", text.replace("&", " and "))
+    tokens = []
+    for token in text.split():
+        for part in _SYNONYMS.get(token, token).split():
+            if part not in _STOPWORDS:
+                tokens.append(part)
+    return tuple(tokens)
+
+
+def _trigrams(normalized: str, prefix: bool = False) -> frozenset:
+    # Le dernier mot d'une saisie en cours est incomplet : pas de marqueur de fin
+    padded = f" {normalized}" if prefix else f" {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _word_similarity(a: str, b: str) -> float:
+    grams_a, grams_b = _trigrams(a), _trigrams(b)
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def _same_words(query: Tuple[str, ...], name: Tuple[str, ...]) -> bool:
+    """Vrai si chaque mot saisi correspond à un mot distinct du nom, et inversement
+
+    L'ordre est libre et un mot peut être mal orthographié ; un mot en plus
+    ou en moins ("Privilege", "World Elite") désigne une autre carte.
+    """
+    if len(query) != len(name):
+        return False
+    remaining = list(name)
+    # Mots identiques d'abord, pour qu'une faute de frappe ne prenne pas la place d'un mot exact
+    typos = []
+    for token in query:
+        if token in remaining:
+            remaining.remove(token)
+        else:
+            typos.append(token)
+    for token in typos:
+        best = max(remaining, key=lambda word: _word_similarity(token, word))
+        if _word_similarity(token, best) < _MIN_WORD_SIMILARITY:
+            return False
+        remaining.remove(best)
+    return True
+
+
+class CardIndex:
+    """Index des noms de cartes connus, pour retrouver une carte saisie librement
+
+    Chaque carte (identifiant = son cardName normalisé) est indexée par son
+    nom et par les saisies qui y ont déjà mené avec les mêmes mots ("amex
+    gold", "gold american express"). Un index
+    inversé mot -> noms donne les candidats ; un index de trigrammes sur le
+    vocabulaire rattache les mots mal orthographiés ("platnum") ou
+    incomplets ("plat") aux mots connus. Les candidats sont ensuite classés
+    par coefficient de Dice sur les trigrammes du nom complet.
+    """
+
+    def __init__(self, min_score: float = CARD_MATCH_MIN_SCORE, min_margin: float = CARD_MATCH_MIN_MARGIN):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self._cards: Dict[str, dict] = {}          # identifiant -> {"id", "cardName", "issuer"}
+        self._docs: List[tuple] = []               # (identifiant, mots, trigrammes du nom)
+        self._exact: Dict[str, int] = {}           # nom normalisé -> document
+        self._lengths: List[int] = []              # nombre de mots de chaque document
+        self._word_docs: Dict[str, set] = {}       # mot -> documents qui le contiennent
+        self._word_grams: Dict[str, set] = {}      # trigramme -> mots du vocabulaire
+        self._vocabulary: List[str] = []           # mots triés, pour les recherches par préfixe
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def add(self, card_name: str, issuer: Optional[str] = None, alias: Optional[str] = None) -> Optional[str]:
+        """Ajoute une carte validée et, si fourni, le nom saisi qui y a mené
+
+        La saisie n'est retenue comme alias que si elle a les mêmes mots que
+        le nom de la carte, fautes de frappe près : une réponse du modèle
+        pour une autre carte ("Platinum Business" -> "Platinum") ne détourne
+        pas les recherches suivantes.
+
+        Returns:
+            str: Identifiant canonique de la carte (None si le nom est vide)
+        """
+        tokens = normalize_tokens(card_name or "")
+        if not tokens:
+            return None
+        card_id = " ".join(tokens)
+        with self._lock:
+            card = self._cards.get(card_id)
+            if card is None:
+                self._cards[card_id] = {"id": card_id, "cardName": card_name, "issuer": issuer}
+            elif issuer and not card["issuer"]:
+                card["issuer"] = issuer
+            self._add_doc(card_id, tokens)
+            if alias:
+                alias_tokens = normalize_tokens(alias)
+                if alias_tokens and _same_words(alias_tokens, tokens):
+                    self._add_doc(card_id, alias_tokens)
+        return card_id
+
+    def _add_doc(self, card_id: str, tokens: Tuple[str, ...]) -> None:
+        # Appelé avec le verrou tenu ; une saisie déjà connue garde sa première carte
+        normalized = " ".join(tokens)
+        if normalized in self._exact:
+            return
+        index = len(self._docs)
+        self._docs.append((card_id, tokens, _trigrams(normalized)))
+        self._lengths.append(len(tokens))
+        self._exact[normalized] = index
+        for token in set(tokens):
+            docs = self._word_docs.get(token)
+            if docs is None:
+                docs = self._word_docs[token] = set()
+                bisect.insort(self._vocabulary, token)
+                for gram in _trigrams(token):
+                    self._word_grams.setdefault(gram, set()).add(token)
+            docs.add(index)
+
+    def _similar_words(self, token: str, prefix: bool = False) -> List[str]:
+        """Mots connus correspondant à un mot saisi : lui-même, ses complétions, ou ses voisins proches"""
+        words = []
+        if prefix:
+            start = bisect.bisect_left(self._vocabulary, token)
+            end = bisect.bisect_left(self._vocabulary, token + "\uffff")
+            words = self._vocabulary[start:end]
+        elif token in self._word_docs:
+            return [token]
+        if not words:
+            grams = _trigrams(token)
+            counts = Counter()
+            for gram in grams:
+                counts.update(self._word_grams.get(gram, ()))
+            words = [
+                word for word, shared in counts.items()
+                if 2 * shared / (len(grams) + len(word) + 1) >= _MIN_WORD_SIMILARITY
+            ]
+        return words
+
+    def _scored(self, tokens: Tuple[str, ...], prefix: bool = False) -> Dict[str, Tuple[float, int]]:
+        """Meilleur score de Dice par carte, sur les candidats de l'index inversé
+
+        prefix : le dernier mot est en cours de saisie (suggestions).
+
+        Returns:
+            dict: identifiant -> (score, document qui l'obtient)
+        """
+        grams = _trigrams(" ".join(tokens), prefix)
+        with self._lock:
+            doc_sets = []
+            for position, token in enumerate(tokens):
+                words = self._similar_words(token, prefix and position == len(tokens) - 1)
+                if len(words) == 1:
+                    doc_sets.append(self._word_docs[words[0]])
+                elif words:
+                    doc_sets.append(set().union(*(self._word_docs[word] for word in words)))
+            if not doc_sets:
+                return {}
+            # Intersection des plus petits ensembles d'abord ; un mot inconnu ou
+            # superflu qui viderait l'intersection est ignoré
+            doc_sets.sort(key=len)
+            candidates = doc_sets[0]
+            for docs in doc_sets[1:]:
+                narrowed = candidates & docs
+                if narrowed:
+                    candidates = narrowed
+            if len(candidates) > _MAX_CANDIDATES:
+                if prefix:
+                    # Saisie semi-automatique : les noms les plus courts d'abord
+                    closeness = self._lengths.__getitem__
+                else:
+                    # Les noms de longueur voisine de la saisie d'abord
+                    closeness = lambda index: abs(self._lengths[index] - len(tokens))
+                # Saisie très générale ("world eli") : classement sur un échantillon borné
+                sample = itertools.islice(candidates, _MAX_RANKED)
+                candidates = heapq.nsmallest(_MAX_CANDIDATES, sample, key=closeness)
+            scores: Dict[str, Tuple[float, int]] = {}
+            for index in candidates:
+                card_id, _, doc_grams = self._docs[index]
+                # Saisie partielle : le trigramme de fin du nom ne compte pas
+                size = len(doc_grams) - 1 if prefix else len(doc_grams)
+                score = 2 * len(grams & doc_grams) / (len(grams) + size)
+                if score > scores.get(card_id, (0.0,))[0]:
+                    scores[card_id] = (score, index)
+        return scores
+
+    def match(self, text: str) -> Optional[Tuple[dict, float]]:
+        """Carte correspondant sans ambiguïté à une saisie libre
+
+        Le nom canonique remplace la saisie avant la lecture du cache : une
+        correspondance approchée n'est donc retenue que si la saisie a les
+        mêmes mots que le nom (ou l'alias) de la carte, fautes de frappe
+        près. Une saisie plus courte ou plus longue désigne une autre carte.
+
+        Returns:
+            tuple: (carte, score) pour une saisie connue, ou si le meilleur
+            score atteint min_score, dépasse le suivant d'au moins min_margin
+            et que les mots correspondent ; None sinon
+        """
+        tokens = normalize_tokens(text)
+        if not tokens:
+            return None
+        with self._lock:
+            exact = self._exact.get(" ".join(tokens))
+            if exact is not None:
+                return self._cards[self._docs[exact][0]], 1.0
+        ranked = sorted(self._scored(tokens).items(), key=lambda item: item[1][0], reverse=True)
+        if not ranked:
+            return None
+        card_id, (best, index) = ranked[0]
+        runner_up = ranked[1][1][0] if len(ranked) > 1 else 0.0
+        if best < self.min_score or best - runner_up < self.min_margin:
+            return None
+        if not _same_words(tokens, self._docs[index][1]):
+            return None
+        return self._cards[card_id], best
+
+    def canonical_name(self, card_choice: str) -> str:
+        """cardName de la carte reconnue, ou la saisie telle quelle"""
+        found = self.match(card_choice)
+        metrics.inc("card_canonicalizations_total", outcome="matched" if found else "unmatched")
+        return found[0]["cardName"] if found else card_choice
+
+    def suggest(self, text: str, limit: int = CARD_SUGGEST_LIMIT) -> List[dict]:
+        """Suggestions de saisie semi-automatique, de la plus proche à la plus lointaine
+
+        Le dernier mot saisi peut être incomplet ("amex go" -> "... Gold ...").
+        """
+        tokens = normalize_tokens(text)
+        if not tokens:
+            return []
+        scores = self._scored(tokens, prefix=True)
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1][0])
+        return [{**self._cards[card_id], "score": round(score, 3)} for card_id, (score, _) in ranked]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cards": len(self._cards), "names": len(self._docs), "words": len(self._vocabulary)}
+
+
+_card_index: Optional[CardIndex] = None
+_card_index_lock = threading.Lock()
+
+
+def get_card_index() -> CardIndex:
+    """Retourne l'index partagé, construit au premier appel depuis l'historique des résultats"""
+    global _card_index
+    if _card_index is None:
+        with _card_index_lock:
+            if _card_index is None:
+                index = CardIndex()
+                for card_name, issuer, card_choice in get_results_store().validated_names():
+                    index.add(card_name, issuer, alias=card_choice)
+                _card_index = index
+    return _card_index
+
+
+def preload_card_index() -> threading.Thread:
+    """Construit l'index partagé dans un thread d'arrière-plan
+
+    Appelé par les serveurs juste avant d'écouter : la construction
+    (environ 0,7 s pour 30 000 cartes) n'a pas lieu sur une requête.
+    """
+    thread = threading.Thread(target=get_card_index, name="card-index-preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,55 @@
+from typing import Annotated, List, Optional
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field
+
+
+def _null_string_to_none(value):
+    """Les modèles renvoient parfois "null" en texte au lieu de null
+
+    "None" reste du texte : le prompt lui donne un sens ("pas de frais"
+    pour foreignTransactionFee), que parse_fee lit comme 0.
+    """
+    if isinstance(value, str) and value.strip().lower() == "null":
+        return None
+    return value
+
+
+# Coercitions appliquées par le schéma lui-même (plus de correction manuelle
+# du dictionnaire) : "null" -> None, et nombres -> texte via coerce_numbers_to_str
+NullableStr = Annotated[Optional[str], BeforeValidator(_null_string_to_none)]
+NullableInt = Annotated[Optional[int], BeforeValidator(_null_string_to_none)]
+
+
+class CardModel(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+
+class EarnRate(CardModel):
+    regular_spending: NullableStr = Field(alias="regularSpending",default=None)
+
+class WelcomeOffer(CardModel):
+    bonus_points: NullableInt = Field(alias="bonusPoints",default=None)
+    description: NullableStr = Field(alias="description",default=None)
+
+class InterestRate(CardModel):
+    purchase_rate: NullableStr = Field(alias="purchaseRate",default=None)
+    cash_advance_rate: NullableStr = Field(alias="cashAdvanceRate", default=None)
+    balance_transfer_rate: NullableStr = Field(alias="balanceTransferRate", default=None)
+
+class Rewards(CardModel):
+    program: NullableStr = Field(alias="program",default=None)  # Fixed alias
+    earn_rates: Optional[EarnRate] = Field(alias="earnRates",default=None)
+    redemption_options: Optional[List[str]] = Field(alias="redemptionOptions",default=None)
+
+class CreditCard(CardModel):
+    card_name: NullableStr = Field(alias="cardName")
+    issuer: NullableStr = Field(alias="issuer")
+    annual_fee: NullableStr = Field(alias="annualFee")
+    interest_rate: Optional[InterestRate] = Field(alias="interestRate")
+    rewards: Optional[Rewards] = Field(alias="rewardsProgram")  # Top-level key is "rewardsProgram"
+    perks: Optional[List[str]] = Field(alias="mainBenefits")
+    credit_score: NullableStr = Field(alias="creditScoreRecommendation")
+    introductory_offer: Optional[WelcomeOffer] = Field(
+        alias="welcomeOffer", default=None
+    )  # Now optional with default
+    foreign_fee: NullableStr = Field(alias="foreignTransactionFee")
+    source: NullableStr = Field(alias="officialWebsite")
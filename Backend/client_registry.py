@@ -0,0 +1,172 @@
+import atexit
+import hashlib
+import importlib
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from config import (
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_TIMEOUT_SECONDS,
+)
+
+# Le SDK OpenAI (et son client HTTP) coûte environ une demi-seconde d'import : chargé au premier client
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+def _fingerprint(api_key: Optional[str]) -> str:
+    # La clé ne sert que d'identifiant : on ne la garde pas en clair dans l'index
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class ClientRegistry:
+    """Registre des clients API partagés par tout le processus
+
+    Un client (et donc son pool de connexions keep-alive) est créé une seule
+    fois par triplet (fournisseur, clé, URL de base) puis réutilisé.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT_SECONDS,
+    ):
+        self._pool_settings = {
+            "max_connections": max_connections,
+            "max_keepalive_connections": max_keepalive_connections,
+            "keepalive_expiry": keepalive_expiry,
+        }
+        self._timeout_settings = (timeout, connect_timeout)
+        self.limits = None
+        self.timeout = None
+        self._clients = {}
+        self._async_clients = {}
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0}
+
+    def _http_settings(self) -> None:
+        # Appelé avec le verrou tenu. Limites et délais construits avec les types exportés
+        # par le SDK : httpx reste une dépendance du SDK, pas du backend
+        if self.timeout is not None:
+            return
+        from openai import DEFAULT_CONNECTION_LIMITS, Timeout
+
+        self.limits = type(DEFAULT_CONNECTION_LIMITS)(**self._pool_settings)
+        self.timeout = Timeout(self._timeout_settings[0], connect=self._timeout_settings[1])
+
+    def get(self, provider: str, api_key: Optional[str], base_url: Optional[str] = None) -> "OpenAI":
+        """Retourne le client partagé du fournisseur, en le créant au besoin
+
+        Args:
+            provider (str): "openai" ou "perplexity"
+            api_key (str): Clé d'API du fournisseur
+            base_url (str): URL de base, None pour celle d'OpenAI
+
+        Returns:
+            OpenAI: Client configuré avec le pool de connexions partagé
+        """
+        key = (provider, _fingerprint(api_key), base_url)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._stats["reused"] += 1
+                return client
+
+            from openai import DefaultHttpxClient, OpenAI
+
+            self._http_settings()
+
+            http_client = DefaultHttpxClient(limits=self.limits, timeout=self.timeout)
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=self.timeout,
+                max_retries=0,  # nouveaux essais gérés par core_functions (backoff, disjoncteur, budget)
+                http_client=http_client,
+            )
+            self._clients[key] = client
+            self._stats["created"] += 1
+            return client
+
+    def get_async(self, provider: str, api_key: Optional[str], base_url: Optional[str] = None) -> "AsyncOpenAI":
+        """Équivalent de get pour le mode asynchrone (client AsyncOpenAI)
+
+        Les clients asynchrones sont liés à la boucle d'événements du serveur
+        et doivent être fermés avec aclose_all à l'arrêt.
+        """
+        key = (provider, _fingerprint(api_key), base_url)
+        with self._lock:
+            client = self._async_clients.get(key)
+            if client is not None:
+                self._stats["reused"] += 1
+                return client
+
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            self._http_settings()
+
+            http_client = DefaultAsyncHttpxClient(limits=self.limits, timeout=self.timeout)
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=self.timeout,
+                max_retries=0,  # nouveaux essais gérés par core_functions (backoff, disjoncteur, budget)
+                http_client=http_client,
+            )
+            self._async_clients[key] = client
+            self._stats["created"] += 1
+            return client
+
+    async def aclose_all(self) -> None:
+        """Ferme les clients asynchrones (à appeler depuis leur boucle)"""
+        with self._lock:
+            clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        for client in clients:
+            await client.close()
+
+    def close_all(self) -> None:
+        """Ferme proprement toutes les connexions ouvertes"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["clients"] = len(self._clients) + len(self._async_clients)
+        return stats
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """Retourne le registre partagé du processus, fermé automatiquement à la sortie"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry()
+                atexit.register(_registry.close_all)
+    return _registry
+
+
+def preload_provider_sdk() -> threading.Thread:
+    """Importe le SDK OpenAI dans un thread d'arrière-plan
+
+    Appelé par les serveurs juste avant d'écouter : ils démarrent sans
+    attendre cet import, et la première requête le trouve en général fait.
+    """
+    thread = threading.Thread(target=importlib.import_module, args=("openai",), name="sdk-preload", daemon=True)
+    thread.start()
+    return thread
@@ -1,6 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel, Field
-from termcolor import colored
+import logging
+import os
 
 
 MSG_COLOR = {
@@ -10,38 +9,162 @@ MSG_COLOR = {
     "info": {"color": "blue", "attrs": ["bold"]},
 }
 
+# Cache des résultats validés (mémoire LRU + SQLite)
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "cache.db")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_MEMORY_ENTRIES = int(os.getenv("CACHE_MAX_MEMORY_ENTRIES", "512"))
+CACHE_MAX_DISK_ENTRIES = int(os.getenv("CACHE_MAX_DISK_ENTRIES", "50000"))
+# Warmer (--mode warm) : rafraîchit les cartes populaires avant leur expiration
+WARM_INTERVAL_SECONDS = float(os.getenv("WARM_INTERVAL_SECONDS", "300"))
+WARM_REFRESH_AHEAD = float(os.getenv("WARM_REFRESH_AHEAD", "0.8"))  # part du TTL avant rafraîchissement
+WARM_TOP_CARDS = int(os.getenv("WARM_TOP_CARDS", "200"))
+WARM_POPULAR_WINDOW_SECONDS = float(os.getenv("WARM_POPULAR_WINDOW_SECONDS", str(7 * 24 * 3600)))
+WARM_CONCURRENCY = int(os.getenv("WARM_CONCURRENCY", "4"))
+WARM_MAX_QPS = float(os.getenv("WARM_MAX_QPS", "1"))
+WARM_MAX_LOOKUPS_PER_HOUR = int(os.getenv("WARM_MAX_LOOKUPS_PER_HOUR", "500"))
+# Import en masse (--mode bulk) : CSV en entrée, JSONL en sortie, reprise après interruption
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "8"))
+BULK_PROGRESS_INTERVAL = float(os.getenv("BULK_PROGRESS_INTERVAL", "1.0"))  # secondes entre deux lignes de progression
+# Pool de connexions HTTP partagé par les clients des fournisseurs
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "120"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+
+PROVIDER_BASE_URLS = {
+    "openai": os.getenv("OPENAI_BASE_URL") or None,
+    "perplexity": os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai"),
+    # Faux fournisseur local (python fake_provider.py) pour les tests de charge
+    "fake": os.getenv("FAKE_BASE_URL", "http://127.0.0.1:8001/v1"),
+}
+# Appels simultanés maximum vers chaque fournisseur (mode async et lots)
+PROVIDER_MAX_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "64")),
+    "perplexity": int(os.getenv("PERPLEXITY_MAX_CONCURRENCY", "32")),
+    "fake": int(os.getenv("FAKE_MAX_CONCURRENCY", "64")),
+}
+# Budget par fournisseur et par clé d'API (0 = illimité), ajusté par les en-têtes x-ratelimit-*
+PROVIDER_RATE_LIMITS = {
+    "openai": {
+        "rpm": float(os.getenv("OPENAI_RPM", "500")),
+        "tpm": float(os.getenv("OPENAI_TPM", "200000")),
+    },
+    "perplexity": {
+        "rpm": float(os.getenv("PERPLEXITY_RPM", "50")),
+        "tpm": float(os.getenv("PERPLEXITY_TPM", "0")),
+    },
+    "fake": {
+        "rpm": float(os.getenv("FAKE_RPM", "0")),
+        "tpm": float(os.getenv("FAKE_TPM", "0")),
+    },
+}
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+RATE_LIMIT_MAX_QUEUE = int(os.getenv("RATE_LIMIT_MAX_QUEUE", "1000"))
+# Nouveaux essais (réseau, délai dépassé, 5xx) avec attente exponentielle à gigue
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.5"))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("RETRY_MAX_DELAY_SECONDS", "8"))
+# Disjoncteur par fournisseur (0 échec = désactivé)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+# Requête de couverture ("api:modèle", vide = désactivée), lancée après le p95
+# observé (ou HEDGE_DELAY_SECONDS) et limitée à HEDGE_MAX_RATIO des recherches
+PROVIDER_HEDGE_TARGETS = {
+    "openai": os.getenv("OPENAI_HEDGE_TARGET", ""),
+    "perplexity": os.getenv("PERPLEXITY_HEDGE_TARGET", ""),
+    "fake": os.getenv("FAKE_HEDGE_TARGET", ""),
+}
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "0"))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+# Jetons de réponse estimés avant l'envoi (corrigés ensuite avec completion.usage)
+ESTIMATED_COMPLETION_TOKENS = int(os.getenv("ESTIMATED_COMPLETION_TOKENS", "600"))
+# Sorties structurées (response_format json_schema) ; désactivées par modèle si refusées
+PROVIDER_STRUCTURED_OUTPUT = {
+    "openai": os.getenv("OPENAI_STRUCTURED_OUTPUT", "1") == "1",
+    "perplexity": os.getenv("PERPLEXITY_STRUCTURED_OUTPUT", "1") == "1",
+    "fake": os.getenv("FAKE_STRUCTURED_OUTPUT", "1") == "1",
+}
+# Allers-retours de correction quand la réponse ne passe pas la validation
+REPAIR_MAX_ATTEMPTS = int(os.getenv("REPAIR_MAX_ATTEMPTS", "1"))
+# En-tête Server-Timing (durée de chaque étape) sur les réponses de /process
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+# Endpoint /process/batch
+BATCH_MAX_CARDS = int(os.getenv("BATCH_MAX_CARDS", "50"))
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "32"))
+# Historique des réponses (SQLite append-only, écrit par un thread dédié)
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", "results.db")
+RESULTS_QUEUE_SIZE = int(os.getenv("RESULTS_QUEUE_SIZE", "10000"))
+RESULTS_BATCH_SIZE = int(os.getenv("RESULTS_BATCH_SIZE", "200"))
+RESULTS_FLUSH_INTERVAL = float(os.getenv("RESULTS_FLUSH_INTERVAL", "0.5"))
+RESULTS_FSYNC = os.getenv("RESULTS_FSYNC", "batch")  # off | batch | always
+# Index de noms de cartes : "amex gold" -> "American Express® Gold Rewards Card"
+CARD_CANONICALIZE = os.getenv("CARD_CANONICALIZE", "1") == "1"
+CARD_MATCH_MIN_SCORE = float(os.getenv("CARD_MATCH_MIN_SCORE", "0.8"))
+CARD_MATCH_MIN_MARGIN = float(os.getenv("CARD_MATCH_MIN_MARGIN", "0.05"))
+CARD_SUGGEST_LIMIT = int(os.getenv("CARD_SUGGEST_LIMIT", "10"))
+# GET /cards : recherche par plages de frais/taux dans le catalogue en colonnes
+CARDS_QUERY_LIMIT = int(os.getenv("CARDS_QUERY_LIMIT", "20"))
+CARDS_QUERY_MAX_LIMIT = int(os.getenv("CARDS_QUERY_MAX_LIMIT", "100"))
+# GET /process : JSON compact, ETag fort (If-None-Match -> 304), gzip/brotli
+# négociés (brotli si le module est installé) au-delà de CARD_COMPRESS_MIN_BYTES
+CARD_HTTP_MAX_AGE = int(os.getenv("CARD_HTTP_MAX_AGE", "300"))
+CARD_COMPRESS_MIN_BYTES = int(os.getenv("CARD_COMPRESS_MIN_BYTES", "512"))
+CARD_GZIP_LEVEL = int(os.getenv("CARD_GZIP_LEVEL", "6"))
+CARD_BROTLI_QUALITY = int(os.getenv("CARD_BROTLI_QUALITY", "5"))
+CARD_ENCODED_CACHE_SIZE = int(os.getenv("CARD_ENCODED_CACHE_SIZE", "1024"))
+# Modèle "auto" : routage vers le modèle le plus rapide dont le taux de
+# validation dépasse ROUTER_SUCCESS_THRESHOLD (statistiques EWMA persistées)
+AUTO_MODEL = "auto"
+ROUTER_CANDIDATES = {
+    # Par ordre de préférence pour le démarrage à froid ; sonar-deep-research
+    # (plusieurs minutes par réponse) n'est pas candidat par défaut
+    "openai": os.getenv("OPENAI_AUTO_MODELS", "gpt-3.5-turbo,gpt-4,o1").split(","),
+    "perplexity": os.getenv("PERPLEXITY_AUTO_MODELS", "sonar,sonar-pro,sonar-reasoning-pro").split(","),
+    "fake": os.getenv("FAKE_AUTO_MODELS", "fake").split(","),
+}
+ROUTER_DB_PATH = os.getenv("ROUTER_DB_PATH", "router.db")
+ROUTER_SUCCESS_THRESHOLD = float(os.getenv("ROUTER_SUCCESS_THRESHOLD", "0.9"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "3"))
+ROUTER_EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", "0.2"))
+ROUTER_EXPLORATION_RATE = float(os.getenv("ROUTER_EXPLORATION_RATE", "0.05"))
+ROUTER_SAVE_INTERVAL = float(os.getenv("ROUTER_SAVE_INTERVAL", "30"))
+
+# Journalisation des modes serveur (auto, async, warm) : une ligne JSON par
+# enregistrement, écrite par un thread dédié (server_logging)
+LOG_PATH = os.getenv("LOG_PATH", "server.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "WARNING").upper()
+LOG_ROTATE = os.getenv("LOG_ROTATE", "size")  # size | time
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Au plus LOG_SAMPLE_BURST avertissements/erreurs identiques par fenêtre
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "60"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "5"))
+# Modes manuel et bulk : erreurs en texte
+ERROR_LOG_PATH = os.getenv("ERROR_LOG_PATH", "error.log")
+
+# Modes serveur : print_colored écrit dans la journalisation au lieu du terminal
+_console_logger = None
+_COLOR_LEVELS = {"red": logging.ERROR, "yellow": logging.WARNING}
+
 def print_colored(text, **kwargs):
     color = kwargs.get("color", "white")
+    if _console_logger is not None:
+        _console_logger.log(_COLOR_LEVELS.get(color, logging.INFO), text)
+        return
+    from termcolor import colored
+
     attrs = kwargs.get("attrs", None)
     print(colored(text, color, attrs=attrs))
 
-class EarnRate(BaseModel):
-    regular_spending: Optional[str] = Field(alias="regularSpending",default=None)
-
-class WelcomeOffer(BaseModel):
-    bonus_points: Optional[int] = Field(alias="bonusPoints",default=None)
-    description: Optional[str] = Field(alias="description",default=None)
-
-class InterestRate(BaseModel):
-    purchase_rate: Optional[str] = Field(alias="purchaseRate",default=None)
-    cash_advance_rate: Optional[str] = Field(alias="cashAdvanceRate", default=None)
-    balance_transfer_rate: Optional[str] = Field(alias="balanceTransferRate", default=None)
-
-class Rewards(BaseModel):
-    program: Optional[str] = Field(alias="program",default=None)  # Fixed alias
-    earn_rates: Optional[EarnRate] = Field(alias="earnRates",default=None)
-    redemption_options: Optional[List[str]] = Field(alias="redemptionOptions",default=None)
-
-class CreditCard(BaseModel):
-    card_name: Optional[str] = Field(alias="cardName")
-    issuer: Optional[str] = Field(alias="issuer")
-    annual_fee: Optional[str] = Field(alias="annualFee")
-    interest_rate: Optional[InterestRate] = Field(alias="interestRate")
-    rewards: Optional[Rewards] = Field(alias="rewardsProgram")  # Top-level key is "rewardsProgram"
-    perks: Optional[List[str]] = Field(alias="mainBenefits")
-    credit_score: Optional[str] = Field(alias="creditScoreRecommendation")
-    introductory_offer: Optional[WelcomeOffer] = Field(
-        alias="welcomeOffer", default=None
-    )  # Now optional with default
-    foreign_fee: Optional[str] = Field(alias="foreignTransactionFee")
-    source: Optional[str] = Field(alias="officialWebsite")
+def log_console_output(logger) -> None:
+    """Redirige print_colored vers logger : la sortie colorée est réservée au mode manuel"""
+    global _console_logger
+    _console_logger = logger
+
+def console_output() -> bool:
+    """Vrai si print_colored écrit dans le terminal"""
+    return _console_logger is None
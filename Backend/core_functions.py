@@ -1,23 +1,30 @@
+import asyncio
 import os
 import sys
-import argparse  
-import logging
-from pydantic import BaseModel, ValidationError, Field
-from openai import OpenAI, OpenAIError
-from typing import List, Dict, Optional
-from dotenv import load_dotenv
-from config import MSG_COLOR, print_colored
-from validation import clean_json, process_api_response_and_validate
+import time
+from typing import TYPE_CHECKING, Optional
+from client_registry import get_client_registry
+from config import (
+    AUTO_MODEL,
+    ESTIMATED_COMPLETION_TOKENS,
+    MSG_COLOR,
+    PROVIDER_MAX_RETRIES,
+    PROVIDER_BASE_URLS,
+    PROVIDER_STRUCTURED_OUTPUT,
+    print_colored,
+)
+from json_extract import JSONExtractionError
+from metrics import metrics
+from model_router import get_model_router
+from rate_limiter import RateLimitTimeout, deadline_from_now, get_rate_limiter
+from resilience import CircuitOpenError, backoff_delay, get_circuit_breaker, is_retryable, latencies
+from validation import CARD_JSON_SCHEMA, clean_json, process_api_response_and_validate, save_data
 from error_handlers import handle_api_errors
+from server_logging import setup_cli_logging
 
-
-
-
-logging.basicConfig(
-    filename='error.log',
-    level=logging.ERROR,
-    format='%(asctime)s %(levelname)s: %(message)s'
-)
+# openai est importé au premier appel (voir client_registry)
+if TYPE_CHECKING:
+    from openai import BadRequestError, OpenAIError
 
 
 # Modèles Pydantic
@@ -25,46 +32,39 @@ logging.basicConfig(
 
 # Fonction
 
+# Le faux fournisseur local n'authentifie pas les requêtes
+FAKE_API_KEY = "fake"
+
 def get_api_client(api_type: str, openai_key: str, perplexity_key: str):
     """Initialise le client API approprié en fonction du type spécifié
     
     Args:
-        api_type (str): "openai" ou "perplexity"
+        api_type (str): "openai", "perplexity" ou "fake" (fake_provider.py, sans clé)
         openai_key (str): Clé d'API OpenAI
         perplexity_key (str): Clé d'API Perplexity
         
     Returns:
-        Client API configuré avec les paramètres appropriés
+        Client API configuré avec les paramètres appropriés, partagé par
+        toutes les requêtes utilisant la même clé
     
     Raises:
         ValueError: Si le type d'API n'est pas supporté
     """
+    registry = get_client_registry()
     if api_type == "openai":
-        return OpenAI(api_key=openai_key)
+        return registry.get("openai", openai_key, PROVIDER_BASE_URLS["openai"])
     elif api_type == "perplexity":
         # Configuration spécifique pour Perplexity avec URL de base différente
-        return OpenAI(
-            api_key=perplexity_key,
-            base_url="https://api.perplexity.ai"
-        )
+        return registry.get("perplexity", perplexity_key, PROVIDER_BASE_URLS["perplexity"])
+    elif api_type == "fake":
+        return registry.get("fake", FAKE_API_KEY, PROVIDER_BASE_URLS["fake"])
     else:
         raise ValueError("API non supportée")
     
-def build_api_messages(selected_api, card_choice):
-    """Construit la structure de messages pour la requête API
-    
-    Différencie la structure selon l'API utilisée (OpenAI vs Perplexity)
-    
-    Args:
-        selected_api (str): "openai" ou "perplexity"
-        card_choice (str): Nom de la carte bancaire choisie
-        
-    Returns:
-        list: Structure de messages adaptée à l'API
-    """
-
-    base_content =( 
-                    f"Provide structured JSON data for the {card_choice} Canadian card with these keys and specifications. "
+# Spécification statique, identique octet pour octet d'une requête à l'autre :
+# le fournisseur peut mettre ce préfixe en cache. Le nom de la carte vient en dernier.
+CARD_SPEC_PROMPT = ( 
+                    "Provide structured JSON data for the Canadian card named at the end of the request, with these keys and specifications. "
                     "If any information is not found, return 'null' for the corresponding key.\n\n"  
 
                     "• cardName (string): Exact name of the card (ex: 'Amex Green Card')\n"  
@@ -99,27 +99,71 @@ def build_api_messages(selected_api, card_choice):
                     "ADD ALL FIELDS. If you don't have a response for a field, add 'null' or ['null'].\n"
                 )
 
-    if selected_api == "openai":
-        messages=[
-                {
-                    "role": "system",
-                    "content": base_content
-                }
-            ]
-    else:  # Perplexity
-        messages = [
+# Messages fixes précalculés une fois par fournisseur
+_STATIC_MESSAGES = {
+    "openai": (
+        {"role": "system", "content": CARD_SPEC_PROMPT},
+    ),
+    "perplexity": (
         # Message système (configuration)
         {
             "role": "system",
-            "content": "Provide structured JSON data with these keys and specifications. If any information is not found, return 'null' for the corresponding key."        },
-        # Message utilisateur (requete finale)
-        {
-            "role": "user",
-            "content": (base_content)
-        }
-    ]   
+            "content": "Provide structured JSON data with these keys and specifications. If any information is not found, return 'null' for the corresponding key.",
+        },
+    ),
+}
+
+
+def build_api_messages(selected_api, card_choice):
+    """Construit la structure de messages pour la requête API
+    
+    Différencie la structure selon l'API utilisée (OpenAI vs Perplexity).
+    Tout ce qui précède le nom de la carte est constant, pour profiter du
+    cache de préfixe des fournisseurs.
+    
+    Args:
+        selected_api (str): "openai" ou "perplexity"
+        card_choice (str): Nom de la carte bancaire choisie
         
-    return messages
+    Returns:
+        list: Structure de messages adaptée à l'API
+    """
+    card_line = f"Card: {card_choice}"
+
+    # Le faux fournisseur reçoit la même requête qu'OpenAI
+    if selected_api in ("openai", "fake"):
+        return [*_STATIC_MESSAGES["openai"], {"role": "user", "content": card_line}]
+
+    # Perplexity : message utilisateur (requete finale), spécification puis carte
+    return [
+        *_STATIC_MESSAGES["perplexity"],
+        {"role": "user", "content": f"{CARD_SPEC_PROMPT}\n{card_line}"},
+    ]
+
+
+def report_usage(usage, selected_api: str, selected_model: str) -> None:
+    """Journalise et comptabilise les jetons consommés par une requête
+
+    Args:
+        usage: completion.usage (None si le fournisseur n'en renvoie pas)
+        selected_api (str): Type d'API ("openai" ou "perplexity")
+        selected_model (str): Nom du modèle
+    """
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+
+    labels = {"api": selected_api, "model": selected_model}
+    metrics.inc("prompt_tokens_total", prompt_tokens, **labels)
+    metrics.inc("prompt_cached_tokens_total", cached_tokens, **labels)
+    metrics.inc("completion_tokens_total", completion_tokens, **labels)
+    print_colored(
+        f"📊 Jetons : prompt={prompt_tokens} (en cache={cached_tokens}) réponse={completion_tokens}",
+        **MSG_COLOR["info"],
+    )
     
 def prompt_for_api_and_model_selection():
     """Affiche l'interface interactive de sélection des paramètres
@@ -129,7 +173,7 @@ def prompt_for_api_and_model_selection():
     # Écran d'accueil interactif
     print_colored("Bienvenue dans l'assistant de carte de crédit", **MSG_COLOR["info"])
     # Sélection de l'API par menu
-    api_options = ["OpenAI", "Perplexity"]
+    api_options = ["OpenAI", "Perplexity", "Fake"]
     while True:
         print("\nChoisissez l'API :")
         for idx, option in enumerate(api_options, 1):
@@ -143,8 +187,9 @@ def prompt_for_api_and_model_selection():
  
     # Sélection du modèle par menu
     models = {
-        "openai": ["o1", "gpt-3.5-turbo"],
-        "perplexity": ["sonar-pro", "sonar", "sonar-reasoning-pro","sonar-deep-research"]
+        "openai": ["o1", "gpt-3.5-turbo", AUTO_MODEL],
+        "perplexity": ["sonar-pro", "sonar", "sonar-reasoning-pro","sonar-deep-research", AUTO_MODEL],
+        "fake": ["fake", AUTO_MODEL],
     }
     model_list = models[selected_api]
     while True:
@@ -177,7 +222,240 @@ def create_api_client(selected_api,openai_key,perplexity_key):
         print_colored(f"Impossible de créer le client : {str(e)}", **MSG_COLOR["error"])
         raise  
     
-def execute_chat_completion(client, selected_api: str, selected_model: str, messages: list) -> tuple[bool, Optional[object]]:
+def create_async_api_client(selected_api, openai_key, perplexity_key):
+    """Équivalent asynchrone de create_api_client : renvoie un client AsyncOpenAI partagé"""
+    if selected_api == "openai":
+        api_key = openai_key or os.getenv("OPENAI_API_KEY")
+    elif selected_api == "perplexity":
+        api_key = perplexity_key or os.getenv("PERPLEXITY_API_KEY")
+    elif selected_api == "fake":
+        api_key = FAKE_API_KEY
+    else:
+        raise ValueError("API non supportée")
+    return get_client_registry().get_async(selected_api, api_key, PROVIDER_BASE_URLS[selected_api])
+
+# (api, modèle) ayant refusé response_format json_schema : repli sur l'ancien format
+_schema_unsupported = set()
+
+
+def build_completion_params(selected_api: str, selected_model: str, messages: list, stream: bool = False) -> dict:
+    """Construit les paramètres de chat.completions.create selon l'API choisie"""
+    params = {"model": selected_model, "messages": messages}
+    # Le faux fournisseur imite OpenAI
+    openai_like = selected_api in ("openai", "fake")
+    if stream:
+        params["stream"] = True
+    if openai_like and stream:
+        # Sans cette option, OpenAI n'envoie pas l'usage en streaming
+        params["stream_options"] = {"include_usage": True}
+
+    if PROVIDER_STRUCTURED_OUTPUT.get(selected_api) and (selected_api, selected_model) not in _schema_unsupported:
+        # Sortie contrainte par le schéma de CreditCard
+        json_schema = {"schema": CARD_JSON_SCHEMA}
+        if openai_like:
+            json_schema.update(name="credit_card", strict=True)
+        params["response_format"] = {"type": "json_schema", "json_schema": json_schema}
+    elif openai_like:
+        # OpenAI requires response_format
+        params["response_format"] = {"type": "json_object"}
+    # Perplexity sans schéma : pas de response_format
+    return params
+
+
+def _fall_back_from_schema(selected_api: str, selected_model: str, params: dict, error: "BadRequestError") -> bool:
+    """Désactive json_schema pour ce modèle si c'est lui que le fournisseur refuse
+
+    Returns:
+        bool: Vrai si la requête doit être renvoyée avec l'ancien format
+    """
+    response_format = params.get("response_format") or {}
+    if response_format.get("type") != "json_schema":
+        return False
+    if "response_format" not in str(error) and "json_schema" not in str(error):
+        return False
+    _schema_unsupported.add((selected_api, selected_model))
+    print_colored(
+        f"⚠️ {selected_api.upper()}: sorties structurées refusées par {selected_model}, repli sur l'ancien format",
+        **MSG_COLOR["warning"],
+    )
+    return True
+
+
+def _estimate_tokens(messages: list) -> int:
+    """Jetons estimés d'une requête (~4 caractères par jeton) plus la réponse attendue"""
+    return sum(len(str(message.get("content", ""))) for message in messages) // 4 + ESTIMATED_COMPLETION_TOKENS
+
+
+def _settle_usage(limiter, estimated: int, completion) -> None:
+    usage = getattr(completion, "usage", None)
+    limiter.settle(estimated, getattr(usage, "total_tokens", None))
+
+
+def _settle_refused(limiter, estimated: int, error: "OpenAIError") -> None:
+    """Restitue l'estimation d'une requête refusée (429, 4xx), que le fournisseur ne décompte pas
+
+    Délai dépassé, coupure réseau ou 5xx : la requête a pu être traitée,
+    l'estimation reste prélevée.
+    """
+    from openai import APIStatusError
+
+    if isinstance(error, APIStatusError) and error.status_code < 500:
+        limiter.settle(estimated, 0)
+
+
+class _SettledStream:
+    """Flux de morceaux du fournisseur qui corrige le budget de jetons à sa fermeture
+
+    L'usage réel arrive dans le dernier morceau ; un flux interrompu avant
+    garde l'estimation.
+    """
+
+    def __init__(self, stream, limiter, estimated: int):
+        self._stream = stream
+        self._limiter = limiter
+        self._estimated = estimated
+        self._usage = None
+        self._settled = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if getattr(chunk, "usage", None) is not None:
+                self._usage = chunk.usage
+            yield chunk
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def close(self) -> None:
+        if not self._settled:
+            self._settled = True
+            self._limiter.settle(self._estimated, getattr(self._usage, "total_tokens", None))
+        self._stream.close()
+
+
+def _record_latency(selected_api: str, selected_model: str, seconds: float, completion) -> None:
+    """Durée d'un appel réussi : p95 des requêtes de couverture et routage du modèle « auto »"""
+    latencies.record(selected_api, selected_model, seconds)
+    tokens = getattr(getattr(completion, "usage", None), "total_tokens", None)
+    get_model_router().record_call(selected_api, selected_model, seconds, tokens)
+
+
+def _retry_delay(error: "OpenAIError", selected_api: str, labels: dict, breaker, limiter, retries: int) -> Optional[float]:
+    """Décide du sort d'un appel en échec
+
+    Returns:
+        float: Attente avant le nouvel essai ; None pour un 429, dont l'attente passe par le limiteur
+
+    Raises:
+        OpenAIError: L'erreur elle-même si elle n'est pas transitoire ou si les essais sont épuisés
+    """
+    from openai import RateLimitError
+
+    if isinstance(error, RateLimitError):
+        breaker.release()
+        metrics.inc("provider_429_total", api=selected_api)
+        limiter.update_from_headers(error.response.headers, rate_limited=True)
+        return None
+    if not is_retryable(error):
+        # Erreur de la requête (400, clé invalide...) : ne dit rien de la santé du fournisseur
+        breaker.release()
+        raise error
+    breaker.record_failure()
+    if retries >= PROVIDER_MAX_RETRIES:
+        raise error
+    metrics.inc("provider_retries_total", error=type(error).__name__, **labels)
+    return backoff_delay(retries)
+
+
+def _send_completion(client, selected_api: str, params: dict):
+    """Envoie la requête dès que le budget du fournisseur le permet
+
+    Un 429 ne fait pas échouer la requête : le budget est ajusté (Retry-After,
+    x-ratelimit-*) et la requête reprend sa place dans la file, jusqu'à
+    l'échéance. Les erreurs transitoires (réseau, délai dépassé, 5xx) sont
+    réessayées PROVIDER_MAX_RETRIES fois avec une attente exponentielle à
+    gigue, et le disjoncteur du fournisseur coupe les envois quand les
+    échecs s'enchaînent. En streaming, le flux retourné corrige le budget
+    de jetons à sa fermeture, avec l'usage de son dernier morceau.
+
+    Raises:
+        RateLimitTimeout: Si le budget ne se libère pas avant l'échéance
+        CircuitOpenError: Si le disjoncteur du fournisseur est ouvert
+    """
+    from openai import OpenAIError
+
+    limiter = get_rate_limiter(selected_api, client.api_key)
+    breaker = get_circuit_breaker(selected_api)
+    labels = {"api": selected_api, "model": params["model"]}
+    estimated = _estimate_tokens(params["messages"])
+    deadline = deadline_from_now()
+    retries = 0
+    while True:
+        breaker.before_call()
+        try:
+            with metrics.stage("rate_limit_wait", **labels):
+                limiter.acquire(estimated, deadline)
+            start = time.perf_counter()
+            raw = client.chat.completions.with_raw_response.create(**params)
+        except OpenAIError as e:
+            _settle_refused(limiter, estimated, e)
+            delay = _retry_delay(e, selected_api, labels, breaker, limiter, retries)
+            if delay is not None:
+                retries += 1
+                time.sleep(delay)
+            continue
+        except BaseException:
+            # Budget épuisé (RateLimitTimeout)... : ni succès ni échec du fournisseur
+            breaker.release()
+            raise
+        breaker.record_success()
+        limiter.update_from_headers(raw.headers)
+        completion = raw.parse()
+        if params.get("stream"):
+            # Usage réel connu à la fin du flux, lu par l'appelant
+            return _SettledStream(completion, limiter, estimated)
+        _record_latency(selected_api, params["model"], time.perf_counter() - start, completion)
+        _settle_usage(limiter, estimated, completion)
+        return completion
+
+
+async def _send_completion_async(client, selected_api: str, params: dict):
+    """Version asynchrone de _send_completion"""
+    from openai import OpenAIError
+
+    limiter = get_rate_limiter(selected_api, client.api_key)
+    breaker = get_circuit_breaker(selected_api)
+    labels = {"api": selected_api, "model": params["model"]}
+    estimated = _estimate_tokens(params["messages"])
+    deadline = deadline_from_now()
+    retries = 0
+    while True:
+        breaker.before_call()
+        try:
+            with metrics.stage("rate_limit_wait", **labels):
+                await limiter.acquire_async(estimated, deadline)
+            start = time.perf_counter()
+            raw = await client.chat.completions.with_raw_response.create(**params)
+        except OpenAIError as e:
+            _settle_refused(limiter, estimated, e)
+            delay = _retry_delay(e, selected_api, labels, breaker, limiter, retries)
+            if delay is not None:
+                retries += 1
+                await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # Budget épuisé, ou requête de couverture perdante annulée : ni succès ni échec
+            breaker.release()
+            raise
+        breaker.record_success()
+        limiter.update_from_headers(raw.headers)
+        completion = raw.parse()
+        _record_latency(selected_api, params["model"], time.perf_counter() - start, completion)
+        _settle_usage(limiter, estimated, completion)
+        return completion
+
+
+def execute_chat_completion(client, selected_api: str, selected_model: str, messages: list, stream: bool = False) -> tuple[bool, Optional[object]]:
     """Exécute une requête de complétion chat en fonction de l'API choisie et gère les erreurs
     
     Args:
@@ -185,68 +463,101 @@ def execute_chat_completion(client, selected_api: str, selected_model: str, mess
         selected_api (str): Type d'API ("openai" ou "perplexity")
         selected_model (str): Nom du modèle à utiliser
         messages (list): Structure de messages pour la requête
+        stream (bool): Si vrai, retourne le flux de morceaux au lieu de la réponse complète
         
     Returns:
         tuple: 
             - bool: Succès de la requête API
-            - object: Réponse de l'API ou None en cas d'échec
+            - object: Réponse de l'API (ou flux) ou None en cas d'échec
     """
+    from openai import BadRequestError, OpenAIError
 
     try:
-            print(selected_api, selected_model)
-            if selected_api == "openai":
-                # OpenAI requires response_format
-                completion = client.chat.completions.create(
-                    model=selected_model,
-                    messages=messages,
-                    response_format={"type": "json_object"}
+            params = build_completion_params(selected_api, selected_model, messages, stream)
+            try:
+                completion = _send_completion(client, selected_api, params)
+            except BadRequestError as e:
+                if not _fall_back_from_schema(selected_api, selected_model, params, e):
+                    raise
+                completion = _send_completion(
+                    client, selected_api, build_completion_params(selected_api, selected_model, messages, stream)
                 )
-            else:
-                # Perplexity doesn't support response_format
-                completion = client.chat.completions.create(
-                    model=selected_model,
-                    messages=messages
+            print_colored("✅ Connexion réussie", **MSG_COLOR["success"])
+            if not stream:
+                # En streaming, l'usage arrive dans le dernier morceau
+                report_usage(completion.usage, selected_api, selected_model)
+            return (completion,True)
+    except (RateLimitTimeout, CircuitOpenError):
+        # Pas un échec de l'appel : l'appelant répond 429/503 avec Retry-After
+        raise
+    except OpenAIError as e:
+        handle_api_errors(e, selected_api )
+        get_model_router().record_outcome(selected_api, selected_model, False)
+        return (False, None)
+    except Exception as e:
+        print_colored(f"❗ ERREUR INCONNUE : {str(e)}", **MSG_COLOR["error"])
+        return (False, None)
+
+async def execute_chat_completion_async(client, selected_api: str, selected_model: str, messages: list) -> tuple[bool, Optional[object]]:
+    """Version asynchrone d'execute_chat_completion pour un client AsyncOpenAI
+    
+    Returns:
+        tuple: Même contrat que execute_chat_completion
+    """
+    from openai import BadRequestError, OpenAIError
+
+    try:
+            params = build_completion_params(selected_api, selected_model, messages)
+            try:
+                completion = await _send_completion_async(client, selected_api, params)
+            except BadRequestError as e:
+                if not _fall_back_from_schema(selected_api, selected_model, params, e):
+                    raise
+                completion = await _send_completion_async(
+                    client, selected_api, build_completion_params(selected_api, selected_model, messages)
                 )
             print_colored("✅ Connexion réussie", **MSG_COLOR["success"])
+            report_usage(completion.usage, selected_api, selected_model)
             return (completion,True)
+    except (RateLimitTimeout, CircuitOpenError):
+        raise
     except OpenAIError as e:
         handle_api_errors(e, selected_api )
+        get_model_router().record_outcome(selected_api, selected_model, False)
         return (False, None)
     except Exception as e:
         print_colored(f"❗ ERREUR INCONNUE : {str(e)}", **MSG_COLOR["error"])
         return (False, None)
 
-def fetch_api_keys(selected_api: str) -> tuple[Optional[str], Optional[str]]:
+def fetch_api_keys(selected_api: str, interactive: bool = True) -> tuple[Optional[str], Optional[str]]:
     """Récupère les clés d'API depuis les variables d'environnement ou saisie manuelle selon l'API choisie
     
     Args:
         selected_api (str): Type d'API ("openai" ou "perplexity")
+        interactive (bool): Demander la clé manquante au clavier (False : variables d'environnement seulement)
         
     Returns:
         tuple:
             - str: Clé OpenAI ou None
             - str: Clé Perplexity ou None
-            
-    Raises:
-        SystemExit: Si aucune clé valide n'est fournie
+            (les clés absentes valent None : l'appelant décide, sans arrêt du processus ici)
     """
     openai_key = os.getenv('OPENAI_KEY')
     perplexity_key = os.getenv('PERPLEXITY_KEY')
+    if selected_api == "fake":
+        # Faux fournisseur local : aucune clé requise
+        return openai_key, perplexity_key
 
     # Demande manuelle de la clé si manquante, selon l'API choisie
     if selected_api == "openai":
         # Vérification de la clé OpenAI
-        if not openai_key:
+        if not openai_key and interactive:
             # Demande interactive si la clé n'est pas présente dans .env
             openai_key = input("Clé OpenAI (laisser vide pour utiliser .env) : ").strip()
     else:
-        if not perplexity_key:
+        if not perplexity_key and interactive:
             perplexity_key = input("Clé Perplexity (laisser vide pour utiliser .env) : ").strip()
 
-    if not (openai_key or perplexity_key):
-        print_colored("❌ Clés d'API manquantes", **MSG_COLOR["error"])
-        sys.exit(1)
-
     return openai_key, perplexity_key 
 
 
@@ -254,11 +565,21 @@ def fetch_api_keys(selected_api: str) -> tuple[Optional[str], Optional[str]]:
     
 # Implemtation de la logic    
 def main():
+    from dotenv import load_dotenv
+    from pipeline import record_result
+
     load_dotenv(override=True)
+    setup_cli_logging()
     
     selected_api, selected_model, card_choice =  prompt_for_api_and_model_selection()
+    if selected_model == AUTO_MODEL:
+        selected_model = get_model_router().choose(selected_api)
+        print_colored(f"🧭 Modèle choisi automatiquement : {selected_model}", **MSG_COLOR["info"])
 
     OPENAI_KEY, PERPLEXITY_KEY = fetch_api_keys(selected_api)
+    if not (OPENAI_KEY or PERPLEXITY_KEY):
+        print_colored("❌ Clés d'API manquantes", **MSG_COLOR["error"])
+        sys.exit(1)
 
     #Client creation
     client = create_api_client(selected_api, OPENAI_KEY, PERPLEXITY_KEY)
@@ -271,12 +592,25 @@ def main():
     api_success = False
     processing_success = False
 
-    completion, api_success = execute_chat_completion(client, selected_api, selected_model, messages)
-    
-    response_text = clean_json(completion.choices[0].message.content)
+    try:
+        completion, api_success = execute_chat_completion(client, selected_api, selected_model, messages)
+    except RateLimitTimeout as e:
+        print_colored(f"⏳ {selected_api.upper()}: Limite de débit atteinte, réessayez dans {e.retry_after:.0f} s", **MSG_COLOR["warning"])
+    except CircuitOpenError as e:
+        print_colored(f"🔴 {selected_api.upper()}: Fournisseur indisponible, réessayez dans {e.retry_after:.0f} s", **MSG_COLOR["error"])
 
     if api_success:
-        processing_success = process_api_response_and_validate(completion,selected_api, response_text)
+        try:
+            response_text = clean_json(completion.choices[0].message.content)
+            processing_success = process_api_response_and_validate(completion, selected_api, response_text)
+            record_result(card_choice, selected_api, selected_model, response_text, processing_success)
+            if processing_success:
+                # Sortie lisible du mode interactif
+                save_data("result.json", processing_success)
+                print_colored("💾 Résultat sauvegardé dans result.json", **MSG_COLOR["success"])
+        except JSONExtractionError:
+            get_model_router().record_outcome(selected_api, selected_model, False)
+            processing_success = False
     if not api_success:
         print_colored("❌ ÉCHEC DE LA CONNEXION", **MSG_COLOR["error"])
     elif processing_success:
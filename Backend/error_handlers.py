@@ -1,59 +1,95 @@
 
 import json
-from flask import logging
-from jsonschema import ValidationError
-from openai import APIConnectionError, AuthenticationError, OpenAIError, RateLimitError
-from core_functions import MSG_COLOR, print_colored
+import logging
+from config import MSG_COLOR, console_output, print_colored
+from json_extract import JSONExtractionError
+from metrics import metrics
+
+logger = logging.getLogger("cards.errors")
 
 
 def handle_api_errors(e: Exception, api_type: str="", response_text=""):
-    """Gère les erreurs d'API de manière centralisée avec messages colorés
-    
+    """Gère les erreurs d'API de manière centralisée
+
+    En mode manuel, messages colorés dans le terminal ; dans tous les cas un
+    enregistrement de journalisation (error_kind, api), écrit en JSON par
+    les modes serveur et dans error.log en mode manuel.
+
     Args:
         e (Exception): Exception capturée
         api_type (str): Type d'API concerné ("openai" ou "perplexity")
     """
 
+    # Importés ici : une erreur n'impose pas le chargement du SDK au démarrage
+    from openai import APIConnectionError, AuthenticationError, OpenAIError, RateLimitError
+    from pydantic import ValidationError
+
     error_message = str(e)
+    api = api_type.upper()
+    level = "error"
+    details = []  # lignes complémentaires pour le terminal : (texte, couleur)
 
     # Authentification invalide (clés incorrectes ou expirées)
     if isinstance(e, AuthenticationError):
-        msg = f"🔒 {api_type.upper()}: Clé API invalide"
-        print_colored(msg, **MSG_COLOR["error"])
-        logging.error(msg)    # Limite de requêtes atteinte (API saturée)
+        kind = "authentication"
+        msg = f"🔒 {api}: Clé API invalide"
+    # Limite de requêtes atteinte (API saturée)
     elif isinstance(e, RateLimitError):
-        msg = f"⏳ {api_type.upper()}: Limite de débit atteinte"
-        print_colored(msg, **MSG_COLOR["warning"])
-        logging.warning(msg)    # Erreur de connexion réseau ou API hors ligne
+        kind, level = "rate_limit", "warning"
+        msg = f"⏳ {api}: Limite de débit atteinte"
+    # Erreur de connexion réseau ou API hors ligne
     elif isinstance(e, APIConnectionError):
-        msg = f"🔴 {api_type.upper()}: Connexion impossible"
-        print_colored(msg, **MSG_COLOR["error"])
-        logging.error(msg)    # Réponse non conforme au format JSON attendu
+        kind = "connection"
+        msg = f"🔴 {api}: Connexion impossible"
+    # Réponse non conforme au format JSON attendu
+    elif isinstance(e, JSONExtractionError):
+        kind = "json_extraction"
+        msg = f"❌ ERREUR JSON : {error_message}"
+        details = [(f"Contenu reçu : '{response_text[:50]}...'", {"color": "magenta"})]
     elif isinstance(e,json.JSONDecodeError):
-        print_colored("❌ ERREUR JSON : Format incorrect", **MSG_COLOR["error"])
-        print_colored(f"Détails : {str(e)}", color="yellow")  # Use keyword argument
-        print_colored(f"Contenu reçu : '{response_text[:50]}...'", color="magenta")
-        print_colored("Vérifiez la structure de la réponse API", **MSG_COLOR["warning"])
+        kind = "json_decode"
+        msg = "❌ ERREUR JSON : Format incorrect"
+        details = [
+            (f"Détails : {error_message}", {"color": "yellow"}),
+            (f"Contenu reçu : '{response_text[:50]}...'", {"color": "magenta"}),
+            ("Vérifiez la structure de la réponse API", MSG_COLOR["warning"]),
+        ]
     # Données non conformes au modèle Pydantic
     elif isinstance(e, ValidationError):
-        print_colored("⚠️ ERREUR DE VALIDATION", **MSG_COLOR["warning"])
-        for error in e.errors():
-            loc = " → ".join(map(str, error['loc']))
-            print_colored(f"  • {loc} : {error['msg']}", **MSG_COLOR["error"])
+        kind, level = "validation", "warning"
+        msg = "⚠️ ERREUR DE VALIDATION"
+        details = [
+            (f"  • {' → '.join(map(str, error['loc']))} : {error['msg']}", MSG_COLOR["error"])
+            for error in e.errors()
+        ]
     # Incohérence de type (ex: str au lieu de int)
     elif isinstance(e, TypeError):
-        print_colored("❗ ERREUR DE TYPE : Données non sérialisables", **MSG_COLOR["error"])
-        print_colored(f"Détails : {str(e)}", color="yellow")
+        kind = "type"
+        msg = "❗ ERREUR DE TYPE : Données non sérialisables"
+        details = [(f"Détails : {error_message}", {"color": "yellow"})]
     # Valeur invalide (ex: champ requis manquant)
     elif isinstance(e, ValueError):
-        print_colored(f"❗ ERREUR DE TYPE/VALEUR : {str(e)}", **MSG_COLOR["error"])
+        kind = "value"
+        msg = f"❗ ERREUR DE TYPE/VALEUR : {error_message}"
     elif isinstance(e, OpenAIError):
-        msg = f"❗ {api_type.upper()}: Erreur OpenAI - {error_message}"
-        print_colored(msg, **MSG_COLOR["error"])
-        logging.error(msg)
+        kind = "provider"
+        msg = f"❗ {api}: Erreur OpenAI - {error_message}"
     # Structure des messages incorrecte pour l'API
     elif "Last message must have role `user`" in error_message:
-        print_colored(f"⚠️ {api_type.upper()}: Dernier message doit être un message utilisateur (role `user`)", **MSG_COLOR["warning"])
+        kind, level = "message_structure", "warning"
+        msg = f"⚠️ {api}: Dernier message doit être un message utilisateur (role `user`)"
     # Erreur générique non catégorisée
     else:
-        print_colored(f"❗ {api_type.upper()}: {error_message}", **MSG_COLOR["error"])
+        kind = "unknown"
+        msg = f"❗ {api}: {error_message}"
+
+    metrics.inc("api_errors_total", kind=kind, api=api_type or "none")
+    if console_output():
+        print_colored(msg, **MSG_COLOR[level])
+        for text, color in details:
+            print_colored(text, **color)
+    logger.log(
+        logging.WARNING if level == "warning" else logging.ERROR,
+        msg,
+        extra={"error_kind": kind, "api": api_type, "error": error_message, "details": [text for text, _ in details]},
+    )
@@ -0,0 +1,356 @@
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Réponse type d'un fournisseur, reprise de previus.json
+SAMPLE_CARD = {
+    "cardName": "American Express® Gold Rewards Card",
+    "issuer": "American Express Canada",
+    "annualFee": "250$",
+    "interestRate": {
+        "purchaseRate": "21.99%",
+        "cashAdvanceRate": "21.99%",
+        "balanceTransferRate": "null",
+    },
+    "welcomeOffer": {
+        "bonusPoints": 60000,
+        "description": "Earn 60,000 Membership Rewards® points after spending $6,000 on eligible purchases in the first 6 months of Card Membership",
+    },
+    "rewardsProgram": {
+        "program": "Membership Rewards",
+        "earnRates": {
+            "regularSpending": "2X points on travel, gas, groceries, and drugstores in Canada; 1X points on other purchases"
+        },
+        "redemptionOptions": [
+            "Transfer to airline/hotel partners",
+            "Statement credits",
+            "Travel bookings through Amex Travel",
+        ],
+    },
+    "mainBenefits": [
+        "4 complimentary Plaza Premium Lounge visits annually",
+        "$100 Annual Travel Credit",
+        "$50 NEXUS application fee credit every 4 years",
+        "No foreign transaction fees",
+        "Metal card design (Gold or Rose Gold)",
+    ],
+    "creditScoreRecommendation": "null",
+    "foreignTransactionFee": "None",
+    "officialWebsite": "https://www.americanexpress.com/en-ca/credit-cards/gold-rewards-card/",
+}
+
+
+# Ligne finale des requêtes de build_api_messages
+_CARD_LINE = re.compile(r"^Card: (.+)$", re.MULTILINE)
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+def _pretty(card: dict) -> str:
+    return json.dumps(card, indent=2, ensure_ascii=False)
+
+
+# Réponses mal formées observées chez les fournisseurs ; previus.json est lui-même un tableau
+MALFORMED_OUTPUTS = {
+    "array": lambda card: _pretty([card]),
+    "fenced": lambda card: f"```json\n{_pretty(card)}\n```",
+    "prose": lambda card: f"Here is the JSON you asked for:\n{_pretty(card)}\nLet me know if you need more.",
+    "trailing-comma": lambda card: _pretty(card)[:-2] + ",\n}",
+    "truncated": lambda card: _pretty(card)[:len(_pretty(card)) // 2],
+    "missing-fields": lambda card: _pretty({key: value for key, value in card.items() if key not in ("annualFee", "issuer")}),
+}
+
+
+def requested_card(messages: list) -> dict:
+    """SAMPLE_CARD renommée d'après la carte demandée (dernière ligne "Card: ..." des messages)"""
+    for message in reversed(messages):
+        match = _CARD_LINE.search(str(message.get("content", "")))
+        if match:
+            return {**SAMPLE_CARD, "cardName": match.group(1).strip()}
+    return SAMPLE_CARD
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    """Répond à /chat/completions comme un fournisseur compatible OpenAI"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, comme les vrais fournisseurs
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        rate_headers, retry_after = self._rate_limit()
+        if retry_after is not None:
+            self._send_json(429, {"error": {"message": "Rate limit reached for requests", "type": "requests", "code": "rate_limit_exceeded"}},
+                            {**rate_headers, "Retry-After": str(retry_after)})
+            return
+
+        server = self.server
+        with server.lock:
+            # Tirages sous verrou : une même graine rejoue la même suite de réponses
+            rate_limited = server.random.random() < server.rate_limit_rate
+            if rate_limited:
+                server.rejected += 1
+            else:
+                server.received += 1
+            failed = server.random.random() < server.error_rate
+            latency = self._draw_latency()
+            malformed = None
+            if server.random.random() < server.malformed_rate:
+                malformed = server.random.choice(sorted(MALFORMED_OUTPUTS))
+        if rate_limited:
+            self._send_json(429, {"error": {"message": "Rate limit reached for requests", "type": "requests", "code": "rate_limit_exceeded"}},
+                            {**rate_headers, "Retry-After": "1"})
+            return
+        if failed:
+            self._send_json(503, {"error": {"message": "The server is overloaded", "type": "server_error"}})
+            return
+        if latency:
+            time.sleep(latency)
+
+        card = requested_card(body.get("messages") or [])
+        if malformed is None:
+            content = json.dumps(card, ensure_ascii=False)
+        else:
+            content = MALFORMED_OUTPUTS[malformed](card)
+        usage = self._usage(body.get("messages") or [], content)
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            self._send_stream(body.get("model", "fake"), content, usage if include_usage else None)
+            return
+
+        self._send_json(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }, rate_headers)
+
+    def _draw_latency(self) -> float:
+        """Délai de la réponse selon la distribution choisie (moyenne = latency), appelé sous verrou"""
+        server = self.server
+        rng = server.random
+        if server.slow_rate and rng.random() < server.slow_rate:
+            return server.slow_latency
+        mean = server.latency
+        if not mean:
+            return 0.0
+        if server.latency_dist == "uniform":
+            return rng.uniform(0, 2 * mean)
+        if server.latency_dist == "exponential":
+            return rng.expovariate(1 / mean)
+        if server.latency_dist == "lognormal":
+            sigma = server.latency_sigma
+            return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+        return mean
+
+    def _rate_limit(self) -> tuple:
+        """Limite de requêtes par minute, reconstituée en continu comme chez OpenAI
+
+        Returns:
+            tuple: (en-têtes x-ratelimit-*, Retry-After en secondes si la requête est refusée)
+        """
+        rpm = self.server.rpm
+        if not rpm:
+            return {}, None
+        now = time.monotonic()
+        with self.server.lock:
+            level = min(rpm, self.server.rate_level + (now - self.server.rate_updated) * rpm / 60)
+            self.server.rate_updated = now
+            allowed = level >= 1
+            if allowed:
+                level -= 1
+            else:
+                self.server.rejected += 1
+            self.server.rate_level = level
+        headers = {
+            "x-ratelimit-limit-requests": str(rpm),
+            "x-ratelimit-remaining-requests": str(int(level)),
+            "x-ratelimit-reset-requests": f"{(rpm - level) * 60 / rpm:.3f}s",
+        }
+        return headers, None if allowed else max(1, math.ceil((1 - level) * 60 / rpm))
+
+    def _usage(self, messages: list, content: str) -> dict:
+        """Usage simulé (~4 caractères par jeton) avec cache de préfixe
+
+        Les jetons en cache correspondent au préfixe commun avec la requête
+        précédente, par tranches de 128 comme chez OpenAI (sans le minimum
+        de 1024 jetons du vrai service).
+        """
+        prompt = "".join(str(message.get("content", "")) for message in messages)
+        with self.server.lock:
+            previous, self.server.last_prompt = self.server.last_prompt, prompt
+        common = 0
+        for a, b in zip(prompt, previous):
+            if a != b:
+                break
+            common += 1
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": common // 4 // 128 * 128},
+        }
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model: str, content: str, usage: dict = None, chunk_size: int = 16) -> None:
+        """Envoie la réponse en Server-Sent Events, comme stream=True chez OpenAI"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        for start in range(0, len(content), chunk_size):
+            if start and self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": content[start:start + chunk_size]},
+                    "finish_reason": None,
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        if usage is not None:
+            # Dernier morceau sans choix, comme stream_options={"include_usage": True}
+            final = {"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                     "created": int(time.time()), "model": model, "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _FakeProviderServer(ThreadingHTTPServer):
+    # File d'attente large : les tests de charge ouvrent des centaines de connexions d'un coup
+    request_queue_size = 1024
+
+
+def start_fake_provider(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    chunk_delay: float = 0.0,
+    rpm: int = 0,
+    error_rate: float = 0.0,
+    slow_rate: float = 0.0,
+    slow_latency: float = 0.0,
+    latency_dist: str = "fixed",
+    latency_sigma: float = 0.5,
+    rate_limit_rate: float = 0.0,
+    malformed_rate: float = 0.0,
+    seed: int = None,
+) -> ThreadingHTTPServer:
+    """Démarre le faux fournisseur dans un thread en arrière-plan
+
+    Args:
+        host (str): Adresse d'écoute
+        port (int): Port d'écoute, 0 pour un port libre
+        latency (float): Délai artificiel avant chaque réponse, en secondes
+        chunk_delay (float): Délai entre deux morceaux d'une réponse en flux
+        rpm (int): Requêtes acceptées par minute avant de répondre 429, 0 pour illimité
+        error_rate (float): Part des requêtes qui reçoivent un 503
+        slow_rate (float): Part des requêtes servies avec slow_latency au lieu de latency (traîne)
+        slow_latency (float): Délai des requêtes lentes, en secondes
+        latency_dist (str): "fixed", "uniform" (0 à 2 x latency), "exponential" ou "lognormal" (moyenne latency)
+        latency_sigma (float): Écart type du logarithme pour "lognormal"
+        rate_limit_rate (float): Part des requêtes refusées au hasard avec 429 (en plus de rpm)
+        malformed_rate (float): Part des réponses mal formées (MALFORMED_OUTPUTS)
+        seed (int): Graine des tirages aléatoires, pour des séries reproductibles
+
+    Returns:
+        ThreadingHTTPServer: Serveur démarré ; base_url donne l'URL à utiliser
+    """
+    server = _FakeProviderServer((host, port), FakeProviderHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.chunk_delay = chunk_delay
+    server.lock = threading.Lock()
+    server.last_prompt = ""
+    server.rpm = rpm
+    server.rate_level = float(rpm)
+    server.rate_updated = time.monotonic()
+    server.rejected = 0  # réponses 429 envoyées
+    server.received = 0  # requêtes admises par la limite de débit
+    server.error_rate = error_rate
+    server.slow_rate = slow_rate
+    server.slow_latency = slow_latency
+    if latency_dist not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"latency_dist doit être l'une de : {', '.join(LATENCY_DISTRIBUTIONS)}")
+    server.latency_dist = latency_dist
+    server.latency_sigma = latency_sigma
+    server.rate_limit_rate = rate_limit_rate
+    server.malformed_rate = malformed_rate
+    server.random = random.Random(seed)
+    server.base_url = f"http://{host}:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# python fake_provider.py --port 8001 --latency 0.5
+# python fake_provider.py --latency 0.3 --latency-dist lognormal --rate-limit-rate 0.02 --malformed-rate 0.05 --seed 1
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible fake provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay before each response, in seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Delay between streamed chunks, in seconds")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before answering 429 (default: unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of requests delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="Delay of slow requests, in seconds")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed",
+                        help="Latency distribution, with --latency as its mean (default: fixed)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-space standard deviation for lognormal")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a random 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of responses with malformed JSON")
+    parser.add_argument("--seed", type=int, help="Random seed, for reproducible runs")
+    args = parser.parse_args()
+
+    server = start_fake_provider(
+        args.host, args.port, args.latency, args.chunk_delay, args.rpm,
+        args.error_rate, args.slow_rate, args.slow_latency,
+        latency_dist=args.latency_dist,
+        latency_sigma=args.latency_sigma,
+        rate_limit_rate=args.rate_limit_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    print(f"Fake provider running on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
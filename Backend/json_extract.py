@@ -0,0 +1,276 @@
+import bisect
+import json
+import re
+from typing import Iterable, List, Optional, Tuple
+
+_decoder = json.JSONDecoder()
+
+
+class JSONExtractionError(ValueError):
+    """Aucun objet JSON exploitable dans la réponse du fournisseur"""
+
+    def __init__(self, message: str, position: Optional[int] = None):
+        super().__init__(message)
+        self.position = position
+
+
+class JSONObjectScanner:
+    """Repère en une seule passe les objets JSON de premier niveau d'un texte
+
+    Le texte peut arriver par morceaux (feed) : l'état (profondeur, chaîne,
+    échappement) est conservé entre deux appels. Tout ce qui est hors d'un
+    objet (prose, balises ```json) est sauté sans copie.
+    """
+
+    # Caractères qui modifient l'état hors des chaînes ; les sous-classes
+    # peuvent en ajouter (',' et ':' pour l'analyse champ par champ)
+    _structural = re.compile(r'[{}\[\]"]')
+    _string_special = re.compile(r'["\\]')
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+
+    @property
+    def incomplete(self) -> bool:
+        """Vrai si un objet a été ouvert mais pas encore refermé"""
+        return self._depth > 0
+
+    def feed(self, chunk: str) -> List[Tuple[int, int]]:
+        """Ajoute un morceau de texte et retourne les objets refermés
+
+        Args:
+            chunk (str): Suite du texte
+
+        Returns:
+            list: Positions (début, fin) dans buffer des objets complétés
+        """
+        self.buffer += chunk
+        buffer = self.buffer
+        end = len(buffer)
+        pos = self._pos
+        spans = []
+
+        while pos < end:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = self._string_special.search(buffer, pos)
+                if match is None:
+                    pos = end
+                    break
+                pos = match.start()
+                if buffer[pos] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    self._on_string_end(pos)
+                pos += 1
+                continue
+
+            if self._depth == 0:
+                pos = buffer.find("{", pos)
+                if pos == -1:
+                    pos = end
+                    break
+                self._start = pos
+                self._depth = 1
+                self._on_object_start(pos)
+                pos += 1
+                continue
+
+            match = self._structural.search(buffer, pos)
+            if match is None:
+                pos = end
+                break
+            pos = match.start()
+            char = buffer[pos]
+            if char == '"':
+                self._in_string = True
+                self._on_string_start(pos)
+            elif char in "{[":
+                self._depth += 1
+                self._on_open(char, pos)
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    spans.append((self._start, pos + 1))
+                    self._on_object_end(pos)
+                else:
+                    self._on_close(char, pos)
+            else:
+                self._on_delimiter(char, pos)
+            pos += 1
+
+        self._pos = pos
+        return spans
+
+    # Points d'extension pour les analyseurs incrémentaux
+    def _on_object_start(self, pos: int) -> None:
+        pass
+
+    def _on_object_end(self, pos: int) -> None:
+        pass
+
+    def _on_open(self, char: str, pos: int) -> None:
+        """Accolade ou crochet ouvrant à l'intérieur d'un objet"""
+
+    def _on_close(self, char: str, pos: int) -> None:
+        """Accolade ou crochet fermant qui ne termine pas l'objet de premier niveau"""
+
+    def _on_string_start(self, pos: int) -> None:
+        pass
+
+    def _on_string_end(self, pos: int) -> None:
+        pass
+
+    def _on_delimiter(self, char: str, pos: int) -> None:
+        pass
+
+
+class _CandidateScanner(JSONObjectScanner):
+    """Relève les objets refermés à toutes les profondeurs, candidats au décodage"""
+
+    def __init__(self):
+        super().__init__()
+        self.objects = []  # (début, fin) de chaque objet refermé
+        self.opened = []   # accolades ouvrantes vues hors des chaînes, dans l'ordre
+        self._stack = []   # position de chaque accolade ouverte, None pour un crochet
+
+    def _on_object_start(self, pos: int) -> None:
+        self._on_open("{", pos)
+
+    def _on_open(self, char: str, pos: int) -> None:
+        if char == "{":
+            self.opened.append(pos)
+            self._stack.append(pos)
+        else:
+            self._stack.append(None)
+
+    def _on_close(self, char: str, pos: int) -> None:
+        start = self._stack.pop()
+        if start is not None and char == "}":
+            self.objects.append((start, pos + 1))
+
+    def _on_object_end(self, pos: int) -> None:
+        self._on_close(self.buffer[pos], pos)
+
+    def unclosed(self) -> Optional[int]:
+        """Position de la plus externe des accolades restées ouvertes"""
+        return next((start for start in self._stack if start is not None), None)
+
+
+def extract_json(response_text: str, expected_keys: Optional[Iterable[str]] = None) -> dict:
+    """Extrait l'objet JSON d'une réponse de modèle
+
+    Gère les balises markdown, la prose avant/après (même avec des
+    accolades) et plusieurs objets candidats. Les objets valides sont
+    décodés directement dans le texte ; au premier échec, une seule passe
+    du scanner relève les objets équilibrés restants et seuls ceux-ci sont
+    décodés, au plus une fois par position. Le candidat retenu est celui
+    qui contient le plus de clés attendues (le plus grand à égalité).
+
+    Une accolade ou un guillemet isolé dans la prose peut désaligner le
+    scanner : l'intérieur d'un candidat refusé (ou resté ouvert) n'est
+    parcouru de nouveau que s'il contient des accolades que le scanner a
+    prises pour du texte.
+
+    Args:
+        response_text (str): Contenu brut de la réponse
+        expected_keys (iterable): Clés permettant de reconnaître le bon objet ;
+            si fournies, un objet sans aucune de ces clés est rejeté
+
+    Returns:
+        dict: Objet JSON décodé
+
+    Raises:
+        JSONExtractionError: Si aucun objet JSON valide n'est trouvé
+    """
+    if not isinstance(response_text, str):
+        raise JSONExtractionError("Réponse API vide ou non textuelle")
+    if "{" not in response_text:
+        raise JSONExtractionError("Aucun JSON détecté dans la réponse")
+
+    expected = set(expected_keys or ())
+    best, best_score, error, unclosed, too_deep = None, None, None, None, None
+    regions = []
+    start = response_text.find("{")
+    while start != -1:
+        # Chemin courant : objets valides décodés d'un bloc, de la fin de l'un au début du suivant
+        try:
+            candidate, covered = _decoder.raw_decode(response_text, start)
+        except (json.JSONDecodeError, RecursionError):
+            # Premier échec : le scanner prend le relais jusqu'à la fin du texte
+            regions.append((start, len(response_text)))
+            break
+        if isinstance(candidate, dict):
+            score = (len(expected.intersection(candidate)), covered - start)
+            if (not expected or score[0]) and (best_score is None or score > best_score):
+                best, best_score = candidate, score
+        start = response_text.find("{", covered)
+
+    decoded = set()
+    first_pass = True
+    while regions:
+        offset, end = regions.pop()
+        scanner = _CandidateScanner()
+        scanner.feed(response_text[offset:end] if offset or end < len(response_text) else response_text)
+        if first_pass and scanner.unclosed() is not None:
+            unclosed = offset + scanner.unclosed()
+        first_pass = False
+
+        suspects = []
+        covered = -1
+        failures = []  # (fin, position de l'erreur) des candidats refusés qui englobent le suivant
+        for start, stop in sorted(scanner.objects):
+            start, stop = start + offset, stop + offset
+            while failures and failures[-1][0] <= start:
+                failures.pop()
+            if start < covered or start in decoded:
+                continue
+            if failures and start < failures[-1][1] < stop:
+                # Le décodage d'un objet imbriqué suit le même chemin : même erreur, au même endroit
+                continue
+            decoded.add(start)
+            try:
+                candidate, covered = _decoder.raw_decode(response_text, start)
+            except json.JSONDecodeError as e:
+                error = error or e
+                suspects.append((start, stop))
+                failures.append((stop, e.pos))
+                continue
+            except RecursionError:
+                # Imbrication plus profonde que la pile du décodeur : objets internes ignorés
+                too_deep = start if too_deep is None else too_deep
+                covered = stop
+                continue
+            if isinstance(candidate, dict):
+                score = (len(expected.intersection(candidate)), covered - start)
+                if (not expected or score[0]) and (best_score is None or score > best_score):
+                    best, best_score = candidate, score
+        if scanner.unclosed() is not None:
+            suspects.append((offset + scanner.unclosed(), end))
+
+        for start, stop in suspects:
+            # Accolades cachées dans une chaîne mal délimitée : nouvelle passe à l'intérieur
+            seen = (bisect.bisect_left(scanner.opened, stop - offset)
+                    - bisect.bisect_left(scanner.opened, start - offset))
+            if response_text.count("{", start, stop) > seen:
+                regions.append((start + 1, stop))
+
+    if best is not None:
+        return best
+    # Chemin d'erreur uniquement : distinguer une réponse tronquée d'un JSON invalide
+    if unclosed is not None:
+        raise JSONExtractionError("JSON incomplet : accolade fermante manquante", unclosed)
+    if error is not None:
+        raise JSONExtractionError(f"JSON invalide : {error.msg}", error.pos) from error
+    if too_deep is not None:
+        raise JSONExtractionError("JSON trop imbriqué", too_deep)
+    raise JSONExtractionError("Aucun objet JSON attendu dans la réponse")
@@ -0,0 +1,89 @@
+import json
+import re
+from typing import List, Tuple
+
+from json_extract import JSONObjectScanner
+
+
+class StreamingFieldParser(JSONObjectScanner):
+    """Analyse incrémentale d'un objet JSON reçu par morceaux
+
+    Chaque clé de premier niveau est émise dès que sa valeur est complète,
+    sans attendre la fin de l'objet. Le texte qui précède la première
+    accolade (prose, balise ```json) est ignoré.
+    """
+
+    _structural = re.compile(r'[{}\[\]",:]')
+
+    def __init__(self):
+        super().__init__()
+        self._finished = False
+        self._emitted = 0
+        self._fields = []
+        # Positions dans le buffer de la clé et de la valeur en cours (niveau 1)
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+
+    @property
+    def finished(self) -> bool:
+        """Vrai une fois l'accolade fermante de l'objet reçue"""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        """Ajoute un morceau de texte et retourne les champs complétés
+
+        Args:
+            chunk (str): Texte reçu du fournisseur
+
+        Returns:
+            list: Paires (clé, valeur décodée) terminées par ce morceau
+        """
+        if self._finished:
+            return []
+        super().feed(chunk)
+        fields, self._fields = self._fields, []
+        return fields
+
+    def _at_top_level(self) -> bool:
+        # Seul le premier objet compte : la suite du flux est ignorée
+        return self._depth == 1 and not self._finished
+
+    def _on_string_start(self, pos: int) -> None:
+        if self._at_top_level() and self._key is None:
+            self._key_start = pos
+
+    def _on_string_end(self, pos: int) -> None:
+        if self._at_top_level() and self._key is None and self._key_start is not None:
+            try:
+                self._key = json.loads(self.buffer[self._key_start:pos + 1])
+            except ValueError:
+                self._key_start = None
+
+    def _on_delimiter(self, char: str, pos: int) -> None:
+        if not self._at_top_level():
+            return
+        if char == ":" and self._value_start is None:
+            self._value_start = pos + 1
+        elif char == ",":
+            self._emit(pos)
+
+    def _on_object_end(self, pos: int) -> None:
+        if not self._finished:
+            self._emit(pos)
+            # Un objet sans aucun champ valide (ex. "{x}" dans la prose) ne
+            # compte pas : on attend l'objet suivant
+            self._finished = self._emitted > 0
+
+    def _emit(self, end: int) -> None:
+        if self._key is not None and self._value_start is not None:
+            value_text = self.buffer[self._value_start:end]
+            if value_text.strip():
+                try:
+                    self._fields.append((self._key, json.loads(value_text)))
+                    self._emitted += 1
+                except ValueError:
+                    pass  # valeur malformée : la validation finale tranchera
+        self._key_start = None
+        self._key = None
+        self._value_start = None
@@ -0,0 +1,173 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, Optional, Tuple
+
+# Bornes (secondes) des histogrammes de latence : de la lecture de cache à l'appel de recherche approfondie
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Détail des étapes de la requête en cours (None hors d'un request_timings)
+_request_stages: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_stages", default=None)
+
+
+def _label_key(labels: dict) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    """Compteurs et histogrammes du processus, identifiés par un nom et des étiquettes
+
+    Exemple : metrics.inc("prompt_tokens_total", 412, api="openai", model="gpt-4o")
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, str], ...], _Histogram]] = defaultdict(dict)
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, text: str) -> None:
+        """Texte d'aide affiché dans /metrics (# HELP)"""
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Incrémente un compteur (créé à zéro au premier appel)"""
+        key = _label_key(labels)
+        with self._lock:
+            self._counters[name][key] += value
+
+    def value(self, name: str, **labels) -> float:
+        """Valeur courante d'un compteur pour un jeu d'étiquettes exact"""
+        key = _label_key(labels)
+        with self._lock:
+            return self._counters.get(name, {}).get(key, 0.0)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Ajoute une mesure (en secondes) à un histogramme"""
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms[name].get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = _Histogram(len(self.buckets) + 1)
+            histogram.counts[index] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    @contextlib.contextmanager
+    def stage(self, stage: str, **labels) -> Iterator[None]:
+        """Chronomètre une étape du traitement
+
+        La durée alimente l'histogramme stage_duration_seconds et, dans un
+        bloc request_timings, le détail renvoyé dans l'en-tête Server-Timing.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe("stage_duration_seconds", elapsed, stage=stage, **labels)
+            stages = _request_stages.get()
+            if stages is not None:
+                stages.append((stage, elapsed))
+
+    def snapshot(self) -> dict:
+        """Copie de tous les compteurs : nom -> liste de {labels, value}"""
+        with self._lock:
+            return {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """Exposition au format texte de Prometheus (version 0.0.4)"""
+        lines = [
+            "# HELP process_cpu_seconds_total Total user and system CPU time spent in seconds.",
+            "# TYPE process_cpu_seconds_total counter",
+            f"process_cpu_seconds_total {_format_value(time.process_time())}",
+        ]
+        with self._lock:
+            for name in sorted(self._counters):
+                self._header(lines, name, "counter")
+                for key, value in self._counters[name].items():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            for name in sorted(self._histograms):
+                self._header(lines, name, "histogram")
+                for key, histogram in self._histograms[name].items():
+                    cumulative = 0
+                    for bound, count in zip((*self.buckets, float("inf")), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key, le=le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: list, name: str, kind: str) -> None:
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], **extra) -> str:
+    pairs = [*key, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{label}="{_escape(value)}"' for label, value in pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+@contextlib.contextmanager
+def request_timings() -> Iterator[list]:
+    """Collecte les étapes chronométrées pendant le traitement d'une requête
+
+    Yields:
+        list: Paires (étape, secondes), remplies au fil du traitement
+    """
+    stages = []
+    token = _request_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _request_stages.reset(token)
+
+
+def server_timing_header(stages: list) -> str:
+    """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+    return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in stages)
+
+
+# Registre partagé par tous les modules du processus
+metrics = Metrics()
+metrics.describe("stage_duration_seconds", "Duration of each /process stage")
+metrics.describe("http_requests_total", "HTTP responses by route and status code")
+metrics.describe("api_errors_total", "Errors reported by handle_api_errors, by kind")
+metrics.describe("card_responses_total", "GET /process responses by status (200, 304) and content encoding")
+metrics.describe("card_response_bytes_total", "GET /process body bytes sent, by content encoding")
+metrics.describe("cache_lookups_total", "Result cache lookups by outcome (memory_hit, disk_hit, miss)")
+metrics.describe("cache_expired_total", "Result cache lookups that found only expired entries, by first tier holding one")
+metrics.describe("cache_evictions_total", "Result cache entries evicted for size, by tier")
+metrics.describe("results_write_errors_total", "Results store batches that failed to write (the batch is dropped)")
+metrics.describe("singleflight_calls_total", "Card lookups that called the provider (leader) or joined an in-flight call (coalesced)")
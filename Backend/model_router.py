@@ -0,0 +1,231 @@
+import atexit
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    ROUTER_CANDIDATES,
+    ROUTER_DB_PATH,
+    ROUTER_EWMA_ALPHA,
+    ROUTER_EXPLORATION_RATE,
+    ROUTER_MIN_SAMPLES,
+    ROUTER_SAVE_INTERVAL,
+    ROUTER_SUCCESS_THRESHOLD,
+)
+from metrics import metrics
+
+_FIELDS = ("latency", "success_rate", "tokens", "latency_samples", "outcome_samples", "updated_at")
+
+
+class ModelStats:
+    """Moyennes mobiles exponentielles d'un couple (fournisseur, modèle)"""
+
+    __slots__ = _FIELDS
+
+    def __init__(self, latency=None, success_rate=None, tokens=None,
+                 latency_samples=0, outcome_samples=0, updated_at=0.0):
+        self.latency = latency            # secondes par appel
+        self.success_rate = success_rate  # part des réponses validées
+        self.tokens = tokens              # jetons par appel
+        self.latency_samples = latency_samples
+        self.outcome_samples = outcome_samples
+        self.updated_at = updated_at
+
+    def as_row(self) -> tuple:
+        return tuple(getattr(self, field) for field in _FIELDS)
+
+
+def _ewma(current: Optional[float], value: float, alpha: float) -> float:
+    return value if current is None else current + alpha * (value - current)
+
+
+class ModelRouter:
+    """Choisit un modèle pour les requêtes "auto"
+
+    Chaque appel met à jour la latence, le taux de validation et l'usage
+    en jetons du modèle (EWMA). Le routeur choisit le plus rapide des
+    modèles dont le taux de validation atteint `success_threshold`, et
+    envoie une petite part `exploration_rate` des requêtes au modèle le
+    moins récemment mesuré pour garder les statistiques à jour. L'état
+    est enregistré dans SQLite toutes les `save_interval` secondes et à
+    la sortie du processus.
+    """
+
+    def __init__(
+        self,
+        candidates: Dict[str, List[str]] = ROUTER_CANDIDATES,
+        db_path: Optional[str] = ROUTER_DB_PATH,
+        success_threshold: float = ROUTER_SUCCESS_THRESHOLD,
+        min_samples: int = ROUTER_MIN_SAMPLES,
+        alpha: float = ROUTER_EWMA_ALPHA,
+        exploration_rate: float = ROUTER_EXPLORATION_RATE,
+        save_interval: float = ROUTER_SAVE_INTERVAL,
+    ):
+        self.candidates = {api: [model.strip() for model in models if model.strip()]
+                           for api, models in candidates.items()}
+        self.success_threshold = success_threshold
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.exploration_rate = exploration_rate
+        self.save_interval = save_interval
+        self._stats: Dict[Tuple[str, str], ModelStats] = {}
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+        self._dirty = False
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS model_stats ("
+                " api TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " latency REAL,"
+                " success_rate REAL,"
+                " tokens REAL,"
+                " latency_samples INTEGER NOT NULL,"
+                " outcome_samples INTEGER NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (api, model))"
+            )
+            self._db.commit()
+            for api, model, *row in self._db.execute(f"SELECT api, model, {', '.join(_FIELDS)} FROM model_stats"):
+                self._stats[(api, model)] = ModelStats(*row)
+
+    def _get(self, selected_api: str, selected_model: str) -> ModelStats:
+        # Appelé avec le verrou tenu
+        stats = self._stats.get((selected_api, selected_model))
+        if stats is None:
+            stats = self._stats[(selected_api, selected_model)] = ModelStats()
+        return stats
+
+    def record_call(self, selected_api: str, selected_model: str, seconds: float, tokens: Optional[int]) -> None:
+        """Durée et jetons d'un appel réussi au fournisseur"""
+        with self._lock:
+            stats = self._get(selected_api, selected_model)
+            stats.latency = _ewma(stats.latency, seconds, self.alpha)
+            if tokens:
+                stats.tokens = _ewma(stats.tokens, tokens, self.alpha)
+            stats.latency_samples += 1
+            stats.updated_at = time.time()
+            self._dirty = True
+        self._maybe_save()
+
+    def record_outcome(self, selected_api: str, selected_model: str, success: bool) -> None:
+        """Réponse validée (ou non) par validate_dict, ou appel en échec"""
+        with self._lock:
+            stats = self._get(selected_api, selected_model)
+            stats.success_rate = _ewma(stats.success_rate, 1.0 if success else 0.0, self.alpha)
+            stats.outcome_samples += 1
+            stats.updated_at = time.time()
+            self._dirty = True
+        self._maybe_save()
+
+    def _eligible(self, stats: Optional[ModelStats]) -> bool:
+        return (
+            stats is not None
+            and stats.outcome_samples >= self.min_samples
+            and stats.latency is not None
+            and stats.success_rate >= self.success_threshold
+        )
+
+    def _rank(self, selected_api: str) -> Tuple[str, str]:
+        """Meilleur modèle hors exploration, et la raison du choix"""
+        models = self.candidates.get(selected_api)
+        if not models:
+            raise KeyError(selected_api)
+        with self._lock:
+            stats = {model: self._stats.get((selected_api, model)) for model in models}
+        eligible = [model for model in models if self._eligible(stats[model])]
+        if eligible:
+            return min(eligible, key=lambda model: stats[model].latency), "fastest"
+        # Démarrage à froid : premier modèle pas encore assez mesuré, dans l'ordre configuré
+        for model in models:
+            if stats[model] is None or stats[model].outcome_samples < self.min_samples:
+                return model, "warmup"
+        # Aucun modèle n'atteint le seuil : le plus fiable
+        return max(models, key=lambda model: stats[model].success_rate), "best_effort"
+
+    def choose(self, selected_api: str) -> str:
+        """Modèle à utiliser pour une requête "auto" vers selected_api
+
+        Raises:
+            KeyError: Si aucun modèle candidat n'est configuré pour cette API
+        """
+        model, reason = self._rank(selected_api)
+        models = self.candidates[selected_api]
+        if len(models) > 1 and random.random() < self.exploration_rate:
+            with self._lock:
+                # Le modèle dont la dernière mesure est la plus ancienne
+                model = min(models, key=lambda m: getattr(self._stats.get((selected_api, m)), "updated_at", 0.0))
+            reason = "explore"
+        metrics.inc("router_choices_total", api=selected_api, model=model, reason=reason)
+        return model
+
+    def table(self) -> dict:
+        """Table de routage actuelle : choix par API et statistiques de chaque candidat"""
+        table = {}
+        for selected_api, models in self.candidates.items():
+            model, reason = self._rank(selected_api)
+            with self._lock:
+                rows = []
+                for candidate in models:
+                    stats = self._stats.get((selected_api, candidate)) or ModelStats()
+                    rows.append({
+                        "model": candidate,
+                        "latency_seconds": stats.latency,
+                        "success_rate": stats.success_rate,
+                        "tokens": stats.tokens,
+                        "samples": stats.outcome_samples,
+                        "eligible": self._eligible(stats),
+                        "updated_at": stats.updated_at or None,
+                    })
+            table[selected_api] = {"selected": model, "reason": reason, "models": rows}
+        return {
+            "success_threshold": self.success_threshold,
+            "exploration_rate": self.exploration_rate,
+            "providers": table,
+        }
+
+    def _maybe_save(self) -> None:
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def save(self) -> None:
+        """Enregistre les statistiques dans SQLite"""
+        with self._lock:
+            if self._db is None or not self._dirty:
+                return
+            rows = [(api, model, *stats.as_row()) for (api, model), stats in self._stats.items()]
+            self._dirty = False
+            self._saved_at = time.monotonic()
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO model_stats (api, model, {', '.join(_FIELDS)})"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        self.save()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_model_router: Optional[ModelRouter] = None
+_model_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Retourne le routeur partagé du processus, enregistré automatiquement à la sortie"""
+    global _model_router
+    if _model_router is None:
+        with _model_router_lock:
+            if _model_router is None:
+                _model_router = ModelRouter()
+                atexit.register(_model_router.close)
+    return _model_router
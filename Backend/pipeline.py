@@ -0,0 +1,784 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import AsyncIterator, Iterator, Optional, Tuple, Union
+
+from cache import get_result_cache, normalize_cache_key
+from card_catalog import get_card_catalog
+from card_index import get_card_index
+from config import (
+    AUTO_MODEL,
+    BATCH_MAX_WORKERS,
+    CARD_CANONICALIZE,
+    HEDGE_DELAY_SECONDS,
+    PROVIDER_BASE_URLS,
+    PROVIDER_HEDGE_TARGETS,
+    PROVIDER_MAX_CONCURRENCY,
+    REPAIR_MAX_ATTEMPTS,
+)
+from core_functions import (
+    build_api_messages,
+    create_api_client,
+    create_async_api_client,
+    execute_chat_completion,
+    execute_chat_completion_async,
+    fetch_api_keys,
+    report_usage,
+)
+from error_handlers import handle_api_errors
+from json_extract import JSONExtractionError
+from json_stream import StreamingFieldParser
+from metrics import metrics
+from model_router import get_model_router
+from rate_limiter import RateLimitTimeout
+from resilience import CircuitOpenError, hedge_budget, latencies, parse_target
+from results_store import get_results_store
+from singleflight import async_card_lookups, card_lookups
+from validation import (
+    card_validation_errors,
+    clean_json,
+    process_api_response_and_validate,
+    validate_raw_response,
+)
+
+
+class CardLookupError(Exception):
+    """Erreur de recherche de carte associée à un code HTTP"""
+    status_code = 500
+
+
+class ApiCommunicationError(CardLookupError):
+    """Le fournisseur n'a pas répondu ou a renvoyé une erreur"""
+    status_code = 502
+
+
+class RateLimitedError(CardLookupError):
+    """Le budget du fournisseur ne se libère pas avant l'échéance de la requête"""
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after  # secondes, renvoyées dans l'en-tête Retry-After
+
+
+class ProviderUnavailableError(CardLookupError):
+    """Le disjoncteur du fournisseur est ouvert après une série d'échecs"""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UnsupportedApiError(CardLookupError):
+    """API absente de PROVIDER_BASE_URLS"""
+    status_code = 400
+
+
+class MissingApiKeyError(CardLookupError):
+    """Clé du fournisseur absente de l'environnement (jamais demandée au clavier côté serveur)"""
+    status_code = 500
+
+
+class UnknownModelError(CardLookupError):
+    """Modèle "auto" demandé pour une API sans modèle candidat"""
+    status_code = 400
+
+
+class DataValidationError(CardLookupError):
+    """La réponse du fournisseur ne respecte pas le modèle CreditCard"""
+    status_code = 422
+
+    def __init__(self, message: str, details: str = "", content: Optional[str] = None):
+        super().__init__(message)
+        self.details = details  # erreurs renvoyées au modèle pour correction
+        self.content = content  # texte brut de la réponse refusée
+
+
+def resolve_model(selected_api: str, selected_model: str) -> str:
+    """Remplace le modèle "auto" par celui que choisit le routeur
+
+    Premier appel de chaque recherche : l'API est aussi vérifiée ici.
+
+    Raises:
+        UnsupportedApiError: Si l'API n'est pas prise en charge
+        UnknownModelError: Si aucun modèle candidat n'est configuré pour cette API
+    """
+    if selected_api not in PROVIDER_BASE_URLS:
+        raise UnsupportedApiError(f"Unsupported api: {selected_api} (expected {', '.join(PROVIDER_BASE_URLS)})")
+    if selected_model != AUTO_MODEL:
+        return selected_model
+    try:
+        return get_model_router().choose(selected_api)
+    except KeyError:
+        raise UnknownModelError(f"No candidate models for {selected_api}") from None
+
+
+def canonical_card(card_choice: str, selected_api: str, selected_model: str) -> str:
+    """Remplace une saisie libre ("amex gold") par le cardName déjà connu de la carte
+
+    Toutes les variantes d'une même carte partagent ainsi le cache, les
+    appels fusionnés et l'historique.
+    """
+    if not CARD_CANONICALIZE:
+        return card_choice
+    with metrics.stage("canonicalize", api=selected_api, model=selected_model):
+        return get_card_index().canonical_name(card_choice)
+
+
+def lookup_card(card_choice: str, selected_api: str, selected_model: str) -> dict:
+    """Recherche les données validées d'une carte, en passant par le cache
+
+    Un succès de cache évite complètement l'appel au fournisseur, et les
+    recherches identiques simultanées sont fusionnées en un seul appel.
+
+    Args:
+        card_choice (str): Nom de la carte bancaire choisie
+        selected_api (str): "openai" ou "perplexity"
+        selected_model (str): Nom du modèle à utiliser, ou "auto"
+
+    Returns:
+        dict: Données validées au format CreditCard (clés alias)
+
+    Raises:
+        ApiCommunicationError: Si l'appel au fournisseur échoue
+        DataValidationError: Si la réponse ne passe pas la validation
+    """
+    selected_model = resolve_model(selected_api, selected_model)
+    card_choice = canonical_card(card_choice, selected_api, selected_model)
+    with metrics.stage("cache_get", api=selected_api, model=selected_model):
+        cached = get_result_cache().get(card_choice, selected_api, selected_model)
+    if cached is not None:
+        return cached
+
+    # Les requêtes identiques concurrentes partagent un seul appel au fournisseur
+    key = normalize_cache_key(card_choice, selected_api, selected_model)
+    return card_lookups.do(
+        key, lambda: _fetch_and_validate(card_choice, selected_api, selected_model)
+    )
+
+
+def refresh_card(card_choice: str, selected_api: str, selected_model: str) -> dict:
+    """Interroge le fournisseur sans lire le cache, puis remplace l'entrée en cache
+
+    Utilisé par le warmer ; une recherche utilisateur simultanée de la même
+    carte partage le même appel.
+    """
+    key = normalize_cache_key(card_choice, selected_api, selected_model)
+    return card_lookups.do(
+        key, lambda: _fetch_and_validate(card_choice, selected_api, selected_model)
+    )
+
+
+def _fetch_and_validate(card_choice: str, selected_api: str, selected_model: str) -> dict:
+    """Appelle le fournisseur, valide la réponse et alimente le cache"""
+    hedge = _hedge_plan(selected_api, selected_model)
+    served_by = (selected_api, selected_model)
+    if hedge is None:
+        validated = _attempt(card_choice, selected_api, selected_model)
+    else:
+        hedge_target, delay = hedge
+        winner, validated = _hedged(
+            lambda: _attempt(card_choice, selected_api, selected_model),
+            lambda: _attempt(card_choice, *hedge_target),
+            delay, selected_api, selected_model,
+        )
+        if winner == "hedge":
+            served_by = hedge_target
+    # Une réponse de la couverture est rangée sous son propre modèle, pas sous celui demandé
+    with metrics.stage("cache_set", api=selected_api, model=selected_model):
+        get_result_cache().set(card_choice, *served_by, validated)
+    return validated
+
+
+def _attempt(card_choice: str, selected_api: str, selected_model: str) -> dict:
+    """Une recherche complète auprès d'un fournisseur : appel, validation, correction"""
+    client, messages = _prepare_request(card_choice, selected_api, selected_model)
+    return _with_repairs(
+        lambda attempt_messages: _complete_and_validate(
+            client, card_choice, selected_api, selected_model, attempt_messages
+        ),
+        messages, selected_api, selected_model,
+    )
+
+
+def _hedge_plan(selected_api: str, selected_model: str) -> Optional[Tuple[Tuple[str, str], float]]:
+    """Cible et délai de la requête de couverture, ou None si pas de couverture
+
+    Le délai est HEDGE_DELAY_SECONDS, ou à défaut le p95 des appels récents
+    au même modèle (pas de couverture tant qu'il n'est pas connu).
+    """
+    target = parse_target(PROVIDER_HEDGE_TARGETS.get(selected_api, ""))
+    if target is None or target == (selected_api, selected_model):
+        return None
+    hedge_budget.on_lookup()
+    delay = HEDGE_DELAY_SECONDS or latencies.quantile(selected_api, selected_model, 0.95)
+    if delay is None:
+        return None
+    return target, delay
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            # Requête principale + couverture pour chaque appel simultané possible
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=2 * sum(PROVIDER_MAX_CONCURRENCY.values()), thread_name_prefix="card-hedge"
+            )
+    return _hedge_executor
+
+
+def _hedged(primary, hedge, delay: float, selected_api: str, selected_model: str) -> Tuple[str, dict]:
+    """Lance primary ; s'il n'a pas abouti après delay, lance aussi hedge
+
+    Le premier résultat validé l'emporte. L'appel perdant ne peut pas être
+    interrompu en mode synchrone : il se termine en arrière-plan (son
+    résultat va à l'historique, pas au cache).
+
+    Returns:
+        tuple: ("primary" ou "hedge", données validées de l'appel gagnant)
+    """
+    labels = {"api": selected_api, "model": selected_model}
+    executor = _get_hedge_executor()
+    # copy_context : les étapes chronométrées restent rattachées à la requête (Server-Timing)
+    first = executor.submit(contextvars.copy_context().run, primary)
+    try:
+        return "primary", first.result(timeout=delay)
+    except FutureTimeoutError:
+        pass
+    if not hedge_budget.try_spend():
+        metrics.inc("hedges_skipped_total", reason="budget", **labels)
+        return "primary", first.result()
+
+    metrics.inc("hedges_fired_total", **labels)
+    second = executor.submit(contextvars.copy_context().run, hedge)
+    roles = {first: "primary", second: "hedge"}
+    error = None
+    for future in as_completed(roles):
+        try:
+            validated = future.result()
+        except Exception as e:
+            error = error or e
+            continue
+        metrics.inc("hedge_wins_total", winner=roles[future], **labels)
+        return roles[future], validated
+    raise error
+
+
+def _prepare_request(card_choice: str, selected_api: str, selected_model: str, use_async: bool = False) -> tuple:
+    """Clés, client et messages d'une requête, chaque étape chronométrée
+
+    Returns:
+        tuple: (client OpenAI ou AsyncOpenAI, messages)
+    """
+    labels = {"api": selected_api, "model": selected_model}
+    with metrics.stage("fetch_api_keys", **labels):
+        # Serveurs, bulk et warmer : l'environnement seul, jamais de saisie au clavier
+        OPENAI_KEY, PERPLEXITY_KEY = fetch_api_keys(selected_api, interactive=False)
+    api_key = OPENAI_KEY if selected_api == "openai" else PERPLEXITY_KEY
+    # Même repli que create_api_client : OPENAI_API_KEY / PERPLEXITY_API_KEY
+    if selected_api != "fake" and not (api_key or os.getenv(f"{selected_api.upper()}_API_KEY")):
+        raise MissingApiKeyError(f"Missing {selected_api} API key in the server environment")
+
+    #Client creation
+    with metrics.stage("create_api_client", **labels):
+        if use_async:
+            client = create_async_api_client(selected_api, OPENAI_KEY, PERPLEXITY_KEY)
+        else:
+            client = create_api_client(selected_api, OPENAI_KEY, PERPLEXITY_KEY)
+
+    # Build messages structure
+    with metrics.stage("build_messages", **labels):
+        messages = build_api_messages(selected_api, card_choice)
+    return client, messages
+
+
+@contextlib.contextmanager
+def _provider_call(selected_api: str, selected_model: str):
+    """Attend une place auprès du fournisseur puis chronomètre l'appel"""
+    labels = {"api": selected_api, "model": selected_model}
+    slot = _provider_slot(selected_api)
+    with metrics.stage("provider_wait", **labels):
+        slot.acquire()
+    try:
+        with metrics.stage("completion", **labels):
+            yield
+    except RateLimitTimeout as e:
+        raise RateLimitedError("Provider rate limit reached", e.retry_after) from e
+    except CircuitOpenError as e:
+        raise ProviderUnavailableError("Provider temporarily unavailable", e.retry_after) from e
+    finally:
+        slot.release()
+
+
+@contextlib.asynccontextmanager
+async def _provider_call_async(selected_api: str, selected_model: str):
+    """Version asynchrone de _provider_call"""
+    labels = {"api": selected_api, "model": selected_model}
+    semaphore = _provider_semaphore(selected_api)
+    with metrics.stage("provider_wait", **labels):
+        await semaphore.acquire()
+    try:
+        with metrics.stage("completion", **labels):
+            yield
+    except RateLimitTimeout as e:
+        raise RateLimitedError("Provider rate limit reached", e.retry_after) from e
+    except CircuitOpenError as e:
+        raise ProviderUnavailableError("Provider temporarily unavailable", e.retry_after) from e
+    finally:
+        semaphore.release()
+
+
+def _complete_and_validate(client, card_choice: str, selected_api: str, selected_model: str, messages: list) -> dict:
+    """Un appel au fournisseur suivi de la validation de sa réponse"""
+    # Execute API call
+    with _provider_call(selected_api, selected_model):
+        completion, api_success = execute_chat_completion(
+            client, selected_api, selected_model, messages
+        )
+    if not api_success:
+        raise ApiCommunicationError("API communication failed")
+    return _validate_completion(completion, card_choice, selected_api, selected_model)
+
+
+def _repair_messages(messages: list, error: DataValidationError) -> list:
+    """Conversation de correction : la réponse refusée puis les erreurs constatées"""
+    return [
+        *messages,
+        {"role": "assistant", "content": error.content or ""},
+        {
+            "role": "user",
+            "content": (
+                f"This response does not match the required JSON schema ({error.details or 'invalid JSON'}). "
+                "Return only the corrected JSON object, with all fields."
+            ),
+        },
+    ]
+
+
+def _with_repairs(attempt, messages: list, selected_api: str, selected_model: str,
+                  error: Optional[DataValidationError] = None) -> dict:
+    """Exécute attempt(messages) et renvoie au modèle ses erreurs de validation
+
+    Au plus REPAIR_MAX_ATTEMPTS allers-retours de correction ; error permet
+    de partir d'une réponse déjà refusée (mode flux).
+
+    Raises:
+        DataValidationError: Si la réponse reste invalide après correction
+    """
+    labels = {"api": selected_api, "model": selected_model}
+    repairs = 0
+    while True:
+        if error is not None:
+            if repairs >= REPAIR_MAX_ATTEMPTS:
+                raise error
+            messages = _repair_messages(messages, error)
+            repairs += 1
+            metrics.inc("repair_attempts_total", **labels)
+        try:
+            validated = attempt(messages)
+        except DataValidationError as e:
+            error = e
+            continue
+        if repairs:
+            metrics.inc("repair_successes_total", **labels)
+        return validated
+
+
+def record_result(
+    card_choice: str,
+    selected_api: str,
+    selected_model: str,
+    response_text: Union[dict, str],
+    validated: Optional[dict],
+) -> None:
+    """Enregistre le résultat d'une validation, réussie ou non
+
+    Historique brut + validé, taux de validation du modèle (routage "auto")
+    et, si la carte est valide, index des noms et catalogue de GET /cards.
+
+    Args:
+        card_choice (str): Nom de la carte saisi
+        selected_api (str): API utilisée
+        selected_model (str): Modèle utilisé
+        response_text (dict | str): JSON extrait de la réponse, ou son texte s'il a été validé tel quel
+        validated (dict): Données validées, None si la validation a échoué
+    """
+    labels = {"api": selected_api, "model": selected_model}
+    # Écrit par lots hors du thread de la requête
+    with metrics.stage("store", **labels):
+        get_results_store().record(card_choice, selected_api, selected_model, response_text, validated)
+    get_model_router().record_outcome(selected_api, selected_model, validated is not None)
+    if validated is not None:
+        # Premier appel : construction paresseuse de l'index et du catalogue
+        with metrics.stage("index", **labels):
+            # Une saisie aux mêmes mots devient un alias de la carte pour les prochaines recherches
+            get_card_index().add(validated.get("cardName"), validated.get("issuer"), alias=card_choice)
+            # Frais et taux analysés une fois pour GET /cards
+            get_card_catalog().add(validated)
+
+
+def _validate_completion(
+    completion: object,
+    card_choice: str,
+    selected_api: str,
+    selected_model: str,
+    content: Optional[str] = None,
+) -> dict:
+    """Extrait le JSON de la complétion et le valide contre le modèle CreditCard
+
+    content remplace le texte de la complétion quand il a été reçu en flux.
+    """
+    labels = {"api": selected_api, "model": selected_model}
+    # Process response
+    if content is None:
+        content = completion.choices[0].message.content
+    # Sortie structurée : le texte seul est validé en un passage ; sinon extraction puis validation
+    with metrics.stage("validate", **labels):
+        validated = validate_raw_response(content)
+    if validated is not None:
+        record_result(card_choice, selected_api, selected_model, content, validated)
+        metrics.inc("completion_validations_total", outcome="valid", **labels)
+        return validated
+    try:
+        with metrics.stage("clean_json", **labels):
+            response_text = clean_json(content)
+    except JSONExtractionError as e:
+        metrics.inc("completion_validations_total", outcome="invalid", **labels)
+        get_model_router().record_outcome(selected_api, selected_model, False)
+        raise DataValidationError("Data validation failed", str(e), content) from e
+    with metrics.stage("validate", **labels):
+        validated = process_api_response_and_validate(completion, selected_api, response_text)
+    record_result(card_choice, selected_api, selected_model, response_text, validated)
+    if not validated:
+        metrics.inc("completion_validations_total", outcome="invalid", **labels)
+        raise DataValidationError(
+            "Data validation failed", card_validation_errors(response_text), content
+        )
+    metrics.inc("completion_validations_total", outcome="valid", **labels)
+    return validated
+
+
+_provider_slots = {}
+_provider_slots_lock = threading.Lock()
+
+
+def _provider_slot(selected_api: str) -> threading.BoundedSemaphore:
+    """Sémaphore limitant les appels simultanés vers un fournisseur (threads)"""
+    with _provider_slots_lock:
+        slot = _provider_slots.get(selected_api)
+        if slot is None:
+            slot = threading.BoundedSemaphore(PROVIDER_MAX_CONCURRENCY.get(selected_api, 16))
+            _provider_slots[selected_api] = slot
+    return slot
+
+
+_batch_executor: Optional[ThreadPoolExecutor] = None
+_batch_executor_lock = threading.Lock()
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=BATCH_MAX_WORKERS, thread_name_prefix="card-batch"
+            )
+    return _batch_executor
+
+
+def _batch_item(index: int, card_choice: str, selected_api: str, selected_model: str) -> dict:
+    """Recherche une carte du lot et convertit son erreur éventuelle en résultat"""
+    try:
+        data = lookup_card(card_choice, selected_api, selected_model)
+        return {"index": index, "card_choice": card_choice, "status": 200, "data": data}
+    except CardLookupError as e:
+        return {"index": index, "card_choice": card_choice, "status": e.status_code, "error": str(e)}
+    except Exception as e:
+        handle_api_errors(e, selected_api)
+        return {"index": index, "card_choice": card_choice, "status": 500, "error": str(e)}
+
+
+def lookup_cards(card_choices: list, selected_api: str, selected_model: str) -> Iterator[dict]:
+    """Recherche plusieurs cartes en parallèle, résultats dans l'ordre d'achèvement
+
+    Chaque carte passe par lookup_card (cache, fusion, validation) ; le nombre
+    d'appels simultanés vers le fournisseur reste borné par _provider_slot.
+
+    Args:
+        card_choices (list): Noms des cartes à rechercher
+        selected_api (str): "openai" ou "perplexity"
+        selected_model (str): Nom du modèle à utiliser
+
+    Yields:
+        dict: index, card_choice, status, puis data (200) ou error
+    """
+    executor = _get_batch_executor()
+    futures = [
+        executor.submit(_batch_item, index, card_choice, selected_api, selected_model)
+        for index, card_choice in enumerate(card_choices)
+    ]
+    for future in as_completed(futures):
+        yield future.result()
+
+
+_STREAM_END = object()
+
+
+def _read_provider_stream(client, messages: list, selected_api: str, selected_model: str) -> Iterator[str]:
+    """Texte du flux du fournisseur, lu par un thread au rythme du fournisseur
+
+    La place auprès du fournisseur (_provider_call) est rendue dès la fin
+    de son flux, même si le client lit plus lentement ; un client parti
+    arrête la lecture.
+
+    Raises:
+        ApiCommunicationError: Si l'appel au fournisseur échoue
+    """
+    from openai import OpenAIError
+
+    deltas = queue.Queue()
+    stop = threading.Event()
+
+    def read() -> None:
+        try:
+            with _provider_call(selected_api, selected_model):
+                stream, api_success = execute_chat_completion(
+                    client, selected_api, selected_model, messages, stream=True
+                )
+                if not api_success:
+                    raise ApiCommunicationError("API communication failed")
+                try:
+                    for chunk in stream:
+                        if stop.is_set():
+                            break
+                        if getattr(chunk, "usage", None) is not None:
+                            report_usage(chunk.usage, selected_api, selected_model)
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            deltas.put(delta)
+                except OpenAIError as e:
+                    handle_api_errors(e, selected_api)
+                    raise ApiCommunicationError("API communication failed") from e
+                finally:
+                    stream.close()
+        except Exception as e:
+            deltas.put(e)
+        else:
+            deltas.put(_STREAM_END)
+
+    # copy_context : les étapes chronométrées restent rattachées à la requête (Server-Timing)
+    reader = contextvars.copy_context().run
+    threading.Thread(target=reader, args=(read,), name="card-stream", daemon=True).start()
+    try:
+        while (item := deltas.get()) is not _STREAM_END:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def stream_card(card_choice: str, selected_api: str, selected_model: str) -> Iterator[Tuple[str, dict]]:
+    """Recherche une carte en flux, champ par champ
+
+    Les champs de premier niveau sont émis dès qu'ils sont complets dans le
+    flux du fournisseur ; l'objet validé est émis en dernier. Un succès de
+    cache émet directement le résultat. Les flux ne sont pas fusionnés entre
+    requêtes identiques.
+
+    Yields:
+        tuple: ("field", {"key", "value"}) puis ("result", données validées)
+
+    Raises:
+        ApiCommunicationError: Si l'appel au fournisseur échoue
+        DataValidationError: Si la réponse ne passe pas la validation
+    """
+    selected_model = resolve_model(selected_api, selected_model)
+    card_choice = canonical_card(card_choice, selected_api, selected_model)
+    with metrics.stage("cache_get", api=selected_api, model=selected_model):
+        cached = get_result_cache().get(card_choice, selected_api, selected_model)
+    if cached is not None:
+        yield "result", cached
+        return
+
+    client, messages = _prepare_request(card_choice, selected_api, selected_model)
+
+    parser = StreamingFieldParser()
+    chunks = []
+    for delta in _read_provider_stream(client, messages, selected_api, selected_model):
+        chunks.append(delta)
+        for key, value in parser.feed(delta):
+            yield "field", {"key": key, "value": value}
+
+    try:
+        validated = _validate_completion(None, card_choice, selected_api, selected_model, "".join(chunks))
+    except DataValidationError as e:
+        # Correction hors flux : seul le résultat final est renvoyé
+        validated = _with_repairs(
+            lambda attempt_messages: _complete_and_validate(
+                client, card_choice, selected_api, selected_model, attempt_messages
+            ),
+            messages, selected_api, selected_model, error=e,
+        )
+    with metrics.stage("cache_set", api=selected_api, model=selected_model):
+        get_result_cache().set(card_choice, selected_api, selected_model, validated)
+    yield "result", validated
+
+
+_provider_semaphores = {}
+
+
+def _provider_semaphore(selected_api: str) -> asyncio.Semaphore:
+    """Sémaphore limitant les appels simultanés vers un fournisseur (mode async)"""
+    semaphore = _provider_semaphores.get(selected_api)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PROVIDER_MAX_CONCURRENCY.get(selected_api, 16))
+        _provider_semaphores[selected_api] = semaphore
+    return semaphore
+
+
+async def lookup_card_async(card_choice: str, selected_api: str, selected_model: str) -> dict:
+    """Version asynchrone de lookup_card pour le serveur ASGI
+
+    Même contrat que lookup_card ; l'appel au fournisseur passe par un client
+    AsyncOpenAI et le nombre d'appels simultanés par fournisseur est borné.
+    """
+    selected_model = resolve_model(selected_api, selected_model)
+    # Index de noms et cache SQLite hors de la boucle d'événements
+    card_choice = await asyncio.to_thread(canonical_card, card_choice, selected_api, selected_model)
+    with metrics.stage("cache_get", api=selected_api, model=selected_model):
+        cached = await asyncio.to_thread(get_result_cache().get, card_choice, selected_api, selected_model)
+    if cached is not None:
+        return cached
+
+    key = normalize_cache_key(card_choice, selected_api, selected_model)
+    return await async_card_lookups.do(
+        key, lambda: _fetch_and_validate_async(card_choice, selected_api, selected_model)
+    )
+
+
+async def _batch_item_async(index: int, card_choice: str, selected_api: str, selected_model: str) -> dict:
+    """Version asynchrone de _batch_item"""
+    try:
+        data = await lookup_card_async(card_choice, selected_api, selected_model)
+        return {"index": index, "card_choice": card_choice, "status": 200, "data": data}
+    except CardLookupError as e:
+        return {"index": index, "card_choice": card_choice, "status": e.status_code, "error": str(e)}
+    except Exception as e:
+        handle_api_errors(e, selected_api)
+        return {"index": index, "card_choice": card_choice, "status": 500, "error": str(e)}
+
+
+async def lookup_cards_async(card_choices: list, selected_api: str, selected_model: str) -> AsyncIterator[dict]:
+    """Version asynchrone de lookup_cards, résultats dans l'ordre d'achèvement
+
+    Les appels simultanés vers le fournisseur restent bornés par
+    _provider_semaphore ; les recherches restantes sont annulées si le
+    client se déconnecte.
+    """
+    tasks = [
+        asyncio.ensure_future(_batch_item_async(index, card_choice, selected_api, selected_model))
+        for index, card_choice in enumerate(card_choices)
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _fetch_and_validate_async(card_choice: str, selected_api: str, selected_model: str) -> dict:
+    hedge = _hedge_plan(selected_api, selected_model)
+    served_by = (selected_api, selected_model)
+    if hedge is None:
+        validated = await _attempt_async(card_choice, selected_api, selected_model)
+    else:
+        hedge_target, delay = hedge
+        winner, validated = await _hedged_async(
+            lambda: _attempt_async(card_choice, selected_api, selected_model),
+            lambda: _attempt_async(card_choice, *hedge_target),
+            delay, selected_api, selected_model,
+        )
+        if winner == "hedge":
+            served_by = hedge_target
+    with metrics.stage("cache_set", api=selected_api, model=selected_model):
+        await asyncio.to_thread(get_result_cache().set, card_choice, *served_by, validated)
+    return validated
+
+
+async def _hedged_async(primary, hedge, delay: float, selected_api: str, selected_model: str) -> Tuple[str, dict]:
+    """Version asynchrone de _hedged : l'appel perdant est annulé"""
+    labels = {"api": selected_api, "model": selected_model}
+    first = asyncio.ensure_future(primary())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return "primary", first.result()
+    if not hedge_budget.try_spend():
+        metrics.inc("hedges_skipped_total", reason="budget", **labels)
+        return "primary", await first
+
+    metrics.inc("hedges_fired_total", **labels)
+    second = asyncio.ensure_future(hedge())
+    roles = {first: "primary", second: "hedge"}
+    pending = set(roles)
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                metrics.inc("hedge_wins_total", winner=roles[task], **labels)
+                return roles[task], task.result()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _attempt_async(card_choice: str, selected_api: str, selected_model: str) -> dict:
+    client, messages = _prepare_request(card_choice, selected_api, selected_model, use_async=True)
+    labels = {"api": selected_api, "model": selected_model}
+
+    # Même logique que _with_repairs, avec des appels asynchrones
+    error = None
+    repairs = 0
+    while True:
+        if error is not None:
+            if repairs >= REPAIR_MAX_ATTEMPTS:
+                raise error
+            messages = _repair_messages(messages, error)
+            repairs += 1
+            metrics.inc("repair_attempts_total", **labels)
+
+        async with _provider_call_async(selected_api, selected_model):
+            completion, api_success = await execute_chat_completion_async(
+                client, selected_api, selected_model, messages
+            )
+        if not api_success:
+            raise ApiCommunicationError("API communication failed")
+
+        # Validation et écritures disque hors de la boucle d'événements
+        try:
+            validated = await asyncio.to_thread(
+                _validate_completion, completion, card_choice, selected_api, selected_model
+            )
+        except DataValidationError as e:
+            error = e
+            continue
+        if repairs:
+            metrics.inc("repair_successes_total", **labels)
+        return validated
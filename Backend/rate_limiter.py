@@ -0,0 +1,271 @@
+import asyncio
+import email.utils
+import re
+import threading
+import time
+from typing import Mapping, Optional
+
+from client_registry import _fingerprint
+from config import (
+    PROVIDER_RATE_LIMITS,
+    RATE_LIMIT_MAX_QUEUE,
+    RATE_LIMIT_MAX_WAIT_SECONDS,
+)
+from metrics import metrics
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitTimeout(Exception):
+    """Le budget du fournisseur ne se libère pas avant l'échéance de la requête"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Convertit une durée de réinitialisation ("1s", "6m0s", "20ms", "2.5") en secondes"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Délai demandé par le fournisseur (retry-after-ms, Retry-After en secondes ou en date HTTP)"""
+    if (value := headers.get("retry-after-ms")) is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        when = email.utils.parsedate_to_datetime(value) if value else None
+        return max(0.0, when.timestamp() - time.time()) if when else None
+
+
+class TokenBucket:
+    """Seau à jetons rempli en continu à raison de per_minute par minute
+
+    Appelé avec le verrou du RateLimiter tenu ; per_minute <= 0 signifie illimité.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.per_minute, self.level + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Secondes à attendre avant de pouvoir prélever amount (0 si disponible)"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # Une demande plus grosse que le seau passe quand il est plein
+        amount = min(amount, self.per_minute)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.per_minute
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.level -= min(amount, self.per_minute)
+
+    def give_back(self, amount: float) -> None:
+        """Restitue (ou prélève si négatif) l'écart entre l'estimation et l'usage réel"""
+        if not self.unlimited:
+            self.level = min(self.per_minute, self.level + amount)
+
+    def set_limit(self, per_minute: float) -> None:
+        if per_minute > 0 and per_minute != self.per_minute:
+            # Seau jusque-là illimité (niveau 0) : il part plein, le solde publié le corrige ensuite
+            self.level = float(per_minute) if self.unlimited else min(self.level, per_minute)
+            self._updated = time.monotonic()
+            self.per_minute = per_minute
+
+    def set_remaining(self, remaining: float, now: float) -> None:
+        """Le fournisseur connaît le vrai solde : on ne garde jamais plus que lui"""
+        if not self.unlimited:
+            self._refill(now)
+            self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """Budget requêtes/minute et jetons/minute d'une clé d'API chez un fournisseur
+
+    Les requêtes en excès attendent leur tour (file bornée, échéance par
+    requête) au lieu d'échouer. Les en-têtes x-ratelimit-* et Retry-After
+    des réponses ajustent le budget en direct.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_queue: int = RATE_LIMIT_MAX_QUEUE,
+        name: str = "",
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self.name = name
+        self._blocked_until = 0.0
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: float) -> float:
+        """Prélève le budget si possible ; sinon retourne le délai d'attente estimé"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._blocked_until - now,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(tokens, now),
+            )
+            if wait <= 0:
+                self.requests.take(1)
+                self.tokens.take(tokens)
+            return wait
+
+    def _enter_queue(self) -> None:
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                metrics.inc("rate_limit_rejections_total", limiter=self.name, reason="queue_full")
+                raise RateLimitTimeout("File d'attente du fournisseur pleine", 1.0)
+            self._waiting += 1
+
+    def _leave_queue(self) -> None:
+        with self._lock:
+            self._waiting -= 1
+
+    def _check_deadline(self, wait: float, deadline: float) -> None:
+        if time.monotonic() + wait > deadline:
+            metrics.inc("rate_limit_rejections_total", limiter=self.name, reason="deadline")
+            raise RateLimitTimeout("Budget du fournisseur épuisé jusqu'à l'échéance", wait)
+
+    def acquire(self, tokens: float, deadline: float) -> None:
+        """Attend que le budget permette d'envoyer une requête de `tokens` jetons
+
+        Args:
+            tokens (float): Jetons estimés (prompt + réponse)
+            deadline (float): Échéance en time.monotonic()
+
+        Raises:
+            RateLimitTimeout: Si le budget ne se libère pas avant l'échéance
+        """
+        wait = self._try_acquire(tokens)
+        if wait <= 0:
+            return
+        self._enter_queue()
+        try:
+            while wait > 0:
+                self._check_deadline(wait, deadline)
+                time.sleep(wait)
+                wait = self._try_acquire(tokens)
+        finally:
+            self._leave_queue()
+
+    async def acquire_async(self, tokens: float, deadline: float) -> None:
+        """Version asynchrone d'acquire (l'attente ne bloque pas la boucle)"""
+        wait = self._try_acquire(tokens)
+        if wait <= 0:
+            return
+        self._enter_queue()
+        try:
+            while wait > 0:
+                self._check_deadline(wait, deadline)
+                await asyncio.sleep(wait)
+                wait = self._try_acquire(tokens)
+        finally:
+            self._leave_queue()
+
+    def settle(self, estimated_tokens: float, actual_tokens: Optional[float]) -> None:
+        """Corrige le seau de jetons avec l'usage réel de la réponse"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.give_back(estimated_tokens - actual_tokens)
+
+    def update_from_headers(self, headers: Mapping[str, str], rate_limited: bool = False) -> None:
+        """Adapte le budget aux en-têtes de réponse du fournisseur
+
+        Args:
+            headers: En-têtes HTTP (x-ratelimit-*, Retry-After)
+            rate_limited (bool): Vrai si la réponse était un 429
+        """
+        with self._lock:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                try:
+                    if limit is not None:
+                        # Les limites publiées sont par minute (OpenAI, Perplexity)
+                        bucket.set_limit(float(limit))
+                    if remaining is not None:
+                        bucket.set_remaining(float(remaining), now)
+                except ValueError:
+                    continue
+
+            retry_after = parse_retry_after(headers)
+            if retry_after is None and rate_limited:
+                # 429 sans Retry-After : on attend la réinitialisation annoncée, 1 s à défaut
+                resets = [parse_duration(headers.get(f"x-ratelimit-reset-{kind}")) for kind in ("requests", "tokens")]
+                retry_after = max([reset for reset in resets if reset is not None], default=1.0)
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests.per_minute,
+                "requests_available": self.requests.level,
+                "tokens_per_minute": self.tokens.per_minute,
+                "tokens_available": self.tokens.level,
+                "waiting": self._waiting,
+                "blocked_for": max(0.0, self._blocked_until - time.monotonic()),
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, api_key: Optional[str]) -> RateLimiter:
+    """Limiteur partagé d'un couple (fournisseur, clé d'API), créé au premier appel"""
+    key = (provider, _fingerprint(api_key))
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                limits = PROVIDER_RATE_LIMITS.get(provider, {})
+                limiter = _limiters[key] = RateLimiter(
+                    limits.get("rpm", 0), limits.get("tpm", 0), name=provider
+                )
+    return limiter
+
+
+def deadline_from_now(seconds: float = RATE_LIMIT_MAX_WAIT_SECONDS) -> float:
+    """Échéance time.monotonic() pour l'attente du budget"""
+    return time.monotonic() + seconds
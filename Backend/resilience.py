@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+from config import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS,
+    HEDGE_MAX_RATIO,
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+)
+from metrics import metrics
+
+
+class CircuitOpenError(Exception):
+    """Le disjoncteur du fournisseur est ouvert : la requête n'est pas envoyée"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retryable(error: Exception) -> bool:
+    """Erreurs transitoires qui méritent un nouvel essai (réseau, délai dépassé, 5xx, 408/409)"""
+    from openai import APIConnectionError, APIStatusError, InternalServerError
+
+    if isinstance(error, (APIConnectionError, InternalServerError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in (408, 409)
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY_SECONDS, cap: float = RETRY_MAX_DELAY_SECONDS) -> float:
+    """Attente avant le nouvel essai n° attempt (0, 1, ...) : exponentielle à gigue complète"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Disjoncteur d'un fournisseur : fermé, ouvert, puis demi-ouvert
+
+    Après `failure_threshold` échecs consécutifs, plus aucune requête n'est
+    envoyée pendant `open_seconds`. Ensuite une seule requête d'essai passe :
+    son succès referme le circuit, son échec le rouvre.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        # Appelé avec le verrou tenu
+        if state != self.state:
+            self.state = state
+            metrics.inc("circuit_transitions_total", provider=self.name, state=state)
+
+    def before_call(self) -> None:
+        """Autorise l'envoi ou lève CircuitOpenError
+
+        Raises:
+            CircuitOpenError: Si le circuit est ouvert (ou si l'essai est déjà en cours)
+        """
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    metrics.inc("circuit_rejections_total", provider=self.name)
+                    raise CircuitOpenError(f"Circuit ouvert pour {self.name}", remaining)
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    metrics.inc("circuit_rejections_total", provider=self.name)
+                    raise CircuitOpenError(f"Circuit en essai pour {self.name}", 1.0)
+                self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold > 0:
+                self._opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    def release(self) -> None:
+        """Fin d'un appel ni réussi ni en échec (ex. 400) : libère l'essai en cours"""
+        with self._lock:
+            self._probing = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Disjoncteur partagé d'un fournisseur, créé au premier appel"""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(provider, CircuitBreaker(provider))
+    return breaker
+
+
+class LatencyTracker:
+    """Dernières durées d'appel réussies par (fournisseur, modèle), pour le p95 du hedging"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, selected_api: str, selected_model: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get((selected_api, selected_model))
+            if samples is None:
+                samples = self._samples[(selected_api, selected_model)] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def quantile(self, selected_api: str, selected_model: str, q: float = 0.95) -> Optional[float]:
+        """Quantile des durées récentes, None tant qu'il y a trop peu de mesures"""
+        with self._lock:
+            samples = sorted(self._samples.get((selected_api, selected_model), ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class HedgeBudget:
+    """Limite les requêtes de couverture à une fraction des recherches
+
+    Chaque recherche crédite `ratio` ; une couverture consomme 1. Les
+    couvertures ne peuvent donc pas dépasser ~ratio des appels, même quand
+    le fournisseur ralentit pour tout le monde.
+    """
+
+    def __init__(self, ratio: float = HEDGE_MAX_RATIO, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._credit = burst
+        self._lock = threading.Lock()
+
+    def on_lookup(self) -> None:
+        with self._lock:
+            self._credit = min(self.burst, self._credit + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._credit >= 1:
+                self._credit -= 1
+                return True
+            return False
+
+
+def parse_target(target: str) -> Optional[Tuple[str, str]]:
+    """"api:modèle" -> (api, modèle) ; None si vide"""
+    if not target:
+        return None
+    api, _, model = target.partition(":")
+    return api.strip(), model.strip()
+
+
+# Partagés par tout le processus
+latencies = LatencyTracker()
+hedge_budget = HedgeBudget()
@@ -0,0 +1,275 @@
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Iterator, List, Optional, Union
+
+from cache import normalize_card_name
+from config import (
+    RESULTS_BATCH_SIZE,
+    RESULTS_DB_PATH,
+    RESULTS_FLUSH_INTERVAL,
+    RESULTS_FSYNC,
+    RESULTS_QUEUE_SIZE,
+)
+from metrics import metrics
+
+logger = logging.getLogger("cards.results")
+
+# Politique de synchronisation disque -> PRAGMA synchronous de SQLite (mode WAL)
+FSYNC_POLICIES = {
+    "off": "OFF",        # le système décide ; le plus rapide
+    "batch": "NORMAL",   # fsync aux checkpoints du WAL
+    "always": "FULL",    # fsync à chaque lot écrit
+}
+
+_STOP = object()
+
+
+class ResultsStore:
+    """Historique append-only des réponses brutes et validées
+
+    Les écritures sont mises en file (bornée) et insérées par lots dans
+    SQLite par un thread dédié : le thread de la requête ne touche jamais
+    le disque. Les lectures passent par une connexion par thread.
+    """
+
+    def __init__(
+        self,
+        db_path: str = RESULTS_DB_PATH,
+        queue_size: int = RESULTS_QUEUE_SIZE,
+        batch_size: int = RESULTS_BATCH_SIZE,
+        flush_interval: float = RESULTS_FLUSH_INTERVAL,
+        fsync: str = RESULTS_FSYNC,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Politique fsync inconnue : {fsync}")
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._synchronous = FSYNC_POLICIES[fsync]
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._local = threading.local()
+        self._stats = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+        self._stats_lock = threading.Lock()
+
+        # Schéma créé avant le démarrage du writer
+        db = self._connect()
+        db.executescript(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " recorded_at REAL NOT NULL,"
+            " card_key TEXT NOT NULL,"
+            " card_choice TEXT NOT NULL,"
+            " card_name TEXT,"
+            " selected_api TEXT NOT NULL,"
+            " selected_model TEXT NOT NULL,"
+            " raw TEXT,"
+            " validated TEXT);"
+            "CREATE INDEX IF NOT EXISTS idx_results_lookup"
+            " ON results (card_key, selected_api, selected_model, recorded_at);"
+        )
+        db.commit()
+        db.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="results-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(f"PRAGMA synchronous={self._synchronous}")
+        return db
+
+    def _reader(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def record(
+        self,
+        card_choice: str,
+        selected_api: str,
+        selected_model: str,
+        raw: Union[dict, str, None],
+        validated: Optional[dict] = None,
+    ) -> bool:
+        """Met en file une réponse (brute, et validée si disponible)
+
+        raw est l'objet décodé, ou le texte JSON de la réponse tel quel.
+        Les dictionnaires ne doivent plus être modifiés après l'appel : ils
+        sont sérialisés plus tard par le thread d'écriture.
+
+        Returns:
+            bool: Faux si la file est pleine et l'enregistrement abandonné
+        """
+        source = validated if validated is not None else raw
+        card_name = source.get("cardName") if isinstance(source, dict) else None
+        row = (
+            time.time(),
+            normalize_card_name(card_choice),
+            card_choice,
+            card_name,
+            selected_api,
+            selected_model,
+            raw,
+            validated,
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+            return False
+        with self._stats_lock:
+            self._stats["queued"] += 1
+        return True
+
+    def _write_loop(self) -> None:
+        db = self._connect()
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            try:
+                if batch:
+                    self._write_batch(db, batch)
+            except Exception:
+                # Base verrouillée (bulk et serveur sur le même fichier), disque plein... :
+                # le lot est perdu mais le thread continue, sinon flush() ne rendrait jamais la main
+                db.rollback()
+                with self._stats_lock:
+                    self._stats["failed"] += len(batch)
+                metrics.inc("results_write_errors_total")
+                logger.exception("Échec d'écriture de %d réponse(s) dans %s", len(batch), self.db_path)
+            finally:
+                for _ in range(len(batch) + stopping):
+                    self._queue.task_done()
+        db.close()
+
+    def _write_batch(self, db: sqlite3.Connection, batch: list) -> None:
+        # Sérialisation faite ici, hors du thread de la requête
+        batch = [
+            (*row[:6],
+             row[6] if row[6] is None or isinstance(row[6], str) else json.dumps(row[6], ensure_ascii=False),
+             json.dumps(row[7], ensure_ascii=False) if row[7] is not None else None)
+            for row in batch
+        ]
+        db.executemany(
+            "INSERT INTO results (recorded_at, card_key, card_choice, card_name,"
+            " selected_api, selected_model, raw, validated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            batch,
+        )
+        db.commit()
+        with self._stats_lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+
+    def flush(self) -> None:
+        """Attend que toutes les réponses en file soient écrites"""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Écrit les réponses en attente puis arrête le thread d'écriture"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+    def _query(self, sql: str, params: list) -> List[dict]:
+        rows = self._reader().execute(sql, params).fetchall()
+        return [
+            {
+                "recorded_at": recorded_at,
+                "card_choice": card_choice,
+                "selected_api": selected_api,
+                "selected_model": selected_model,
+                "raw": json.loads(raw) if raw is not None else None,
+                "validated": json.loads(validated) if validated is not None else None,
+            }
+            for recorded_at, card_choice, selected_api, selected_model, raw, validated in rows
+        ]
+
+    def history(
+        self,
+        card_choice: str,
+        selected_api: Optional[str] = None,
+        selected_model: Optional[str] = None,
+        limit: int = 20,
+        validated_only: bool = False,
+    ) -> List[dict]:
+        """Versions enregistrées d'une carte, de la plus récente à la plus ancienne"""
+        sql = ("SELECT recorded_at, card_choice, selected_api, selected_model, raw, validated"
+               " FROM results WHERE card_key = ?")
+        params = [normalize_card_name(card_choice)]
+        if selected_api:
+            sql += " AND selected_api = ?"
+            params.append(selected_api)
+        if selected_model:
+            sql += " AND selected_model = ?"
+            params.append(selected_model)
+        if validated_only:
+            sql += " AND validated IS NOT NULL"
+        sql += " ORDER BY recorded_at DESC LIMIT ?"
+        params.append(limit)
+        return self._query(sql, params)
+
+    def latest(
+        self,
+        card_choice: str,
+        selected_api: Optional[str] = None,
+        selected_model: Optional[str] = None,
+    ) -> Optional[dict]:
+        """Dernière version validée d'une carte, ou None"""
+        records = self.history(card_choice, selected_api, selected_model, limit=1, validated_only=True)
+        return records[0] if records else None
+
+    def validated_names(self) -> List[tuple]:
+        """Couples distincts (cardName, issuer, nom saisi) des réponses validées"""
+        return self._reader().execute(
+            "SELECT DISTINCT card_name, json_extract(validated, '$.issuer'), card_choice"
+            " FROM results WHERE validated IS NOT NULL AND card_name IS NOT NULL"
+        ).fetchall()
+
+    def validated_cards(self) -> Iterator[dict]:
+        """Réponses validées, de la plus ancienne à la plus récente (lecture en flux)"""
+        cursor = self._reader().execute("SELECT validated FROM results WHERE validated IS NOT NULL ORDER BY id")
+        for (validated,) in cursor:
+            yield json.loads(validated)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+
+_results_store: Optional[ResultsStore] = None
+_results_store_lock = threading.Lock()
+
+
+def get_results_store() -> ResultsStore:
+    """Retourne le store partagé du processus, vidé automatiquement à la sortie"""
+    global _results_store
+    if _results_store is None:
+        with _results_store_lock:
+            if _results_store is None:
+                _results_store = ResultsStore()
+                atexit.register(_results_store.close)
+    return _results_store
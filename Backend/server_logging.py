@@ -0,0 +1,250 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import (
+    ERROR_LOG_PATH,
+    LOG_BACKUP_COUNT,
+    LOG_CONSOLE_LEVEL,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_PATH,
+    LOG_QUEUE_SIZE,
+    LOG_ROTATE,
+    LOG_ROTATE_WHEN,
+    LOG_SAMPLE_BURST,
+    LOG_SAMPLE_WINDOW,
+    log_console_output,
+)
+from metrics import metrics
+
+logger = logging.getLogger("cards")
+
+# Requête serveur en cours (None hors requête) ; ses champs sont recopiés sur chaque enregistrement
+_current_request: contextvars.ContextVar[Optional["RequestLog"]] = contextvars.ContextVar("current_request", default=None)
+
+# Attributs propres à tout LogRecord : le reste vient de extra= ou du contexte de requête
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement : ts, level, logger, msg, puis les champs supplémentaires"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Enregistrement passé par la file : trace déjà mise en forme (_BoundedQueueHandler.prepare)
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Échantillonne les avertissements et erreurs répétés
+
+    Au plus burst enregistrements identiques (même logger, niveau et
+    error_kind, ou même message) par fenêtre de window secondes ; les
+    suivants sont écartés avant la file et comptés. Le premier de la
+    fenêtre suivante porte le nombre d'écartés (champ suppressed).
+    """
+
+    def __init__(self, window: float = LOG_SAMPLE_WINDOW, burst: int = LOG_SAMPLE_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._seen = {}  # clé -> [début de fenêtre, émis, écartés]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.levelno, getattr(record, "error_kind", None) or str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._seen.get(key)
+            if state is None or now - state[0] >= self.window:
+                if len(self._seen) >= 4096:
+                    # Messages tous différents : on oublie les fenêtres terminées
+                    self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.window}
+                self._seen[key] = [now, 1, 0]
+                if state is not None and state[2]:
+                    record.suppressed = state[2]
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+        metrics.inc("log_records_sampled_total", level=record.levelname)
+        return False
+
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+class _ContextFilter(logging.Filter):
+    # Exécuté dans le thread appelant, avant la file : le contexte y est encore visible
+    def filter(self, record: logging.LogRecord) -> bool:
+        request = _current_request.get()
+        if request is not None:
+            for key, value in request.context.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # QueueHandler.prepare colle la trace au message et efface exc_info : on la garde à part,
+        # dans exc_text, pour le champ "exc" du JSON (le formateur texte de la console l'ajoute aussi)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    # File pleine : l'enregistrement est perdu plutôt que de bloquer la requête
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_records_dropped_total")
+
+
+class RequestLog:
+    """Contexte de journalisation d'une requête serveur
+
+    Tant qu'il est actif, chaque enregistrement émis par la requête porte
+    request_id, route, puis provider et model une fois connus (annotate).
+    finish écrit la ligne "request" : statut, durée totale et par étape.
+
+    Args:
+        route (str): Route appelée
+        request_id (str): Identifiant fourni par le client (X-Request-ID), sinon généré
+    """
+
+    def __init__(self, route: str, request_id: Optional[str] = None):
+        self.context = {"request_id": request_id or uuid.uuid4().hex, "route": route}
+        self.stages = None
+        self._started = time.perf_counter()
+        self._token = _current_request.set(self)
+        self._finished = False
+
+    @property
+    def request_id(self) -> str:
+        return self.context["request_id"]
+
+    def finish(self, status: int) -> None:
+        """Termine le contexte et écrit la ligne "request" (sans effet au second appel)"""
+        if self._finished:
+            return
+        self._finished = True
+        _current_request.reset(self._token)
+        entry = {
+            **self.context,
+            "status": status,
+            "elapsed_ms": round((time.perf_counter() - self._started) * 1000, 2),
+        }
+        if self.stages:
+            timings = {}
+            for stage, seconds in self.stages:
+                timings[stage] = timings.get(stage, 0.0) + seconds * 1000
+            entry["stages"] = {stage: round(ms, 2) for stage, ms in timings.items()}
+        # Toujours INFO : une ligne par requête, jamais échantillonnée (l'erreur a son propre enregistrement)
+        logger.info("request", extra=entry)
+
+
+def annotate(stages: Optional[list] = None, **fields) -> None:
+    """Complète le contexte de la requête en cours (hors requête : sans effet)
+
+    Args:
+        stages (list): Liste remplie par metrics.request_timings, résumée dans la ligne "request"
+        **fields: Champs ajoutés aux enregistrements de la requête (provider, model...)
+    """
+    request = _current_request.get()
+    if request is None:
+        return
+    if stages is not None:
+        request.stages = stages
+    request.context.update(fields)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def setup_server_logging(console_level: str = LOG_CONSOLE_LEVEL) -> None:
+    """Journalisation des modes serveur (auto, async, warm)
+
+    Les appels de journalisation, print_colored compris (redirigé, sans
+    couleurs), déposent l'enregistrement dans une file bornée ; un thread
+    l'écrit en JSON dans LOG_PATH, avec rotation par taille ou par période
+    (LOG_ROTATE), et recopie sur stderr les niveaux >= console_level.
+    Les lignes d'accès de werkzeug sont remplacées par les lignes "request",
+    qui résument aussi chaque appel au fournisseur.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        if LOG_ROTATE == "time":
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                LOG_PATH, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+        file_handler.setFormatter(JsonFormatter())
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setLevel(console_level)
+        console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+
+        records = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = _BoundedQueueHandler(records)
+        queue_handler.addFilter(SamplingFilter())
+        queue_handler.addFilter(_ContextFilter())
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(LOG_LEVEL)
+        # Lignes d'accès (werkzeug) et d'appel au fournisseur (httpx) : résumées par la ligne "request"
+        for name in ("werkzeug", "httpx", "httpcore"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        _listener = logging.handlers.QueueListener(records, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        # stop() vide la file avant la fin du processus
+        atexit.register(_listener.stop)
+        log_console_output(logging.getLogger("cards.console"))
+
+
+def setup_cli_logging() -> None:
+    """Modes manuel et bulk : erreurs seules, en texte, dans ERROR_LOG_PATH (le terminal reste à print_colored)"""
+    logging.basicConfig(
+        filename=ERROR_LOG_PATH,
+        level=logging.ERROR,
+        format='%(asctime)s %(levelname)s: %(message)s'
+    )
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from metrics import metrics
+
+T = TypeVar("T")
+
+
+class _InFlightCall:
+    """Appel en cours partagé entre le leader et les requêtes en attente"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Fusionne les appels concurrents portant sur la même clé
+
+    Le premier appelant (leader) exécute la fonction ; les suivants attendent
+    son résultat ou son exception au lieu de relancer un appel au fournisseur.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"leader_calls": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Exécute fn une seule fois pour tous les appels concurrents sur key
+
+        Args:
+            key: Clé identifiant la requête (carte, API, modèle)
+            fn: Fonction sans argument effectuant le vrai travail
+
+        Returns:
+            Le résultat de fn, partagé par tous les appelants
+
+        Raises:
+            Exception: L'exception levée par fn, propagée à tous les appelants
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self._stats["leader_calls"] += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                leader = False
+        metrics.inc("singleflight_calls_total", role="leader" if leader else "coalesced", mode="sync")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        """Retourne le nombre d'appels réels, d'appels fusionnés et en cours"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+            stats["waiting"] = sum(call.waiters for call in self._calls.values())
+        return stats
+
+
+class AsyncSingleFlight:
+    """Équivalent de SingleFlight pour les coroutines d'une même boucle"""
+
+    def __init__(self):
+        self._calls = {}
+        self._stats = {"leader_calls": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Exécute la coroutine fn une seule fois pour tous les appels concurrents sur key
+
+        Si le leader est annulé (client déconnecté), un appelant en attente
+        reprend l'appel à son compte au lieu d'hériter de l'annulation.
+        """
+        while (future := self._calls.get(key)) is not None:
+            self._stats["coalesced"] += 1
+            metrics.inc("singleflight_calls_total", role="coalesced", mode="async")
+            try:
+                # shield : l'annulation d'un appelant en attente ne doit pas annuler le leader
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not future.cancelled() or (task is not None and task.cancelling()):
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self._stats["leader_calls"] += 1
+        metrics.inc("singleflight_calls_total", role="leader", mode="async")
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # marque l'exception comme récupérée s'il n'y a aucun appelant en attente
+            raise
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._calls)
+        return stats
+
+
+card_lookups = SingleFlight()
+async_card_lookups = AsyncSingleFlight()
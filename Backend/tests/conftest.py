@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# Fichiers SQLite et journaux des tests hors du dépôt, fixés avant l'import de config
+_workdir = tempfile.mkdtemp(prefix="backend-tests-")
+for name, filename in (
+    ("CACHE_DB_PATH", "cache.db"),
+    ("RESULTS_DB_PATH", "results.db"),
+    ("ROUTER_DB_PATH", "router.db"),
+    ("ERROR_LOG_PATH", "error.log"),
+    ("LOG_PATH", "server.log"),
+):
+    os.environ.setdefault(name, os.path.join(_workdir, filename))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_provider():
+    """Démarre des faux fournisseurs (mêmes options que start_fake_provider), arrêtés en fin de test"""
+    from fake_provider import start_fake_provider
+
+    servers = []
+
+    def start(**options):
+        server = start_fake_provider(**options)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def openai_via(monkeypatch):
+    """Dirige l'API "openai" vers un faux fournisseur, avec une clé neuve (donc un limiteur neuf)"""
+    import pipeline
+    from config import PROVIDER_BASE_URLS
+
+    def route(server) -> str:
+        api_key = f"test-{uuid.uuid4().hex}"
+        monkeypatch.setitem(PROVIDER_BASE_URLS, "openai", server.base_url)
+        monkeypatch.setenv("OPENAI_KEY", api_key)
+        # Noms de test sans rapport entre eux : pas de rapprochement par l'index
+        monkeypatch.setattr(pipeline, "CARD_CANONICALIZE", False)
+        return api_key
+
+    return route
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+import asgi_app
+import pipeline
+from cache import get_result_cache
+
+
+def _call(method, path, body=None, query=b"", headers=()):
+    """Appelle l'application ASGI ; retourne (statut, en-têtes, corps)"""
+    data = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query,
+        "headers": [(b"content-type", b"application/json"), *headers],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": data, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi_app.app(scope, receive, send))
+    start, *bodies = messages
+    return start["status"], dict(start["headers"]), b"".join(message["body"] for message in bodies)
+
+
+@pytest.fixture
+def cached_cards(monkeypatch):
+    """Deux cartes déjà en cache pour openai:fake : aucune requête au fournisseur"""
+    monkeypatch.setattr(pipeline, "CARD_CANONICALIZE", False)
+    names = [f"Gold {uuid.uuid4().hex[:8]}" for _ in range(2)]
+    for name in names:
+        get_result_cache().set(name, "openai", "fake", {"cardName": name})
+    return names
+
+
+def test_head_has_the_get_headers_without_a_body(cached_cards):
+    query = f"card_choice={cached_cards[0]}&selected_api=openai&selected_model=fake".encode()
+    status, headers, body = _call("GET", "/process", query=query)
+    head_status, head_headers, head_body = _call("HEAD", "/process", query=query)
+
+    assert (status, head_status) == (200, 200)
+    assert head_headers[b"content-length"] == headers[b"content-length"] == str(len(body)).encode()
+    assert head_body == b""
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_batch_matches_the_flask_contract(cached_cards, stream):
+    request = {"card_choices": cached_cards, "selected_api": "openai", "selected_model": "fake", "stream": stream}
+    status, headers, body = _call("POST", "/process/batch", request)
+
+    assert status == 200
+    if stream:
+        assert headers[b"content-type"] == b"application/x-ndjson"
+        results = sorted((json.loads(line) for line in body.splitlines()), key=lambda result: result["index"])
+    else:
+        results = json.loads(body)["results"]
+    assert [(result["status"], result["data"]["cardName"]) for result in results] == [(200, name) for name in cached_cards]
+
+
+def test_stream_sends_the_result_event(cached_cards):
+    request = {"card_choice": cached_cards[0], "selected_api": "openai", "selected_model": "fake"}
+    status, headers, body = _call("POST", "/process/stream", request)
+
+    assert status == 200
+    assert headers[b"content-type"] == b"text/event-stream"
+    assert body.decode().startswith("event: result\n")
+
+
+def test_stream_rejects_bad_input_before_the_event_stream():
+    request = {"card_choice": "Gold", "selected_api": "nope", "selected_model": "fake"}
+    status, headers, body = _call("POST", "/process/stream", request)
+
+    assert status == 400
+    assert "Unsupported api" in json.loads(body)["error"]
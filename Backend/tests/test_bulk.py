@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import bulk
+import pipeline
+
+
+def _write_csv(path, card_choices):
+    path.write_text("card_choice\n" + "".join(f"{card}\n" for card in card_choices), encoding="utf-8")
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.fixture
+def files(tmp_path, fake_provider, openai_via):
+    openai_via(fake_provider())
+    return tmp_path / "cards.csv", tmp_path / "results.jsonl"
+
+
+def test_resume_skips_only_rows_with_the_same_card(files):
+    input_path, output_path = files
+    _write_csv(input_path, ["Gold", "Platinum"])
+    assert bulk.run_bulk(str(input_path), str(output_path), "openai", "fake")["done"] == 2
+
+    # Carte insérée en tête : les numéros de ligne des autres changent
+    _write_csv(input_path, ["Cobalt", "Gold", "Platinum"])
+    summary = bulk.run_bulk(str(input_path), str(output_path), "openai", "fake")
+
+    assert (summary["skipped"], summary["done"], summary["failed"]) == (0, 3, 0)
+    # Écrites dans l'ordre de fin des recherches
+    assert sorted((record["row"], record["card_choice"]) for record in _lines(output_path)[2:]) == [
+        (1, "Cobalt"), (2, "Gold"), (3, "Platinum"),
+    ]
+
+    summary = bulk.run_bulk(str(input_path), str(output_path), "openai", "fake")
+    assert (summary["skipped"], summary["done"]) == (3, 0)
+
+
+def test_unknown_model_fails_the_row_not_the_run(files, monkeypatch):
+    input_path, output_path = files
+    _write_csv(input_path, ["Gold", "Platinum"])
+
+    def resolve_model(selected_api, selected_model):
+        raise pipeline.UnknownModelError(f"No candidate models for {selected_api}")
+
+    monkeypatch.setattr(bulk, "resolve_model", resolve_model)
+    summary = bulk.run_bulk(str(input_path), str(output_path), "openai", "auto")
+
+    assert (summary["done"], summary["failed"]) == (2, 2)
+    errors = _lines(output_path.with_name("results.errors.jsonl"))
+    assert {(record["status"], record["selected_model"]) for record in errors} == {(400, "auto")}
+
+
+def test_errors_are_kept_across_runs_once_per_row(files, monkeypatch):
+    input_path, output_path = files
+    errors_path = output_path.with_name("results.errors.jsonl")
+    _write_csv(input_path, ["Gold", "Platinum"])
+
+    def resolve_model(selected_api, selected_model):
+        raise pipeline.UnknownModelError(f"No candidate models for {selected_api}")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(bulk, "resolve_model", resolve_model)
+        bulk.run_bulk(str(input_path), str(output_path), "openai", "auto")
+        bulk.run_bulk(str(input_path), str(output_path), "openai", "auto")
+    assert sorted((record["row"], record["card_choice"]) for record in _lines(errors_path)) == [
+        (1, "Gold"), (2, "Platinum"),
+    ]
+
+    # Seul Gold est relancé et validé : l'échec de Platinum, non réessayé, est conservé
+    _write_csv(input_path, ["Gold"])
+    assert bulk.run_bulk(str(input_path), str(output_path), "openai", "fake")["failed"] == 0
+    assert [(record["row"], record["card_choice"]) for record in _lines(errors_path)] == [(2, "Platinum")]
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from cache import ResultCache
+from metrics import metrics
+
+CARD = {"cardName": "Amex Platinum"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"), ttl_seconds=0.2, max_memory_entries=2)
+    yield cache
+    cache.close()
+
+
+def test_key_ignores_case_and_spacing(cache):
+    cache.set("Amex  Platinum", "openai", "gpt-4", CARD)
+    assert cache.get(" amex platinum ", "OpenAI", "gpt-4") == CARD
+    assert cache.get("amex platinum", "openai", "gpt-3.5-turbo") is None
+
+
+def test_entries_expire_after_ttl(cache):
+    expired = metrics.value("cache_expired_total", tier="memory")
+    cache.set("Amex Platinum", "openai", "gpt-4", CARD)
+    time.sleep(0.25)
+
+    assert cache.get("Amex Platinum", "openai", "gpt-4") is None
+    assert cache.stats()["expired"] == 1  # une expiration par lecture, mémoire et disque confondus
+    assert metrics.value("cache_expired_total", tier="memory") == expired + 1
+
+
+def test_disk_tier_survives_memory_eviction(cache):
+    disk_hits = metrics.value("cache_lookups_total", result="disk_hit")
+    for name in ("a", "b", "c"):
+        cache.set(name, "openai", "gpt-4", {"cardName": name})
+
+    assert cache.get("a", "openai", "gpt-4") == {"cardName": "a"}
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["evictions"]) == (0, 1, 2)
+    assert metrics.value("cache_lookups_total", result="disk_hit") == disk_hits + 1
+    assert 'cache_lookups_total{result="disk_hit"}' in metrics.render_prometheus()
+
+
+def test_get_returns_a_copy(cache):
+    cache.set("Amex Platinum", "openai", "gpt-4", CARD)
+    cache.get("Amex Platinum", "openai", "gpt-4")["cardName"] = "changed"
+
+    assert cache.get("Amex Platinum", "openai", "gpt-4") == CARD
+
+
+def test_memory_hits_keep_disk_entries_from_eviction(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"), max_disk_entries=2)
+    cache.set("a", "openai", "gpt-4", {"cardName": "a"})
+    cache.set("b", "openai", "gpt-4", {"cardName": "b"})
+    assert cache.get("a", "openai", "gpt-4") == {"cardName": "a"}  # succès mémoire
+    cache.set("c", "openai", "gpt-4", {"cardName": "c"})
+
+    # "b", le moins récemment lu sur disque, est évincé à la place de "a"
+    cache._memory.clear()
+    assert cache.get("a", "openai", "gpt-4") == {"cardName": "a"}
+    assert cache.get("b", "openai", "gpt-4") is None
+    cache.close()
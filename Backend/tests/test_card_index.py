@@ -0,0 +1,50 @@
+import pytest
+
+from card_index import CardIndex
+
+
+@pytest.fixture
+def index():
+    index = CardIndex()
+    index.add("American Express Gold Card", "American Express", alias="amex gold")
+    index.add("American Express Platinum Card", "American Express")
+    index.add("Chase Sapphire Preferred Card", "Chase")
+    index.add("Chase Sapphire Reserve Card", "Chase")
+    return index
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("american express gold card", "American Express Gold Card"),
+    ("  AMEX   Gold ", "American Express Gold Card"),
+    ("American Express Gold", "American Express Gold Card"),
+    ("Chase Saphire Preferred Card", "Chase Sapphire Preferred Card"),
+    ("American Expres Platinum Card", "American Express Platinum Card"),
+])
+def test_exact_alias_and_typo_match(index, query, expected):
+    assert index.canonical_name(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    # Un mot de plus ou de moins désigne une autre carte : jamais fusionnée avec celle de l'index
+    "Chase Sapphire Card",
+    "Chase Sapphire Preferred Business Card",
+    "American Express Gold Business Card",
+    "Delta SkyMiles Gold Card",
+])
+def test_different_cards_are_not_merged(index, query):
+    assert index.match(query) is None
+    assert index.canonical_name(query) == query
+
+
+def test_suggest_completes_the_last_word(index):
+    names = [card["cardName"] for card in index.suggest("chase sapphire pre")]
+    assert names[0] == "Chase Sapphire Preferred Card"
+
+
+def test_alias_with_other_words_is_not_learned(index):
+    # Le modèle a répondu la carte Platinum à une recherche de la Platinum Business
+    index.add("American Express Platinum Card", "American Express", alias="amex platinum business")
+    index.add("American Express Platinum Card", "American Express", alias="platinum amex")
+
+    assert index.match("amex platinum business") is None
+    assert index.canonical_name("platinum amex") == "American Express Platinum Card"
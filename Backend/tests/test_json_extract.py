@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from bench import _extraction_corpus
+from json_extract import JSONExtractionError, extract_json
+from validation import CARD_KEYS
+
+CORPUS = _extraction_corpus()
+NOISE = ["{", "}", "[", "]", '"', "\\", "```", "```json", "{x}", "\n", "null"]
+
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_corpus_is_extracted(name):
+    text, expected = CORPUS[name]
+    assert extract_json(text, CARD_KEYS) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_noise_around_the_object_is_ignored(seed):
+    rng = random.Random(seed)
+    for text, expected in CORPUS.values():
+        prefix = "".join(rng.choice(NOISE) for _ in range(rng.randint(1, 20)))
+        suffix = "".join(rng.choice(NOISE) for _ in range(rng.randint(1, 20)))
+        assert extract_json(f"{prefix} {text}", CARD_KEYS) == expected
+        assert extract_json(f"{text} {suffix}", CARD_KEYS) == expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_truncated_object_raises_typed_error(seed):
+    rng = random.Random(seed)
+    for text, expected in CORPUS.values():
+        start, end = text.find("{"), text.rfind("}") + 1
+        truncated = text[:rng.randint(start, end - 1)]
+        try:
+            result = extract_json(truncated, CARD_KEYS)
+        except JSONExtractionError:
+            continue
+        # Repli sur un autre objet complet de la prose, jamais l'objet attendu tronqué
+        assert isinstance(result, dict)
+        assert result != expected
+
+
+@pytest.mark.parametrize("text", [None, "", "no json here", '{"cardName": ', '{"unrelated": 1}', "[1, 2]"])
+def test_invalid_responses_raise_typed_error(text):
+    with pytest.raises(JSONExtractionError):
+        extract_json(text, CARD_KEYS)
+
+
+def test_best_candidate_has_most_expected_keys():
+    text = '{"cardName": "short"} then {"cardName": "full", "issuer": "Bank", "annualFee": "$0"}'
+    assert extract_json(text, CARD_KEYS)["cardName"] == "full"
+
+
+@pytest.mark.parametrize("text", [
+    '{"a": ' * 5000,                               # tronqué, très imbriqué
+    '{"a": ' * 900 + "1,," + "}" * 900,            # équilibré mais invalide au fond
+    '{"a": ' * 5000 + "1" + "}" * 5000,            # plus profond que la pile du décodeur
+])
+def test_deep_broken_output_raises_typed_error(text):
+    with pytest.raises(JSONExtractionError):
+        extract_json(text, CARD_KEYS)
+
+
+def test_stray_quote_in_prose_brace_does_not_hide_the_object():
+    text, expected = CORPUS["fenced"]
+    assert extract_json('Use {"this" or {"that} ' + text, CARD_KEYS) == expected
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+import uuid
+
+import pytest
+
+import pipeline
+from cache import ResultCache
+from card_index import get_card_index
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Appels à pipeline.record_result, toujours exécutés"""
+    calls = []
+    record_result = pipeline.record_result
+
+    def spy(*args):
+        calls.append(args)
+        record_result(*args)
+
+    monkeypatch.setattr(pipeline, "record_result", spy)
+    return calls
+
+
+def test_valid_result_is_recorded_after_validation(fake_provider, openai_via, recorded):
+    openai_via(fake_provider())
+    card_choice = f"Gold {uuid.uuid4().hex[:8]}"
+
+    card = pipeline.lookup_card(card_choice, "openai", "fake")
+
+    assert [(call[0], call[4]) for call in recorded] == [(card_choice, card)]
+    # La saisie est devenue un alias de la carte pour les prochaines recherches
+    assert get_card_index().match(card_choice)[0]["cardName"] == card["cardName"]
+
+
+def test_invalid_result_is_recorded_as_failure(fake_provider, openai_via, recorded, monkeypatch):
+    openai_via(fake_provider(malformed_rate=1.0, seed=1))
+    monkeypatch.setattr(pipeline, "REPAIR_MAX_ATTEMPTS", 0)
+
+    with pytest.raises(pipeline.CardLookupError):
+        pipeline.lookup_card(f"Gold {uuid.uuid4().hex[:8]}", "openai", "fake")
+
+    # Réponse sans annualFee ni issuer : refusée, enregistrée comme un échec
+    assert recorded
+    assert all(call[4] is None for call in recorded)
+
+
+def test_missing_api_key_is_a_lookup_error(monkeypatch):
+    monkeypatch.delenv("OPENAI_KEY", raising=False)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(pipeline, "CARD_CANONICALIZE", False)
+
+    # Jamais de SystemExit sur le chemin de recherche (serveurs, bulk, warmer)
+    with pytest.raises(pipeline.MissingApiKeyError):
+        pipeline.lookup_card(f"Gold {uuid.uuid4().hex[:8]}", "openai", "fake")
+
+
+def test_plain_json_output_skips_extraction(fake_provider, openai_via, recorded, monkeypatch):
+    openai_via(fake_provider())
+
+    def clean_json(content):
+        raise AssertionError("extraction called on a plain JSON response")
+
+    monkeypatch.setattr(pipeline, "clean_json", clean_json)
+    card = pipeline.lookup_card(f"Gold {uuid.uuid4().hex[:8]}", "openai", "fake")
+
+    # Le texte de la réponse est enregistré tel quel, sans décodage intermédiaire
+    [(_, _, _, raw, validated)] = recorded
+    assert isinstance(raw, str)
+    assert validated == card
+
+
+def test_stream_releases_the_provider_slot_before_the_client_reads(fake_provider, openai_via, monkeypatch):
+    openai_via(fake_provider())
+    slot = threading.BoundedSemaphore(1)
+    monkeypatch.setitem(pipeline._provider_slots, "openai", slot)
+
+    events = pipeline.stream_card(f"Gold {uuid.uuid4().hex[:8]}", "openai", "fake")
+    assert next(events)[0] == "field"
+    # Le client n'a lu qu'un champ : le flux du fournisseur, lui, est terminé
+    assert slot.acquire(timeout=5)
+    slot.release()
+    assert list(events)[-1][0] == "result"
+
+
+@pytest.fixture
+def slow_primary(monkeypatch, tmp_path):
+    """Couverture vers openai:fake-hedge après 50 ms ; le modèle demandé met 1 s à répondre"""
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"))
+    monkeypatch.setattr(pipeline, "get_result_cache", lambda: cache)
+    monkeypatch.setitem(pipeline.PROVIDER_HEDGE_TARGETS, "openai", "openai:fake-hedge")
+    monkeypatch.setattr(pipeline, "HEDGE_DELAY_SECONDS", 0.05)
+
+    def answer(card_choice, selected_api, selected_model):
+        return {"cardName": card_choice, "model": selected_model}
+
+    def attempt(card_choice, selected_api, selected_model):
+        if selected_model == "fake":
+            time.sleep(1)
+        return answer(card_choice, selected_api, selected_model)
+
+    async def attempt_async(card_choice, selected_api, selected_model):
+        if selected_model == "fake":
+            await asyncio.sleep(1)
+        return answer(card_choice, selected_api, selected_model)
+
+    monkeypatch.setattr(pipeline, "_attempt", attempt)
+    monkeypatch.setattr(pipeline, "_attempt_async", attempt_async)
+    yield cache
+    cache.close()
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_hedge_win_is_cached_under_the_hedge_model(slow_primary, use_async):
+    card_choice = f"Gold {uuid.uuid4().hex[:8]}"
+    if use_async:
+        card = asyncio.run(pipeline._fetch_and_validate_async(card_choice, "openai", "fake"))
+    else:
+        card = pipeline._fetch_and_validate(card_choice, "openai", "fake")
+
+    assert card["model"] == "fake-hedge"
+    assert slow_primary.get(card_choice, "openai", "fake-hedge") == card
+    assert slow_primary.get(card_choice, "openai", "fake") is None
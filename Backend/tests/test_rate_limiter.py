@@ -0,0 +1,151 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import core_functions
+import pipeline
+from client_registry import _fingerprint
+from rate_limiter import RateLimiter, RateLimitTimeout, _limiters, parse_duration, parse_retry_after
+
+
+def _burst(count: int) -> list:
+    """count recherches simultanées de cartes distinctes ; statut HTTP que /process renverrait"""
+    prefix = uuid.uuid4().hex[:8]
+
+    def lookup(i):
+        try:
+            pipeline.lookup_card(f"{prefix} card {i}", "openai", "fake")
+            return 200
+        except pipeline.CardLookupError as e:
+            return e.status_code
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        return list(executor.map(lookup, range(count)))
+
+
+def test_calls_over_quota_queue_and_succeed(fake_provider, openai_via, monkeypatch):
+    server = fake_provider(rpm=60)
+    api_key = openai_via(server)
+    # Budget configuré comme celui du fournisseur (OPENAI_RPM) : 1 requête/s une fois le seau vide
+    monkeypatch.setitem(_limiters, ("openai", _fingerprint(api_key)), RateLimiter(60, 0, name="openai"))
+
+    start = time.monotonic()
+    statuses = _burst(64)
+    elapsed = time.monotonic() - start
+
+    assert statuses == [200] * 64
+    # Les 4 requêtes en excès ont attendu leur tour au lieu de recevoir un 429
+    assert server.rejected == 0
+    assert elapsed >= 3
+
+
+def test_unconfigured_budget_adapts_to_429s_without_failing(fake_provider, openai_via):
+    # Limiteur par défaut (500 rpm) bien au-dessus du fournisseur : les 429 ajustent le budget
+    server = fake_provider(rpm=120)
+    openai_via(server)
+
+    statuses = _burst(126)
+
+    assert statuses == [200] * 126
+    assert 502 not in statuses
+
+
+def test_retry_after_is_honoured(fake_provider, openai_via):
+    # Tout est refusé (Retry-After: 1) jusqu'à ce que le fournisseur se rétablisse, 0,2 s plus tard
+    server = fake_provider(rate_limit_rate=1.0)
+    openai_via(server)
+    threading.Timer(0.2, setattr, (server, "rate_limit_rate", 0.0)).start()
+
+    start = time.monotonic()
+    assert _burst(1) == [200]
+    elapsed = time.monotonic() - start
+
+    # Un seul refus : le nouvel essai attend la seconde demandée au lieu de repartir aussitôt
+    assert server.rejected == 1
+    assert elapsed >= 1.0
+
+
+def test_budget_exhausted_until_deadline_raises_with_retry_after():
+    limiter = RateLimiter(60, 0)
+    limiter.requests.level = 0
+
+    with pytest.raises(RateLimitTimeout) as raised:
+        limiter.acquire(1, deadline=time.monotonic() + 0.1)
+    assert raised.value.retry_after == pytest.approx(1.0, abs=0.1)
+
+
+def test_full_queue_rejects_immediately():
+    limiter = RateLimiter(60, 0, max_queue=0)
+    limiter.requests.level = 0
+
+    start = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(1, deadline=time.monotonic() + 30)
+    assert time.monotonic() - start < 0.5
+
+
+def test_headers_adjust_the_budget():
+    limiter = RateLimiter(500, 0)
+    limiter.update_from_headers({"x-ratelimit-limit-requests": "60", "x-ratelimit-remaining-requests": "0"})
+    assert limiter.requests.per_minute == 60
+    assert limiter.requests.level < 1
+
+    limiter.update_from_headers({"retry-after-ms": "1500"}, rate_limited=True)
+    assert limiter.stats()["blocked_for"] == pytest.approx(1.5, abs=0.1)
+
+
+def test_published_limit_fills_an_unlimited_bucket():
+    limiter = RateLimiter(0, 0)
+    limiter.update_from_headers({"x-ratelimit-limit-requests": "60"})
+
+    assert limiter.requests.level == 60
+    limiter.acquire(1, deadline=time.monotonic())
+
+
+def test_stream_settles_the_real_usage(fake_provider, openai_via, monkeypatch):
+    api_key = openai_via(fake_provider())
+    limiter = RateLimiter(0, 0, name="openai")
+    monkeypatch.setitem(_limiters, ("openai", _fingerprint(api_key)), limiter)
+    settled = []
+    monkeypatch.setattr(limiter, "settle", lambda estimated, actual: settled.append((estimated, actual)))
+
+    events = list(pipeline.stream_card(f"Gold {uuid.uuid4().hex[:8]}", "openai", "fake"))
+
+    assert events[-1][0] == "result"
+    [(estimated, actual)] = settled
+    assert actual and actual != estimated
+
+
+def test_timeout_keeps_the_estimate(monkeypatch):
+    import httpx
+    from openai import APITimeoutError
+
+    def create(**params):
+        raise APITimeoutError(httpx.Request("POST", "http://provider.invalid"))
+
+    client = SimpleNamespace(api_key=uuid.uuid4().hex)
+    client.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+    limiter = RateLimiter(0, 6000, name="timeout-test")
+    monkeypatch.setitem(_limiters, ("timeout-test", _fingerprint(client.api_key)), limiter)
+    monkeypatch.setattr(core_functions, "PROVIDER_MAX_RETRIES", 0)
+    params = {"model": "fake", "messages": [{"role": "user", "content": "x" * 400}]}
+
+    with pytest.raises(APITimeoutError):
+        core_functions._send_completion(client, "timeout-test", params)
+    # La requête a pu être traitée : ses jetons estimés restent prélevés
+    assert limiter.tokens.level < 6000 - core_functions._estimate_tokens(params["messages"]) / 2
+
+
+@pytest.mark.parametrize("value, seconds", [("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("2.5", 2.5), ("", None)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+def test_parse_retry_after_prefers_milliseconds():
+    assert parse_retry_after({"retry-after-ms": "250", "retry-after": "3"}) == 0.25
+    assert parse_retry_after({"retry-after": "3"}) == 3.0
+    assert parse_retry_after({}) is None
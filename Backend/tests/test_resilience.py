@@ -0,0 +1,73 @@
+import time
+import uuid
+
+import pytest
+
+import core_functions
+import pipeline
+from resilience import CircuitBreaker, CircuitOpenError, _breakers, backoff_delay
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """Disjoncteur neuf pour "openai" (2 échecs, 30 s) et nouveaux essais sans attente"""
+    breaker = CircuitBreaker("openai", failure_threshold=2, open_seconds=30)
+    monkeypatch.setitem(_breakers, "openai", breaker)
+    monkeypatch.setattr(core_functions, "backoff_delay", lambda retries: 0.0)
+    return breaker
+
+
+def _lookup() -> int:
+    try:
+        pipeline.lookup_card(f"{uuid.uuid4().hex[:8]} card", "openai", "fake")
+        return 200
+    except pipeline.CardLookupError as e:
+        return e.status_code
+
+
+def test_transient_errors_are_retried(fake_provider, openai_via, breaker):
+    openai_via(fake_provider(error_rate=0.2, seed=3))
+
+    assert [_lookup() for _ in range(20)] == [200] * 20
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_outage_opens_the_circuit(fake_provider, openai_via, breaker):
+    server = fake_provider(error_rate=1.0)
+    openai_via(server)
+
+    # Le circuit s'ouvre au 2e échec : le nouvel essai suivant n'est pas envoyé
+    assert _lookup() == 503
+    assert server.received == 2
+    start = time.monotonic()
+    # Circuit ouvert : refus immédiat, sans appel au fournisseur
+    assert _lookup() == 503
+    assert time.monotonic() - start < 0.5
+    assert server.received == 2
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = CircuitBreaker("test", failure_threshold=2, open_seconds=0.05)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+@pytest.mark.parametrize("attempt, ceiling", [(0, 0.5), (1, 1.0), (3, 4.0), (10, 8.0)])
+def test_backoff_is_capped_full_jitter(attempt, ceiling):
+    delays = [backoff_delay(attempt, base=0.5, cap=8.0) for _ in range(200)]
+    assert all(0 <= delay <= ceiling for delay in delays)
+    assert max(delays) > ceiling / 2
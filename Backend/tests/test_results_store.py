@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+from metrics import metrics
+from results_store import ResultsStore
+
+CARD = {"cardName": "Amex Gold", "issuer": "American Express"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(db_path=str(tmp_path / "results.db"), flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def test_records_are_written_in_the_background(store):
+    assert store.record("amex gold", "openai", "gpt-4", CARD, CARD)
+    store.flush()
+
+    assert store.latest("Amex  Gold")["validated"] == CARD
+    assert store.stats()["written"] == 1
+
+
+def test_failed_write_does_not_stop_the_writer(store, monkeypatch):
+    write_batch = store._write_batch
+    calls = []
+
+    def locked_once(db, batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        write_batch(db, batch)
+
+    monkeypatch.setattr(store, "_write_batch", locked_once)
+    errors = metrics.value("results_write_errors_total")
+
+    store.record("amex gold", "openai", "gpt-4", CARD, CARD)
+    store.flush()  # rend la main malgré l'échec du lot
+    store.record("amex platinum", "openai", "gpt-4", CARD, None)
+    store.flush()
+
+    stats = store.stats()
+    assert (stats["failed"], stats["written"]) == (1, 1)
+    assert metrics.value("results_write_errors_total") == errors + 1
+    assert store.history("amex platinum")[0]["raw"] == CARD
+    assert store.latest("amex gold") is None
@@ -0,0 +1,25 @@
+import json
+import logging
+import queue
+
+from server_logging import JsonFormatter, _BoundedQueueHandler
+
+
+def test_exception_survives_the_queue():
+    records = queue.Queue()
+    log = logging.getLogger("cards.test-queue")
+    log.propagate = False
+    log.addHandler(_BoundedQueueHandler(records))
+    try:
+        raise ValueError("provider answered garbage")
+    except ValueError:
+        log.error("lookup failed for %s", "Gold", exc_info=True)
+
+    record = records.get_nowait()
+    entry = json.loads(JsonFormatter().format(record))
+    # Trace dans son propre champ, message intact
+    assert entry["msg"] == "lookup failed for Gold"
+    assert entry["exc"].startswith("Traceback")
+    assert "ValueError: provider answered garbage" in entry["exc"]
+    # La console (formateur texte) affiche toujours la trace
+    assert "Traceback" in logging.Formatter("%(message)s").format(record)
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from metrics import metrics
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    coalesced = metrics.value("singleflight_calls_total", role="coalesced", mode="sync")
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"cardName": "shared"}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(flight.do, "card", fetch) for _ in range(8)]
+        while flight.stats()["waiting"] < 7:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert calls == [1]
+    assert results == [{"cardName": "shared"}] * 8
+    assert flight.stats() == {"leader_calls": 1, "coalesced": 7, "in_flight": 0, "waiting": 0}
+    assert metrics.value("singleflight_calls_total", role="coalesced", mode="sync") == coalesced + 7
+    assert 'singleflight_calls_total{mode="sync",role="coalesced"}' in metrics.render_prometheus()
+
+
+def test_leader_error_reaches_every_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("provider down")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(flight.do, "card", fail) for _ in range(3)]
+        while flight.stats()["waiting"] < 2:
+            threading.Event().wait(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_async_follower_takes_over_a_cancelled_leader():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        leader = asyncio.create_task(flight.do("card", fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("card", fetch)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*followers), calls
+
+    results, calls = asyncio.run(scenario())
+    # Un seul nouvel appel après l'annulation, partagé par les autres
+    assert results == [2, 2, 2]
+    assert calls == [1, 1]
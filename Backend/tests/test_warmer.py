@@ -0,0 +1,33 @@
+import pytest
+
+import warmer
+from cache import ResultCache
+from warmer import CardWarmer
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "cache.db"))
+    monkeypatch.setattr(warmer, "get_result_cache", lambda: cache)
+    yield cache
+    cache.close()
+
+
+def test_failing_targets_do_not_stop_the_cycle(cache, monkeypatch):
+    def refresh_card(card_choice, selected_api, selected_model):
+        if card_choice == "crash":
+            raise RuntimeError("unexpected")
+        if card_choice == "no-key":
+            raise warmer.CardLookupError("Missing openai API key in the server environment")
+        cache.set(card_choice, selected_api, selected_model, {"cardName": card_choice})
+        return {"cardName": card_choice}
+
+    monkeypatch.setattr(warmer, "refresh_card", refresh_card)
+    monkeypatch.setattr(warmer, "canonical_card", lambda card_choice, *_: card_choice)
+    card_warmer = CardWarmer(["crash", "gold", "no-key", "platinum"], "fake", "fake", max_qps=0)
+
+    report = card_warmer.run_once()
+
+    assert (report["refreshed"], report["failed"]) == (2, 2)
+    assert report["covered"] == 2
+    assert cache.get("gold", "fake", "fake") == {"cardName": "gold"}
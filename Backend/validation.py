@@ -1,73 +1,183 @@
 import json
+from typing import Iterable, List, Optional, Union
 
-from jsonschema import ValidationError
+from pydantic import TypeAdapter, ValidationError
 
-from config import MSG_COLOR, CreditCard, print_colored
+from card_models import CreditCard
+from config import MSG_COLOR, print_colored
 from error_handlers import handle_api_errors
+from json_extract import JSONExtractionError, extract_json
 
 
+# Clés de premier niveau permettant de reconnaître l'objet carte parmi plusieurs candidats
+CARD_KEYS = [field.alias for field in CreditCard.model_fields.values()]
+
 def save_data(filename: str, data: dict) -> None:
     formatted_json = json.dumps([data], indent=2, ensure_ascii=False)
     with open(filename, "w", encoding="utf-8") as f:
         f.write(formatted_json)
 
-def validate_dict(response_text: dict)-> dict:
+# Schémas de validation compilés une seule fois par processus
+CARD_ADAPTER = TypeAdapter(CreditCard)
+CARD_LIST_ADAPTER = TypeAdapter(List[CreditCard])
+
+
+def validate_card(data: Union[dict, str, bytes]) -> dict:
+    """Valide une carte et retourne le dictionnaire normalisé (clés en alias)
+
+    Le texte ou les octets JSON sont validés directement, sans json.loads
+    intermédiaire. Les coercitions ("null" -> None, frais numériques ->
+    texte) sont portées par le schéma ; l'entrée n'est jamais modifiée.
+
+    Args:
+        data (dict | str | bytes): Objet déjà décodé ou JSON brut
+
+    Returns:
+        dict: Données validées
+
+    Raises:
+        pydantic.ValidationError: Si les données ne respectent pas le schéma
+    """
+    if isinstance(data, (str, bytes, bytearray)):
+        card = CARD_ADAPTER.validate_json(data)
+    else:
+        card = CARD_ADAPTER.validate_python(data)
+    return CARD_ADAPTER.dump_python(card, by_alias=True)
+
+
+def validate_cards(data: Union[Iterable[dict], str, bytes]) -> List[dict]:
+    """Valide une liste de cartes en un seul appel au validateur
+
+    Args:
+        data (list | str | bytes): Liste d'objets ou tableau JSON brut
+
+    Returns:
+        list: Cartes validées, dans l'ordre d'entrée
+
+    Raises:
+        pydantic.ValidationError: Si une carte est invalide (erreurs indexées par position)
+    """
+    if isinstance(data, (str, bytes, bytearray)):
+        cards = CARD_LIST_ADAPTER.validate_json(data)
+    else:
+        cards = CARD_LIST_ADAPTER.validate_python(list(data))
+    return CARD_LIST_ADAPTER.dump_python(cards, by_alias=True)
+
+
+def _strict_schema(node, defs: dict):
+    """Adapte un schéma pydantic au mode strict des sorties structurées
+
+    Les $ref sont remplacées par leur définition (tous les fournisseurs ne
+    les acceptent pas), chaque propriété devient requise (la valeur peut
+    rester null) et les propriétés supplémentaires sont interdites.
+    """
+    if isinstance(node, list):
+        return [_strict_schema(item, defs) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        return _strict_schema(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+
+    strict = {
+        key: _strict_schema(value, defs)
+        for key, value in node.items()
+        if key not in ("$defs", "title", "default")
+    }
+    if "properties" in strict:
+        strict["properties"] = {
+            name: _strict_schema(prop, defs) for name, prop in node["properties"].items()
+        }
+        strict["required"] = list(strict["properties"])
+        strict["additionalProperties"] = False
+    return strict
 
-    # Conversion manuelle si nécessaire
-    if "annualFee" in response_text and isinstance(response_text["annualFee"], int):
-        response_text["annualFee"] = str(response_text["annualFee"])
+
+def build_card_json_schema() -> dict:
+    """Schéma JSON strict de CreditCard et de ses modèles imbriqués (clés en alias)"""
+    schema = CARD_ADAPTER.json_schema(by_alias=True)
+    return _strict_schema(schema, schema.get("$defs", {}))
+
+
+# Envoyé aux fournisseurs qui acceptent response_format de type json_schema
+CARD_JSON_SCHEMA = build_card_json_schema()
+
+
+def card_validation_errors(data: Union[dict, str, bytes]) -> str:
+    """Résumé lisible des erreurs de validation d'une carte ("" si valide)
+
+    Utilisé pour la demande de correction renvoyée au modèle.
+    """
     try:
-        credit_card = CreditCard(**response_text)
-        return credit_card.model_dump(by_alias=True)
+        validate_card(data)
     except ValidationError as e:
-        handle_api_errors(e)
-        raise
+        return "; ".join(
+            f"{'.'.join(map(str, error['loc'])) or 'root'}: {error['msg']}" for error in e.errors()
+        )
+    return ""
 
-def clean_json(response_text: str) -> dict:
-    try:
-        # Clean response text to extract only JSON
-        json_start = response_text.find('{')
-        json_end = response_text.rfind('}') + 1
 
-        if json_start == -1 or json_end == 0:
-            raise ValueError("Aucun JSON détecté dans la réponse")
+def validate_dict(response_text: dict)-> dict:
+    """Valide la réponse décodée d'un fournisseur (voir validate_card)"""
+    return validate_card(response_text)
 
-        data = response_text[json_start:json_end]
+def validate_raw_response(content: Optional[str]) -> Optional[dict]:
+    """Valide directement le texte de la réponse quand il n'est qu'un objet carte
 
-        # Remove markdown code blocks if present
-        data_str = data.replace('```json', '').replace('```', '').strip()
-        data_dict = json.loads(data_str)
-        return data_dict
-    except Exception as e:
-        handle_api_errors(e)
+    Cas courant des sorties structurées (json_schema) : un seul passage du
+    validateur, sans extraction ni json.loads intermédiaire.
+
+    Returns:
+        dict: Données validées ; None si le texte n'est pas un objet JSON
+        seul ou ne respecte pas le schéma (l'appelant passe alors par
+        clean_json, qui rapporte l'erreur)
+    """
+    if not content:
+        return None
+    try:
+        validated = validate_card(content)
+    except ValidationError:
+        return None
+    print_colored("✅ Données validées", **MSG_COLOR["success"])
+    return validated
+
+def clean_json(response_text: str) -> dict:
+    """Extrait l'objet JSON de la réponse du modèle en une seule passe
+
+    Raises:
+        JSONExtractionError: Si aucun objet JSON valide n'est trouvé
+    """
+    try:
+        return extract_json(response_text, expected_keys=CARD_KEYS)
+    except JSONExtractionError as e:
+        handle_api_errors(e, response_text=response_text or "")
+        raise
 
 def process_api_response_and_validate(
     completion: object, 
     selected_api: str, 
     response_text: dict
-)  -> bool:
-    """Traite la réponse API, valide les données et sauvegarde les résultats
-    
+)  -> Optional[dict]:
+    """Valide la réponse API décodée
+
+    Étape pure : l'enregistrement du résultat (historique, routage, index,
+    catalogue) est fait par l'appelant, voir pipeline.record_result.
+
     Args:
         completion (object): Objet de réponse de l'API
         selected_api (str): Type d'API utilisé ("openai" ou "perplexity")
         response_text (str): Contenu brut de la réponse API
         
     Returns:
-        bool: Vrai si le traitement est réussi, Faux sinon
+        dict: Données validées si le traitement est réussi, None sinon
     """
     try: 
-        save_data("previus.json", response_text)
-        print_colored("💾 Données brutes sauvegardées", **MSG_COLOR["success"])
         # Add check for empty response
         if not response_text:
             raise ValueError("Réponse API vide")
         
         validated_reponse=validate_dict(response_text)
         print_colored("✅ Données validées", **MSG_COLOR["success"])
-        # Sauvegarde finale
-        save_data("result.json",validated_reponse)
-        return True
+        return validated_reponse
     except Exception as e:
         handle_api_errors(e, selected_api, response_text)
-        return False  # Return tuple
+        return None
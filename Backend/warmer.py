@@ -0,0 +1,182 @@
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from cache import get_result_cache, normalize_cache_key
+from config import (
+    AUTO_MODEL,
+    CACHE_TTL_SECONDS,
+    MSG_COLOR,
+    WARM_CONCURRENCY,
+    WARM_INTERVAL_SECONDS,
+    WARM_MAX_LOOKUPS_PER_HOUR,
+    WARM_MAX_QPS,
+    WARM_POPULAR_WINDOW_SECONDS,
+    WARM_REFRESH_AHEAD,
+    WARM_TOP_CARDS,
+    print_colored,
+)
+from metrics import metrics
+from pipeline import CardLookupError, canonical_card, refresh_card, resolve_model
+
+
+def read_card_list(path: str) -> List[str]:
+    """Noms de cartes d'un fichier texte, un par ligne (lignes vides et # ignorées)"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class CardWarmer:
+    """Rafraîchit le cache avant que les cartes demandées n'expirent
+
+    Cartes d'une liste fixe ou les plus demandées, rafraîchies dès que leur
+    âge dépasse refresh_ahead x TTL, les absentes d'abord. Appels bornés en
+    parallélisme, en requêtes par seconde et en nombre par heure.
+    """
+
+    def __init__(
+        self,
+        cards: Optional[Iterable[str]] = None,
+        selected_api: str = "openai",
+        selected_model: str = AUTO_MODEL,
+        top: int = WARM_TOP_CARDS,
+        concurrency: int = WARM_CONCURRENCY,
+        max_qps: float = WARM_MAX_QPS,
+        max_lookups_per_hour: int = WARM_MAX_LOOKUPS_PER_HOUR,
+        refresh_ahead: float = WARM_REFRESH_AHEAD,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+    ):
+        self.cards = list(cards) if cards is not None else None
+        self.selected_api = selected_api
+        self.selected_model = selected_model
+        self.top = top
+        self.concurrency = max(1, concurrency)
+        self.max_lookups_per_hour = max_lookups_per_hour
+        # TTL désactivé (0) : seules les cartes absentes sont recherchées
+        self.refresh_after = ttl_seconds * refresh_ahead if ttl_seconds > 0 else math.inf
+        self.ttl_seconds = ttl_seconds
+        self._interval = 1 / max_qps if max_qps > 0 else 0.0
+        self._next_slot = 0.0
+        self._recent = deque()  # horodatages des recherches de la dernière heure
+        self._recent_lock = threading.Lock()
+
+    def targets(self) -> List[Tuple[str, str, str]]:
+        """(carte, api, modèle) à maintenir en cache, sans doublon"""
+        if self.cards is not None:
+            # Même résolution que /process : modèle "auto" puis nom canonique
+            selected_model = resolve_model(self.selected_api, self.selected_model)
+            targets = [
+                (canonical_card(card_choice, self.selected_api, selected_model), self.selected_api, selected_model)
+                for card_choice in self.cards
+            ]
+        else:
+            since = time.time() - WARM_POPULAR_WINDOW_SECONDS
+            targets = [tuple(row[:3]) for row in get_result_cache().popular(self.top, since)]
+        unique = {}
+        for target in targets:
+            unique.setdefault(normalize_cache_key(*target), target)
+        return list(unique.values())
+
+    def _budget_left(self) -> int:
+        with self._recent_lock:
+            hour_ago = time.monotonic() - 3600
+            while self._recent and self._recent[0] < hour_ago:
+                self._recent.popleft()
+            return max(0, self.max_lookups_per_hour - len(self._recent))
+
+    def _refresh(self, target: Tuple[str, str, str]) -> bool:
+        # Créneaux espacés de 1/max_qps secondes, sans rafale
+        with self._recent_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            self._recent.append(slot)
+        time.sleep(slot - now)
+        try:
+            refresh_card(*target)
+        except CardLookupError as e:
+            metrics.inc("warm_refreshes_total", outcome="failed", api=target[1])
+            print_colored(f"⚠️ {target[0]} : {e}", **MSG_COLOR["warning"])
+            return False
+        except Exception as e:
+            # Une carte en échec ne doit pas arrêter le cycle ni le warmer
+            metrics.inc("warm_refreshes_total", outcome="failed", api=target[1])
+            print_colored(f"❌ {target[0]} : erreur inattendue ({type(e).__name__}: {e})", **MSG_COLOR["error"])
+            return False
+        metrics.inc("warm_refreshes_total", outcome="refreshed", api=target[1])
+        return True
+
+    def run_once(self) -> dict:
+        """Un cycle : rafraîchit les cartes dues dans la limite du budget
+
+        Returns:
+            dict: Couverture et fraîcheur du cache après le cycle
+        """
+        cache = get_result_cache()
+        targets = self.targets()
+        due = []
+        for target in targets:
+            age = cache.age(*target)
+            if age is None or age >= self.refresh_after:
+                # Absentes d'abord, puis les plus anciennes
+                due.append((math.inf if age is None else age, target))
+        due.sort(key=lambda item: item[0], reverse=True)
+        selected = [target for _, target in due[:self._budget_left()]]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="card-warmer") as executor:
+            outcomes = list(executor.map(self._refresh, selected))
+        metrics.inc("warm_cycles_total")
+
+        report = self.report(targets)
+        report.update(
+            refreshed=sum(outcomes),
+            failed=len(outcomes) - sum(outcomes),
+            deferred=len(due) - len(selected),
+        )
+        return report
+
+    def report(self, targets: Optional[List[Tuple[str, str, str]]] = None) -> dict:
+        """Couverture (cartes en cache et non expirées) et âge des entrées"""
+        cache = get_result_cache()
+        targets = self.targets() if targets is None else targets
+        ages = [cache.age(*target) for target in targets]
+        cached = [age for age in ages if age is not None]
+        fresh = [age for age in cached if self.ttl_seconds <= 0 or age < self.ttl_seconds]
+        return {
+            "targets": len(targets),
+            "covered": len(fresh),
+            "coverage": len(fresh) / len(targets) if targets else 1.0,
+            "missing": len(ages) - len(cached),
+            "expired": len(cached) - len(fresh),
+            "due": sum(1 for age in cached if age >= self.refresh_after),
+            "mean_age_seconds": sum(cached) / len(cached) if cached else None,
+            "max_age_seconds": max(cached, default=None),
+        }
+
+    def run_forever(self, interval: float = WARM_INTERVAL_SECONDS) -> None:
+        """Enchaîne les cycles jusqu'à l'interruption (Ctrl+C)"""
+        while True:
+            started = time.monotonic()
+            try:
+                print_report(self.run_once())
+            except Exception as e:
+                # Cycle suivant à l'heure prévue, même si celui-ci a échoué (cache, liste des cartes...)
+                metrics.inc("warm_cycle_errors_total")
+                print_colored(f"❌ Cycle du warmer en échec ({type(e).__name__}: {e})", **MSG_COLOR["error"])
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def print_report(report: dict) -> None:
+    """Affiche le bilan d'un cycle du warmer"""
+    color = MSG_COLOR["success"] if report["coverage"] >= 1 else MSG_COLOR["warning"]
+    max_age = report["max_age_seconds"]
+    print_colored(
+        f"🔥 Couverture {report['coverage']:.0%} ({report['covered']}/{report['targets']}) · "
+        f"rafraîchies {report.get('refreshed', 0)} · échecs {report.get('failed', 0)} · "
+        f"reportées {report.get('deferred', 0)} · absentes {report['missing']} · "
+        f"âge max {'-' if max_age is None else f'{max_age / 3600:.1f} h'}",
+        **color,
+    )
@@ -38,12 +38,13 @@ export default function CreditCardFetcher() {
   const [selectedModel, setSelectedModel] = useState("gpt-3.5-turbo");
 
   const models = {
-    openai: ["gpt-3.5-turbo", "gpt-4"],
+    openai: ["gpt-3.5-turbo", "gpt-4", "auto"],
     perplexity: [
       "sonar-pro",
       "sonar",
       "sonar-reasoning-pro",
       "sonar-deep-research",
+      "auto",
     ],
   };
 
@@ -58,19 +59,15 @@ export default function CreditCardFetcher() {
       setLoading(true);
       setError(null);
 
+      // GET so the browser cache keeps the card and revalidates it
+      // with If-None-Match (304, no body) instead of downloading it again
+      const params = new URLSearchParams({
+        card_choice: cardChoice,
+        selected_api: selectedApi,
+        selected_model: selectedModel,
+      });
       const response = await fetch(
-        process.env.NEXT_PUBLIC_API_URL + "/process",
-        {
-          method: "POST",
-          headers: {
-            "Content-Type": "application/json",
-          },
-          body: JSON.stringify({
-            card_choice: cardChoice,
-            selected_api: selectedApi,
-            selected_model: selectedModel,
-          }),
-        }
+        `${process.env.NEXT_PUBLIC_API_URL}/process?${params}`
       );
 
       const data = await response.json();